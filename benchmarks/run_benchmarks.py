@@ -0,0 +1,256 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks for detection, ingestion and /api/leaks latency over synthetic data.
+
+Every case runs in its own subprocess (cwd = a scratch work dir, so the
+relative data/ paths the app uses land there), which keeps peak RSS per case
+and stops one case's caches from helping the next. LLM calls are stubbed with
+the deterministic fallback summary, so nothing leaves the machine.
+
+    python -m benchmarks.run_benchmarks --sizes 10000,1000000
+    python -m benchmarks.run_benchmarks --update-baseline
+
+Results are compared against benchmarks/baseline.json and the run fails when a
+metric is worse than the baseline by more than --tolerance, or when there is no
+baseline to compare against (record one with --update-baseline).
+"""
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BASELINE_PATH = ROOT/"benchmarks"/"baseline.json"
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+DEFAULT_MODES = ["full", "compact", "sql", "materialized"]
+DEFAULT_TOLERANCE = 0.25
+
+# Metrics where a larger value is worse (the rest, rows_per_s, are better larger),
+# and absolute differences too small to count as a regression whatever the ratio
+LOWER_IS_BETTER = {"wall_s", "peak_rss_mb", "warm_p50_s"}
+MIN_DELTA = {"wall_s": 0.05, "warm_p50_s": 0.01, "peak_rss_mb": 16, "rows_per_s": 0}
+
+SF_COLUMNS = {
+    "date": "Purchase Order Date",
+    "po_id": "Purchase Order",
+    "contract_id": "Contract Number",
+    "item_id": "Contract Title",
+    "vendor_id": "Supplier & Other Non-Supplier Payees",
+    "qty": "Encumbered Quantity",
+    "total": "Encumbered Amount",
+}
+
+
+def _peak_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def _stub_llm():
+    from src.agents import summarizer
+    from src.tools.llm_client import fallback_drift_summary
+    summarizer.summarize_drift_with_gemini = fallback_drift_summary
+
+
+# --- cases (run inside the child process) ---
+
+def _case_ingest(rows):
+    from src.agents import ingestor
+    return {"wall_s": _timed(ingestor.run)}
+
+
+def _case_detect(rows, mode):
+    from src.agents.price_detector import detect_public_only
+    return {"wall_s": _timed(lambda: detect_public_only(mode=mode))}
+
+
+def _case_api_leaks(rows):
+    from fastapi.testclient import TestClient
+    from src.api import fastapi_app
+
+    # No lifespan: the job queue workers are not needed for /api/leaks
+    client = TestClient(fastapi_app.app)
+
+    def get():
+        response = client.get("/api/leaks")
+        response.raise_for_status()
+
+    cold = _timed(get)
+    warm = sorted(_timed(get) for _ in range(5))
+    return {"wall_s": cold, "warm_p50_s": warm[len(warm) // 2]}
+
+
+def _case_ingest_sf(rows, streaming):
+    import ingest_sf_data
+    path = os.path.abspath("data/sf_data/sf_procurement.csv")
+    if streaming:
+        return {"wall_s": _timed(lambda: ingest_sf_data.ingest_sf_data_streaming(data_path=path, sample_size=None))}
+    ingest_sf_data._default_data_path = lambda: path
+    return {"wall_s": _timed(ingest_sf_data.ingest_sf_data)}
+
+
+CASES = {
+    "ingest": _case_ingest,
+    "api_leaks": _case_api_leaks,
+    "ingest_sf": lambda rows: _case_ingest_sf(rows, streaming=False),
+    "ingest_sf_streaming": lambda rows: _case_ingest_sf(rows, streaming=True),
+}
+
+
+def run_case(case, rows):
+    """Runs one case in this process and returns its metrics."""
+    _stub_llm()
+    if case.startswith("detect_"):
+        metrics = _case_detect(rows, case[len("detect_"):])
+    else:
+        metrics = CASES[case](rows)
+    metrics["rows_per_s"] = rows / metrics["wall_s"] if metrics["wall_s"] > 0 else 0.0
+    metrics["peak_rss_mb"] = _peak_rss_mb()
+    return metrics
+
+
+# --- driver ---
+
+def prepare_data(workdir, rows, seed=42):
+    """Writes data/{contracts,pos}.csv for the ingestor and an SF-format CSV of the same POs."""
+    import pyarrow.csv as pacsv
+    from data_generator import BulkGenerator, write_bulk
+
+    data_dir = workdir/"data"
+    write_bulk(workdir/"gen", fmt="csv", n_pos=rows, n_contracts=max(rows // 100, 10), seed=seed)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    for name in ("contracts", "pos"):
+        os.replace(workdir/"gen"/"public"/f"{name}.csv", data_dir/f"{name}.csv")
+    shutil.rmtree(workdir/"gen")
+
+    (data_dir/"sf_data").mkdir(exist_ok=True)
+    writer = None
+    for pos, _ in BulkGenerator(n_pos=rows, n_contracts=max(rows // 100, 10), seed=seed).iter_pos():
+        sf = pos.select(list(SF_COLUMNS)).rename_columns(list(SF_COLUMNS.values()))
+        if writer is None:
+            writer = pacsv.CSVWriter(str(data_dir/"sf_data"/"sf_procurement.csv"), sf.schema)
+        writer.write_table(sf)
+    if writer is not None:
+        writer.close()
+
+
+def _run_child(case, rows, workdir):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), env.get("PYTHONPATH")])),
+        # The SF ingest replaces pos/contracts, so it gets a database of its own
+        "DATABASE_URL": "sqlite:///data/sf.db" if case.startswith("ingest_sf") else "sqlite:///data/procure.db",
+        "LLM_CACHE_PATH": "",
+        "LLM_PROVIDER": "local",
+    })
+    env.pop("GEMINI_API_KEY", None)
+    result = workdir/f"{case}.json"
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.run_benchmarks", "--case", case, "--rows", str(rows), "--result", str(result)],
+        cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL,
+    )
+    return json.loads(result.read_text())
+
+
+def run_suite(sizes, modes, workdir=None):
+    """Returns {"<case>[<rows>]": metrics} for every case and dataset size."""
+    # ingest first: it loads the database that the detection and API cases read
+    cases = ["ingest"] + [f"detect_{m}" for m in modes] + ["api_leaks", "ingest_sf", "ingest_sf_streaming"]
+    results = {}
+    for rows in sizes:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+            tmp = Path(tmp)
+            print(f"Generating {rows} rows...")
+            prepare_data(tmp, rows)
+            for case in cases:
+                if case == "ingest_sf" and rows < 5000:
+                    # ingest_sf_data samples 5000 POs without replacement
+                    continue
+                key = f"{case}[{rows}]"
+                results[key] = _run_child(case, rows, tmp)
+                m = results[key]
+                print(f"{key}: {m['wall_s']:.3f}s, {m['rows_per_s']:.0f} rows/s, peak RSS {m['peak_rss_mb']:.0f} MB")
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Lists (key, metric, baseline, current) for every metric worse than baseline beyond `tolerance`."""
+    regressions = []
+    for key, metrics in results.items():
+        for metric, current in metrics.items():
+            base = baseline.get(key, {}).get(metric)
+            if base is None:
+                continue
+            if metric in LOWER_IS_BETTER:
+                worse = current > base * (1 + tolerance) and current - base > MIN_DELTA.get(metric, 0)
+            else:
+                worse = current < base * (1 - tolerance) and base - current > MIN_DELTA.get(metric, 0)
+            if worse:
+                regressions.append((key, metric, base, current))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the detection/ingestion/API benchmarks.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="comma-separated PO row counts")
+    parser.add_argument("--modes", default=",".join(DEFAULT_MODES), help="detection modes to benchmark")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="allowed relative regression")
+    parser.add_argument("--update-baseline", action="store_true", help="record this run as the new baseline")
+    parser.add_argument("--workdir", default=None, help="where the scratch data sets are created")
+    # Internal: run a single case in this process
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    parser.add_argument("--rows", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        Path(args.result).write_text(json.dumps(run_case(args.case, args.rows)))
+        return 0
+
+    baseline_path = Path(args.baseline)
+    if not args.update_baseline and not baseline_path.exists():
+        # A missing baseline must not turn the regression gate into a no-op
+        print(f"No baseline at {baseline_path}; record one with --update-baseline")
+        return 2
+
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+    modes = [m for m in args.modes.split(",") if m]
+    results = run_suite(sizes, modes, args.workdir)
+
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else {}
+    if args.update_baseline:
+        baseline.update(results)
+        baseline["_meta"] = {
+            "recorded": time.strftime("%Y-%m-%d"),
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+        }
+        baseline_path.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {baseline_path}")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance)
+    for key, metric, base, current in regressions:
+        print(f"REGRESSION {key} {metric}: {base:.4g} -> {current:.4g}")
+    if regressions:
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,5 +1,9 @@
 # data_generator.py
 import pandas as pd, numpy as np, random, datetime, json
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from pathlib import Path
 OUT = Path("data")
 PRIVATE = OUT/"private"
@@ -60,7 +64,154 @@ def gen_pos(vendors, items, contracts_df, n_pos=2000, leak_prob=0.03):
         labels.append({"po_id": po_id, "leak": leak})
     return pd.DataFrame(rows), pd.DataFrame(labels)
 
+# Vectorized generator for load tests: same schema as gen_contracts/gen_pos, built
+# with NumPy/Arrow a chunk at a time instead of row by row
+BULK_OUT = OUT/"bulk"
+BULK_FORMATS = {"csv": ".csv", "parquet": ".parquet"}
+
+class BulkGenerator:
+    """
+    Seeded, vectorized generator of contracts, POs and leak labels.
+
+    `contract_coverage` is the share of POs placed under a contract (priced
+    around the contract price, so the detector can flag them), `leak_rate` the
+    share of POs marked up 10-40%, and `vendor_skew` the Zipf exponent of vendor
+    popularity (0 = uniform). The same seed and chunk size give the same data.
+    """
+
+    def __init__(self, n_pos=1_000_000, n_contracts=10_000, n_vendors=500, n_items=5000,
+                 contract_coverage=0.7, leak_rate=0.03, vendor_skew=1.0, seed=42):
+        if min(n_contracts, n_vendors, n_items) < 1:
+            raise ValueError("n_contracts, n_vendors and n_items must be at least 1")
+        self.n_pos = n_pos
+        self.n_contracts = n_contracts
+        self.contract_coverage = contract_coverage
+        self.leak_rate = leak_rate
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+
+        weights = 1.0 / np.arange(1, n_vendors + 1) ** vendor_skew
+        self.vendor_weights = weights / weights.sum()
+        self.vendor_ids = pa.array([f"V{str(i).zfill(3)}" for i in range(n_vendors)])
+        self.item_ids = pa.array([f"ITEM{str(i).zfill(4)}" for i in range(n_items)])
+        self.item_base = np.round(rng.uniform(5, 500, n_items), 2)
+
+        self.contract_vendor = rng.choice(n_vendors, n_contracts, p=self.vendor_weights)
+        self.contract_item = rng.integers(0, n_items, n_contracts)
+        self.contract_price = np.round(self.item_base[self.contract_item] * rng.uniform(0.9, 1.1, n_contracts), 2)
+        self.contract_expiry = _iso_dates(np.datetime64(datetime.date.today(), "D") + rng.integers(30, 366, n_contracts))
+        # The extra trailing "" is the contract_id of POs without a contract
+        self.contract_ids = pa.array([f"C{str(i).zfill(7)}" for i in range(n_contracts)] + [""])
+
+    def contracts(self):
+        return pa.table({
+            "contract_id": self.contract_ids.slice(0, self.n_contracts),
+            "vendor_id": self.vendor_ids.take(pa.array(self.contract_vendor)),
+            "item_id": self.item_ids.take(pa.array(self.contract_item)),
+            "contract_unit_price": self.contract_price,
+            "expiry_date": self.contract_expiry,
+        })
+
+    def iter_pos(self, chunk_size=1_000_000):
+        """Yields (pos, labels) Arrow tables of at most `chunk_size` rows."""
+        today = np.datetime64(datetime.date.today(), "D")
+        for chunk_no, start in enumerate(range(0, self.n_pos, chunk_size)):
+            m = min(chunk_size, self.n_pos - start)
+            rng = np.random.default_rng([self.seed, chunk_no])
+
+            covered = rng.random(m) < self.contract_coverage
+            contract = np.where(covered, rng.integers(0, self.n_contracts, m), self.n_contracts)
+            # Covered POs buy the contract's item from its vendor, around the contract price
+            any_contract = np.minimum(contract, self.n_contracts - 1)
+            vendor = np.where(covered, self.contract_vendor[any_contract],
+                              rng.choice(len(self.vendor_weights), m, p=self.vendor_weights))
+            item = np.where(covered, self.contract_item[any_contract], rng.integers(0, len(self.item_base), m))
+            base = np.where(covered, self.contract_price[any_contract], self.item_base[item])
+
+            leak = rng.random(m) < self.leak_rate
+            unit_price = base * rng.uniform(0.95, 1.05, m)
+            unit_price = np.round(np.where(leak, unit_price * rng.uniform(1.10, 1.40, m), unit_price), 2)
+            qty = rng.integers(1, 51, m)
+
+            po_id = pc.binary_join_element_wise(
+                "PO", pc.utf8_lpad(pc.cast(pa.array(np.arange(start, start + m)), pa.string()), width=9, padding="0"), "")
+            pos = pa.table({
+                "po_id": po_id,
+                "vendor_id": self.vendor_ids.take(pa.array(vendor)),
+                "item_id": self.item_ids.take(pa.array(item)),
+                "unit_price": unit_price,
+                "qty": qty,
+                "total": np.round(unit_price * qty, 2),
+                "date": _iso_dates(today - rng.integers(0, 181, m)),
+                "contract_id": self.contract_ids.take(pa.array(contract)),
+            })
+            yield pos, pa.table({"po_id": po_id, "leak": leak})
+
+def _iso_dates(days):
+    return pc.cast(pa.array(days.astype("datetime64[D]")), pa.string())
+
+def _open_writer(path, schema, fmt):
+    if fmt == "parquet":
+        return pq.ParquetWriter(str(path), schema)
+    return pacsv.CSVWriter(str(path), schema)
+
+def write_bulk(out_dir=BULK_OUT, fmt="csv", chunk_size=1_000_000, **params):
+    """
+    Generates a BulkGenerator(**params) dataset and streams it to
+    `out_dir`/public/{contracts,pos} and `out_dir`/private/pos_labels, one
+    chunk at a time, as CSV or Parquet. Returns the number of POs written.
+    """
+    if fmt not in BULK_FORMATS:
+        raise ValueError(f"Unknown format: {fmt}")
+    ext = BULK_FORMATS[fmt]
+    out_dir = Path(out_dir)
+    (out_dir/"public").mkdir(parents=True, exist_ok=True)
+    (out_dir/"private").mkdir(parents=True, exist_ok=True)
+
+    gen = BulkGenerator(**params)
+    contracts = gen.contracts()
+    with _open_writer(out_dir/"public"/f"contracts{ext}", contracts.schema, fmt) as writer:
+        writer.write_table(contracts)
+
+    pos_writer = labels_writer = None
+    written = 0
+    try:
+        for pos, labels in gen.iter_pos(chunk_size):
+            if pos_writer is None:
+                pos_writer = _open_writer(out_dir/"public"/f"pos{ext}", pos.schema, fmt)
+                labels_writer = _open_writer(out_dir/"private"/f"pos_labels{ext}", labels.schema, fmt)
+            pos_writer.write_table(pos)
+            labels_writer.write_table(labels)
+            written += pos.num_rows
+    finally:
+        for writer in (pos_writer, labels_writer):
+            if writer is not None:
+                writer.close()
+    return written
+
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate synthetic procurement data.")
+    parser.add_argument("--bulk", action="store_true", help="vectorized generator for large load-test datasets")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="POs to generate (--bulk)")
+    parser.add_argument("--contracts", type=int, default=10_000)
+    parser.add_argument("--vendors", type=int, default=500)
+    parser.add_argument("--items", type=int, default=5000)
+    parser.add_argument("--coverage", type=float, default=0.7, help="share of POs under a contract")
+    parser.add_argument("--leak-rate", type=float, default=0.03)
+    parser.add_argument("--vendor-skew", type=float, default=1.0, help="Zipf exponent of vendor popularity, 0 = uniform")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=sorted(BULK_FORMATS), default="csv")
+    parser.add_argument("--out", default=str(BULK_OUT))
+    args = parser.parse_args()
+    if args.bulk:
+        n = write_bulk(args.out, fmt=args.format, chunk_size=args.chunk_size, n_pos=args.rows,
+                       n_contracts=args.contracts, n_vendors=args.vendors, n_items=args.items,
+                       contract_coverage=args.coverage, leak_rate=args.leak_rate,
+                       vendor_skew=args.vendor_skew, seed=args.seed)
+        print(f"Generated {n} POs in {args.out}. Labels are in {args.out}/private/pos_labels{BULK_FORMATS[args.format]}")
+        raise SystemExit
     items=gen_items()
     vendors=gen_vendors()
     contracts_df = gen_contracts(vendors, items, n_contracts=40)
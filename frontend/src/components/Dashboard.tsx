@@ -61,6 +61,7 @@ export default function Dashboard() {
   const [showFilters, setShowFilters] = useState(false);
   const [filterDrift, setFilterDrift] = useState<'all' | 'high'>('all');
   const [driftScoreRange, setDriftScoreRange] = useState<[number, number]>([0, 100]);
+  const [appliedThreshold, setAppliedThreshold] = useState<number | null>(null);
   
   // Pagination State
   const [currentPage, setCurrentPage] = useState(1);
@@ -97,20 +98,50 @@ export default function Dashboard() {
       if (response.ok) {
         const data = await response.json();
         setResults(data);
-        calculateStats(data);
       }
     } catch (error) {
       console.error("Failed to fetch results", error);
     }
   };
 
+  // Adds pushed rows to the table; a PO flagged on arrival (po_flagged) is sent
+  // again once written (drifts), so rows are deduplicated by po_id
+  const mergeDrifts = (rows: DetectionResult[]) => {
+    setResults(prev => {
+      const seen = new Set(prev.map(r => r.po_id));
+      const added = rows.filter(r => {
+        if (seen.has(r.po_id)) return false;
+        seen.add(r.po_id);
+        return true;
+      });
+      if (added.length === 0) return prev;
+      return [...prev, ...added].sort((a, b) => (b.price_drift || 0) - (a.price_drift || 0));
+    });
+  };
+
+  useEffect(() => {
+    calculateStats(results);
+  }, [results]);
+
   // Mock initial fetch or real fetch
   useEffect(() => {
     fetchResults();
   }, []);
 
+  useEffect(() => {
+    // New drifts (e.g. from simulated traffic) are pushed by the server, already
+    // filtered by the applied threshold, and merged in without refetching /api/leaks
+    const query = appliedThreshold !== null ? `?drift_threshold=${appliedThreshold}` : '';
+    const events = new EventSource(`/api/events${query}`);
+    const onRows = (event: Event) => mergeDrifts(JSON.parse((event as MessageEvent).data));
+    events.addEventListener('drifts', onRows);
+    events.addEventListener('po_flagged', onRows);
+    return () => events.close();
+  }, [appliedThreshold]);
+
   const handleApplyFilters = () => {
     fetchResults(driftScoreRange[0]);
+    setAppliedThreshold(driftScoreRange[0]);
     setShowFilters(false);
   };
 
@@ -120,7 +151,7 @@ export default function Dashboard() {
       const response = await fetch('/api/run-detection', { method: 'POST' });
       if (response.ok) {
         const { task_id } = await response.json();
-        pollStatus(task_id);
+        watchTask(task_id);
       } else {
         setIsDetecting(false);
       }
@@ -149,24 +180,24 @@ export default function Dashboard() {
     }
   };
 
-  const pollStatus = async (taskId: string) => {
-    const interval = setInterval(async () => {
-      try {
-        const response = await fetch(`/api/run-detection/${taskId}`);
-        const data = await response.json();
-        if (data.status === 'completed') {
-          clearInterval(interval);
-          fetchResults(); // Refresh data
-          setIsDetecting(false);
-        } else if (data.status === 'failed') {
-          clearInterval(interval);
-          setIsDetecting(false);
-        }
-      } catch (e) {
-        clearInterval(interval);
+  const watchTask = (taskId: string) => {
+    // Task state is pushed over Server-Sent Events instead of polled
+    const events = new EventSource(`/api/events?task_id=${taskId}`);
+    events.addEventListener('task', (event) => {
+      const data = JSON.parse((event as MessageEvent).data);
+      if (data.status === 'completed') {
+        events.close();
+        fetchResults(); // Refresh data
+        setIsDetecting(false);
+      } else if (data.status !== 'queued' && data.status !== 'in_progress') {
+        events.close();
         setIsDetecting(false);
       }
-    }, 1000);
+    });
+    events.onerror = () => {
+      events.close();
+      setIsDetecting(false);
+    };
   };
 
   const handleSort = (key: keyof DetectionResult) => {
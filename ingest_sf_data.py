@@ -1,38 +1,45 @@
 import pandas as pd
 import numpy as np
-from src.agents.price_detector import engine
+from src.agents.price_detector import engine, reset_incremental_state
+from src.agents.ingestor import create_indexes
+from src.agents.drift_table import ensure_po_drift
+from src.tools.result_cache import bump_data_version
+from src.tools import columnar_store
+from src.tools.bulk_loader import bulk_load
 import uuid
 import os
 
-def ingest_sf_data():
-    print("Reading SF Procurement Data...")
-    # Read only necessary columns to save memory
-    use_cols = [
-        'Purchase Order Date', 'Purchase Order', 'Contract Number', 'Contract Title',
-        'Supplier & Other Non-Supplier Payees', 'Encumbered Quantity', 'Encumbered Amount'
-    ]
-    
+
+# Columns we need from the SF file, and their types, so pandas never has to
+# infer them (or materialize the other ~15 columns)
+SF_USE_COLS = [
+    'Purchase Order Date', 'Purchase Order', 'Contract Number', 'Contract Title',
+    'Supplier & Other Non-Supplier Payees', 'Encumbered Quantity', 'Encumbered Amount'
+]
+SF_DTYPES = {
+    'Purchase Order Date': 'str',
+    'Purchase Order': 'str',
+    'Contract Number': 'str',
+    'Contract Title': 'str',
+    'Supplier & Other Non-Supplier Payees': 'str',
+    'Encumbered Quantity': 'float64',
+    'Encumbered Amount': 'float64',
+}
+CONTRACT_KEY = ['contract_id', 'item_id', 'vendor_id']
+
+def _default_data_path():
     # Construct path to data file relative to the script location
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_path = os.path.join(script_dir, 'data', 'sf_data', 'sf_procurement.csv')
-
-    # Note: Column names might vary slightly, I'll try to be robust or read all and rename
-    try:
-        df = pd.read_csv(data_path, usecols=use_cols)
-    except ValueError:
-        # Fallback if columns are named differently (e.g. from the truncated output I saw)
-        # Let's read all and print columns if this fails, but for now assume standard names
-        df = pd.read_csv(data_path)
-    
-    print(f"Loaded {len(df)} rows.")
+    return os.path.join(script_dir, 'data', 'sf_data', 'sf_procurement.csv')
 
-    # Clean data
+def _clean(df):
+    """Drops unusable rows, derives unit_price and renames columns to our schema."""
     df = df.dropna(subset=['Encumbered Quantity', 'Encumbered Amount', 'Supplier & Other Non-Supplier Payees'])
     df = df[df['Encumbered Quantity'] > 0]
     df = df[df['Encumbered Amount'] > 0]
     
     # Calculate Unit Price
-    df['unit_price'] = df['Encumbered Amount'] / df['Encumbered Quantity']
+    df = df.assign(unit_price=df['Encumbered Amount'] / df['Encumbered Quantity'])
     
     # Filter out unreasonable prices (e.g. near zero or infinity)
     df = df[df['unit_price'] > 0.01]
@@ -52,11 +59,53 @@ def ingest_sf_data():
     # For this demo, we want to detect drifts against contracts, so we'll prioritize rows with contracts.
     # Or we can generate fake contract IDs for those missing them.
     df['contract_id'] = df['contract_id'].fillna('OPEN_MARKET')
+    return df
+
+def _inject_leaks(pos):
+    """
+    Since real data is usually compliant, we need to inject some drifts for the demo.
+    We'll increase the unit price by 25% for 10% of the rows.
+    """
+    num_leaks = int(len(pos) * 0.10)
+    leak_indices = np.random.choice(pos.index, num_leaks, replace=False)
+    
+    print(f"Injecting {num_leaks} artificial leaks...")
+    pos.loc[leak_indices, 'unit_price'] *= 1.25
+    # Recalculate total for consistency
+    pos.loc[leak_indices, 'total'] = pos.loc[leak_indices, 'unit_price'] * pos.loc[leak_indices, 'qty']
+    
+    # Ensure we format dates correctly
+    pos['date'] = pd.to_datetime(pos['date']).dt.date.astype(str)
+    return pos
+
+def _finish_load():
+    # pos/contracts were replaced: rebuild indexes and derived drift data, invalidate caches
+    create_indexes(engine)
+    ensure_po_drift(engine, rebuild=True)
+    reset_incremental_state(engine)
+    bump_data_version(engine)
+
+def ingest_sf_data():
+    print("Reading SF Procurement Data...")
+    data_path = _default_data_path()
+
+    # Note: Column names might vary slightly, I'll try to be robust or read all and rename
+    try:
+        df = pd.read_csv(data_path, usecols=SF_USE_COLS)
+    except ValueError:
+        # Fallback if columns are named differently (e.g. from the truncated output I saw)
+        # Let's read all and print columns if this fails, but for now assume standard names
+        df = pd.read_csv(data_path)
+    
+    print(f"Loaded {len(df)} rows.")
+
+    # Clean data
+    df = _clean(df)
     
     # --- Generate Contracts Table ---
     # We assume the "Contract Price" is the median price seen for that item/contract combo
     print("Generating Contracts Reference Data...")
-    contracts_ref = df.groupby(['contract_id', 'item_id', 'vendor_id'])['unit_price'].median().reset_index()
+    contracts_ref = df.groupby(CONTRACT_KEY)['unit_price'].median().reset_index()
     contracts_ref = contracts_ref.rename(columns={'unit_price': 'contract_unit_price'})
     
     # Add dummy expiry date
@@ -72,28 +121,134 @@ def ingest_sf_data():
     pos_sample = df.sample(n=5000, random_state=42).copy() # 5000 POs is plenty for a demo
     
     # --- Inject Artificial Leaks ---
-    # Since real data is usually compliant, we need to inject some drifts for the demo.
-    # We'll increase the unit price by 25% for 10% of the rows.
-    num_leaks = int(len(pos_sample) * 0.10)
-    leak_indices = np.random.choice(pos_sample.index, num_leaks, replace=False)
-    
-    print(f"Injecting {num_leaks} artificial leaks...")
-    pos_sample.loc[leak_indices, 'unit_price'] *= 1.25
-    # Recalculate total for consistency
-    pos_sample.loc[leak_indices, 'total'] = pos_sample.loc[leak_indices, 'unit_price'] * pos_sample.loc[leak_indices, 'qty']
-    
-    # Ensure we format dates correctly
-    pos_sample['date'] = pd.to_datetime(pos_sample['date']).dt.date.astype(str)
+    pos_sample = _inject_leaks(pos_sample)
     
     # --- Insert into DB ---
     print("Inserting into Database...")
     
     # Clear existing data? Maybe not, let's append or replace. 
     # For a clean demo, replacing is better.
-    contracts_ref.to_sql('contracts', engine, if_exists='replace', index=False)
-    pos_sample.to_sql('pos', engine, if_exists='replace', index=False)
+    bulk_load(contracts_ref, 'contracts', engine)
+    bulk_load(pos_sample, 'pos', engine)
+    if columnar_store.COLUMNAR_BACKEND:
+        columnar_store.write_table(contracts_ref, 'contracts')
+        columnar_store.write_table(pos_sample, 'pos')
+    _finish_load()
     
     print(f"Ingested {len(contracts_ref)} contracts and {len(pos_sample)} POs.")
 
+
+class ContractPriceStats:
+    """
+    Incrementally maintained unit-price statistics per (contract, item, vendor).
+
+    Keeps a uniform random sample of at most `sample_size` prices per key (the
+    rows with the smallest random priority, which merges across chunks exactly),
+    so memory is bounded by the number of keys rather than the number of rows.
+    The median of the sample is the exact median for keys seen up to
+    `sample_size` times. Beyond that it is only an approximation: the sample
+    median's rank has a standard error of about 0.5 / sqrt(sample_size) in
+    quantile terms (0.05 for the default 101), so it lies between the 35th and
+    65th percentile of the key's prices in all but about 0.3% of cases.
+    Raise `sample_size` for a tighter estimate.
+    """
+
+    def __init__(self, sample_size=101, seed=42):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.state = pd.DataFrame(columns=CONTRACT_KEY + ['unit_price', '_priority'])
+        self.rows_seen = 0
+
+    def update(self, chunk):
+        part = chunk[CONTRACT_KEY + ['unit_price']].assign(_priority=self.rng.random(len(chunk)))
+        merged = pd.concat([self.state, part], ignore_index=True) if len(self.state) else part
+        merged = merged.sort_values('_priority', kind='stable')
+        self.state = merged.groupby(CONTRACT_KEY, sort=False).head(self.sample_size)
+        self.rows_seen += len(chunk)
+
+    def medians(self):
+        contracts_ref = self.state.groupby(CONTRACT_KEY)['unit_price'].median().reset_index()
+        return contracts_ref.rename(columns={'unit_price': 'contract_unit_price'})
+
+
+def ingest_sf_data_streaming(data_path=None, chunksize=100_000, sample_size=5000):
+    """
+    Streaming variant of ingest_sf_data with flat peak memory.
+
+    Reads the CSV in `chunksize` rows with explicit dtypes and only the needed
+    columns, cleans and derives unit_price per chunk and folds each chunk into
+    ContractPriceStats. POs are reduced to a uniform `sample_size` sample as the
+    chunks go by; with `sample_size=None` every cleaned PO is written to the DB
+    chunk by chunk instead.
+    """
+    data_path = data_path or _default_data_path()
+    print(f"Streaming SF Procurement Data in chunks of {chunksize} rows...")
+
+    header = pd.read_csv(data_path, nrows=0).columns
+    missing = [c for c in SF_USE_COLS if c not in header]
+    if missing:
+        raise ValueError(f"SF procurement file is missing columns: {missing}")
+
+    stats = ContractPriceStats()
+    rng = np.random.default_rng(42)
+    pos_sample = None
+    rows_read = 0
+    pos_written = 0
+
+    reader = pd.read_csv(data_path, usecols=SF_USE_COLS, dtype=SF_DTYPES, chunksize=chunksize)
+    for chunk in reader:
+        rows_read += len(chunk)
+        chunk = _clean(chunk)
+        if chunk.empty:
+            continue
+        stats.update(chunk)
+
+        if sample_size is None:
+            chunk = _inject_leaks(chunk.copy())
+            bulk_load(chunk, 'pos', engine, if_exists='replace' if pos_written == 0 else 'append')
+            if columnar_store.COLUMNAR_BACKEND:
+                write = columnar_store.write_table if pos_written == 0 else columnar_store.append_table
+                write(chunk, 'pos')
+            pos_written += len(chunk)
+        else:
+            # Bottom-k by random priority: a uniform sample over everything read so far
+            chunk = chunk.assign(_priority=rng.random(len(chunk)))
+            pos_sample = chunk if pos_sample is None else pd.concat([pos_sample, chunk], ignore_index=True)
+            pos_sample = pos_sample.nsmallest(sample_size, '_priority')
+
+        print(f"Processed {rows_read} rows...")
+
+    if stats.rows_seen == 0:
+        print("No usable rows found.")
+        return
+
+    print("Generating Contracts Reference Data...")
+    contracts_ref = stats.medians()
+    # Add dummy expiry date
+    contracts_ref['expiry_date'] = '2025-12-31'
+
+    print("Inserting into Database...")
+    bulk_load(contracts_ref, 'contracts', engine, batch_size=chunksize)
+    if columnar_store.COLUMNAR_BACKEND:
+        columnar_store.write_table(contracts_ref, 'contracts')
+    if sample_size is not None:
+        pos_sample = _inject_leaks(pos_sample.drop(columns='_priority').reset_index(drop=True))
+        bulk_load(pos_sample, 'pos', engine, batch_size=chunksize)
+        if columnar_store.COLUMNAR_BACKEND:
+            columnar_store.write_table(pos_sample, 'pos')
+        pos_written = len(pos_sample)
+    _finish_load()
+
+    print(f"Ingested {len(contracts_ref)} contracts and {pos_written} POs from {rows_read} rows.")
+
 if __name__ == "__main__":
-    ingest_sf_data()
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest the SF procurement CSV into the database.")
+    parser.add_argument("--stream", action="store_true", help="read the CSV in chunks with flat memory use")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--sample-size", type=int, default=5000, help="POs to keep; 0 keeps every PO")
+    args = parser.parse_args()
+    if args.stream:
+        ingest_sf_data_streaming(chunksize=args.chunksize, sample_size=args.sample_size or None)
+    else:
+        ingest_sf_data()
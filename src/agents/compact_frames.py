@@ -0,0 +1,115 @@
+# src/agents/compact_frames.py
+import os
+import numpy as np
+import pandas as pd
+
+# Memory-lean frame representation used by the "compact" detection mode: repeated
+# ids are categoricals, prices float32 (when that loses nothing, see _narrow_floats),
+# dates datetime64 and unique ids Arrow strings.
+ID_COLUMNS = ("vendor_id", "item_id", "contract_id")
+PRICE_COLUMNS = ("unit_price", "total", "contract_unit_price")
+UNIQUE_COLUMNS = ("po_id",)
+DATE_COLUMNS = ("date",)
+
+# Rows fetched from the database per chunk; each chunk is compacted before the next is read
+COMPACT_CHUNK_ROWS = int(os.getenv("COMPACT_CHUNK_ROWS", "200000"))
+
+
+def _as_category(col, as_text=False):
+    cat = col.astype("category")
+    if as_text and len(cat.cat.categories) and not pd.api.types.is_string_dtype(cat.cat.categories):
+        try:
+            cat = cat.cat.rename_categories(cat.cat.categories.astype(str))
+        except ValueError:
+            # Distinct values with the same text (1 and "1") collapse into one category
+            cat = col.astype(str).where(col.notna()).astype("category")
+    return cat
+
+
+def _narrow_floats(col):
+    """
+    float32 if every value comes back unchanged through exact_float64, else
+    float64. float32 holds about 7 significant digits, so e.g. 1234567.89 keeps
+    its float64 column rather than being rounded to 1234567.875.
+    """
+    wide = pd.to_numeric(col, errors="coerce").astype("float64")
+    narrow = wide.astype("float32")
+    return narrow if exact_float64(narrow).equals(wide) else wide
+
+
+def compact_frame(df):
+    """Converts `df` to the compact dtypes, column by column (the input is not kept)."""
+    out = {}
+    for name in df.columns:
+        col = df[name]
+        if name in PRICE_COLUMNS:
+            out[name] = _narrow_floats(col)
+        elif name in DATE_COLUMNS:
+            # Dates that don't parse become NaT; detection never reads them
+            out[name] = pd.to_datetime(col, errors="coerce", format="mixed")
+        elif name in UNIQUE_COLUMNS and col.dtype == object:
+            out[name] = col.astype("string[pyarrow]")
+        elif name in ID_COLUMNS or col.dtype == object:
+            # contract_id is the join key and compared as text, like the str cast in the full-mode merge
+            out[name] = _as_category(col, as_text=(name == "contract_id"))
+        elif pd.api.types.is_integer_dtype(col):
+            out[name] = pd.to_numeric(col, downcast="integer")
+        elif pd.api.types.is_float_dtype(col):
+            out[name] = _narrow_floats(col)
+        else:
+            out[name] = col
+    return pd.DataFrame(out)
+
+
+def concat_compact(parts):
+    """Concatenates compacted chunks, merging categoricals instead of falling back to object."""
+    if len(parts) == 1:
+        return parts[0]
+    out = {}
+    for name in parts[0].columns:
+        cols = [p[name] for p in parts]
+        if all(isinstance(c.dtype, pd.CategoricalDtype) for c in cols):
+            out[name] = pd.Series(pd.api.types.union_categoricals(cols, ignore_order=True))
+        else:
+            out[name] = pd.concat(cols, ignore_index=True)
+    return pd.DataFrame(out)
+
+
+def read_compact(query, engine, chunksize=None):
+    """Reads `query` into a compact frame a chunk at a time, so only one chunk exists as Python objects."""
+    chunks = pd.read_sql(query, engine, chunksize=chunksize or COMPACT_CHUNK_ROWS)
+    parts = [compact_frame(chunk) for chunk in chunks]
+    if not parts:
+        return pd.DataFrame()
+    return concat_compact(parts)
+
+
+def exact_float64(col):
+    """
+    float32 -> shortest text -> float64, which gives back the decimal that was
+    stored (12.34, not 12.3400001) as long as it had no more than ~7 significant
+    digits; compact_frame only uses float32 for columns where that holds.
+    float64 input is returned as is.
+    """
+    if col.dtype != np.float32:
+        return col.astype("float64")
+    return col.astype(str).astype("float64")
+
+
+def expand_frame(df):
+    """Converts a (small) compact frame back to the plain dtypes the API serializes."""
+    out = {}
+    for name in df.columns:
+        col = df[name]
+        if isinstance(col.dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            out[name] = col.astype(object).where(col.notna(), None)
+        elif pd.api.types.is_datetime64_any_dtype(col):
+            with_time = (col.dropna() != col.dropna().dt.normalize()).any()
+            out[name] = col.dt.strftime("%Y-%m-%d %H:%M:%S" if with_time else "%Y-%m-%d")
+        elif col.dtype == np.float32:
+            out[name] = exact_float64(col)
+        elif pd.api.types.is_integer_dtype(col):
+            out[name] = col.astype("int64")
+        else:
+            out[name] = col
+    return pd.DataFrame(out, index=df.index)
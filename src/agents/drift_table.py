@@ -0,0 +1,174 @@
+# src/agents/drift_table.py
+from sqlalchemy import inspect, text
+from src.agents.rollups import ensure_rollups, rollups_current
+
+# Materialized per-PO drift, kept up to date by SQLite triggers on `pos` and
+# `contracts` so that reads are a range scan on price_drift instead of a join
+# over every PO.
+PO_DRIFT_TABLE = "po_drift"
+
+# Same predicate as the detector: only POs with a (positive) contract price have a drift
+_DRIFT_SELECT = """
+    select {row}.rowid, {row}.po_id, {row}.contract_id, c.contract_unit_price,
+           {row}.unit_price * 1.0 / c.contract_unit_price
+    from contracts c
+    where c.contract_id = {row}.contract_id and c.contract_unit_price > 0
+"""
+
+_TRIGGERS = {
+    "trg_pos_po_drift_insert": f"""
+        create trigger trg_pos_po_drift_insert after insert on pos
+        begin
+            insert into {PO_DRIFT_TABLE} {_DRIFT_SELECT.format(row="new")};
+        end
+    """,
+    "trg_pos_po_drift_update": f"""
+        create trigger trg_pos_po_drift_update after update of unit_price, contract_id on pos
+        begin
+            delete from {PO_DRIFT_TABLE} where po_rowid = old.rowid;
+            insert into {PO_DRIFT_TABLE} {_DRIFT_SELECT.format(row="new")};
+        end
+    """,
+    "trg_pos_po_drift_delete": f"""
+        create trigger trg_pos_po_drift_delete after delete on pos
+        begin
+            delete from {PO_DRIFT_TABLE} where po_rowid = old.rowid;
+        end
+    """,
+}
+
+# A contract change re-derives the drift of that contract's POs (found through
+# ix_pos_contract_id), for the old and the new contract_id of an update
+_REFRESH_CONTRACT = f"""
+            delete from {PO_DRIFT_TABLE} where contract_id = {{row}}.contract_id;
+            insert into {PO_DRIFT_TABLE}
+            select p.rowid, p.po_id, p.contract_id, c.contract_unit_price, p.unit_price * 1.0 / c.contract_unit_price
+            from pos p
+            join contracts c on c.contract_id = p.contract_id
+            where p.contract_id = {{row}}.contract_id and c.contract_unit_price > 0;"""
+
+_CONTRACT_TRIGGERS = {
+    "trg_contracts_po_drift_insert": f"""
+        create trigger trg_contracts_po_drift_insert after insert on contracts
+        begin{_REFRESH_CONTRACT.format(row="new")}
+        end
+    """,
+    "trg_contracts_po_drift_update": f"""
+        create trigger trg_contracts_po_drift_update after update of contract_id, contract_unit_price on contracts
+        begin{_REFRESH_CONTRACT.format(row="old")}{_REFRESH_CONTRACT.format(row="new")}
+        end
+    """,
+    "trg_contracts_po_drift_delete": f"""
+        create trigger trg_contracts_po_drift_delete after delete on contracts
+        begin{_REFRESH_CONTRACT.format(row="old")}
+        end
+    """,
+}
+
+_INDEXES = {
+    "ix_pos_contract_id": "create index if not exists ix_pos_contract_id on pos (contract_id)",
+    # The pos triggers' contract lookups (here and in the rollups) filter on contract_id
+    "ix_contracts_contract_id": "create index if not exists ix_contracts_contract_id on contracts (contract_id)",
+    "ix_po_drift_price_drift": f"create index if not exists ix_po_drift_price_drift on {PO_DRIFT_TABLE} (price_drift)",
+    "ix_po_drift_po_rowid": f"create index if not exists ix_po_drift_po_rowid on {PO_DRIFT_TABLE} (po_rowid)",
+    "ix_po_drift_contract_id": f"create index if not exists ix_po_drift_contract_id on {PO_DRIFT_TABLE} (contract_id)",
+    # Serves the keyset pagination order (see PAGE_QUERY) without a sort
+    "ix_po_drift_page": f"create index if not exists ix_po_drift_page on {PO_DRIFT_TABLE} (price_drift desc, po_id, po_rowid)",
+}
+
+
+def _installed(conn, kind):
+    rows = conn.execute(text("select name from sqlite_master where type = :kind"), {"kind": kind}).fetchall()
+    return {r[0] for r in rows}
+
+
+def _is_current(conn):
+    """Read-only check that po_drift, its triggers and indexes, and the rollups are all in place."""
+    return (
+        inspect(conn).has_table(PO_DRIFT_TABLE)
+        and (set(_TRIGGERS) | set(_CONTRACT_TRIGGERS)) <= _installed(conn, "trigger")
+        and set(_INDEXES) <= _installed(conn, "index")
+        and rollups_current(conn)
+    )
+
+
+def ensure_po_drift(engine, rebuild: bool = False):
+    """
+    Creates the `po_drift` table and the triggers that maintain it on `pos` and
+    `contracts`.
+
+    The table is (re)built from the current `pos` and `contracts` when it does not
+    exist, when `rebuild` is set (the ingestors do this after replacing the tables)
+    or when triggers are missing, which means `pos` or `contracts` was dropped and
+    recreated behind our back and the stored rows no longer match it. The drift
+    rollups (see src.agents.rollups) are kept in step the same way. When all of
+    that is in place, which is the case on every read but the first, this only
+    reads the schema and opens no write transaction.
+    """
+    with engine.connect() as conn:
+        inspector = inspect(conn)
+        if not inspector.has_table("pos") or not inspector.has_table("contracts"):
+            return
+        if not rebuild and _is_current(conn):
+            return
+
+    with engine.begin() as conn:
+        installed = _installed(conn, "trigger")
+        exists = inspect(conn).has_table(PO_DRIFT_TABLE)
+        if rebuild or not exists or not (set(_TRIGGERS) | set(_CONTRACT_TRIGGERS)) <= installed:
+            conn.execute(text(f"drop table if exists {PO_DRIFT_TABLE}"))
+            conn.execute(text(f"""
+                create table {PO_DRIFT_TABLE} (
+                    po_rowid integer not null,
+                    po_id,
+                    contract_id,
+                    contract_unit_price real,
+                    price_drift real
+                )
+            """))
+            conn.execute(text(f"""
+                insert into {PO_DRIFT_TABLE}
+                select p.rowid, p.po_id, p.contract_id, c.contract_unit_price,
+                       p.unit_price * 1.0 / c.contract_unit_price
+                from pos p
+                join contracts c on c.contract_id = p.contract_id
+                where c.contract_unit_price > 0
+            """))
+            print(f"Rebuilt {PO_DRIFT_TABLE} table.")
+
+        for ddl in _INDEXES.values():
+            conn.execute(text(ddl))
+
+        for name, ddl in {**_TRIGGERS, **_CONTRACT_TRIGGERS}.items():
+            if name not in installed:
+                conn.execute(text(ddl))
+
+        # Per-vendor/item daily aggregates maintained by their own triggers on `pos`
+        ensure_rollups(conn, rebuild=rebuild)
+
+
+# Range read on the materialized drifts; pos columns are fetched by rowid for the hits only
+MATERIALIZED_QUERY = f"""
+    select p.*, d.contract_unit_price, d.price_drift
+    from {PO_DRIFT_TABLE} d
+    join pos p on p.rowid = d.po_rowid
+    where d.price_drift > :threshold
+    order by d.price_drift desc
+"""
+
+# Keyset pagination over po_drift, ordered by (price_drift desc, po_id, po_rowid).
+# `{after}` is empty for the first page or PAGE_AFTER_CURSOR for the following ones.
+PAGE_QUERY = f"""
+    select p.*, d.contract_unit_price, d.price_drift, d.po_rowid as _po_rowid
+    from {PO_DRIFT_TABLE} d
+    join pos p on p.rowid = d.po_rowid
+    where d.price_drift > :threshold {{after}}
+    order by d.price_drift desc, d.po_id, d.po_rowid
+    limit :limit
+"""
+
+PAGE_AFTER_CURSOR = """
+    and d.price_drift <= :after_drift
+    and not (d.price_drift = :after_drift
+             and (d.po_id < :after_po or (d.po_id = :after_po and d.po_rowid <= :after_rowid)))
+"""
@@ -1,7 +1,18 @@
 # src/agents/ingestor.py
 import pandas as pd
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, text
 import os
+from src.agents.price_detector import reset_incremental_state
+from src.agents.drift_table import ensure_po_drift
+from src.tools.result_cache import bump_data_version
+from src.tools import columnar_store
+from src.tools.bulk_loader import bulk_load
+
+def create_indexes(engine):
+    """Indexes the PO <-> contract join key used by the drift queries."""
+    with engine.begin() as conn:
+        conn.execute(text("create index if not exists ix_pos_contract_id on pos (contract_id)"))
+        conn.execute(text("create index if not exists ix_contracts_contract_id on contracts (contract_id)"))
 
 def run():
     print("Ingesting data...")
@@ -12,10 +23,20 @@ def run():
     
     try:
         contracts_df = pd.read_csv(f"{public_data_dir}/contracts.csv")
-        contracts_df.to_sql("contracts", engine, if_exists="replace", index=False)
+        bulk_load(contracts_df, "contracts", engine)
         
         pos_df = pd.read_csv(f"{public_data_dir}/pos.csv")
-        pos_df.to_sql("pos", engine, if_exists="replace", index=False)
+        bulk_load(pos_df, "pos", engine)
+
+        if columnar_store.COLUMNAR_BACKEND:
+            columnar_store.write_table(contracts_df, "contracts")
+            columnar_store.write_table(pos_df, "pos")
+
+        # Both tables were replaced, so indexes and triggers are gone and derived drift data is stale
+        create_indexes(engine)
+        ensure_po_drift(engine, rebuild=True)
+        reset_incremental_state(engine)
+        bump_data_version(engine)
         
         print("Data ingestion complete.")
     except FileNotFoundError as e:
@@ -0,0 +1,378 @@
+# src/agents/po_stream.py
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import pandas as pd
+from sqlalchemy import text
+from src.agents.drift_table import ensure_po_drift
+from src.tools import columnar_store
+from src.tools.bulk_loader import bulk_load
+from src.tools.result_cache import bump_data_version
+
+# Streaming enforcement: POs arrive as events from a source, are checked against
+# the in-memory contract price index as they arrive, and are written to `pos` in
+# batches. "queue" is an in-process asyncio queue (POST /api/po-events and
+# simulate-traffic feed it), "file:<path>" tails an NDJSON file, "broker:<path>"
+# consumes a SQLite-backed topic (see SQLiteBroker); "off" disables the consumer.
+ENFORCEMENT_SOURCE = os.getenv("ENFORCEMENT_SOURCE", "queue")
+# Events held by the in-process queue before producers have to wait
+ENFORCEMENT_QUEUE_SIZE = int(os.getenv("ENFORCEMENT_QUEUE_SIZE", "100000"))
+# POs per DB write, and the longest a checked PO waits to be written
+ENFORCEMENT_BATCH_SIZE = int(os.getenv("ENFORCEMENT_BATCH_SIZE", "5000"))
+ENFORCEMENT_FLUSH_S = float(os.getenv("ENFORCEMENT_FLUSH_S", "0.5"))
+# Checked POs waiting for the DB before the consumer stops reading its source
+ENFORCEMENT_MAX_PENDING = int(os.getenv("ENFORCEMENT_MAX_PENDING", "50000"))
+# Attempts at writing a batch (flush_s apart) before it is moved to the dead-letter table
+ENFORCEMENT_MAX_RETRIES = int(os.getenv("ENFORCEMENT_MAX_RETRIES", "3"))
+
+# POs whose batch could not be written, one JSON document per PO, for inspection or replay
+DEAD_LETTER_TABLE = "po_dead_letter"
+
+PO_COLUMNS = ['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id']
+
+_CLOSE = object()
+
+
+class QueueSource:
+    """In-process source; `put` waits while the queue is full, which is the producers' backpressure."""
+
+    def __init__(self, maxsize: int = ENFORCEMENT_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    async def put(self, po):
+        await self.queue.put(po)
+
+    async def put_many(self, pos):
+        for po in pos:
+            await self.queue.put(po)
+
+    async def close(self):
+        await self.queue.put(_CLOSE)
+
+    async def batches(self, max_batch):
+        while True:
+            item = await self.queue.get()
+            if item is _CLOSE:
+                return
+            batch = [item]
+            while len(batch) < max_batch:
+                try:
+                    item = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _CLOSE:
+                    yield batch
+                    return
+                batch.append(item)
+            yield batch
+
+
+class FileTailSource:
+    """
+    Tails an NDJSON file of PO events (one JSON object per line), like `tail -f`.
+    Starts at the end of the file unless `from_start`; a line is only read once
+    its newline has been written. Stops at the end of the file if `follow` is off.
+    """
+
+    def __init__(self, path, from_start: bool = False, follow: bool = True, poll_s: float = 0.1):
+        self.path = path
+        self.from_start = from_start
+        self.follow = follow
+        self.poll_s = poll_s
+        self.invalid = 0
+        self._partial = ""
+
+    def _read_lines(self, f, max_lines):
+        lines = []
+        while len(lines) < max_lines:
+            line = f.readline()
+            if not line:
+                break
+            if not line.endswith("\n"):
+                # The writer is mid-line; the rest comes with a later read
+                self._partial += line
+                break
+            lines.append(self._partial + line)
+            self._partial = ""
+        return lines
+
+    def _parse(self, lines):
+        events = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                events.append(json.loads(line))
+            except json.JSONDecodeError:
+                self.invalid += 1
+        return events
+
+    async def batches(self, max_batch):
+        while not os.path.exists(self.path):
+            if not self.follow:
+                return
+            await asyncio.sleep(self.poll_s)
+        with open(self.path) as f:
+            if not self.from_start:
+                f.seek(0, os.SEEK_END)
+            while True:
+                lines = await asyncio.to_thread(self._read_lines, f, max_batch)
+                if lines:
+                    events = self._parse(lines)
+                    if events:
+                        yield events
+                elif not self.follow:
+                    return
+                else:
+                    await asyncio.sleep(self.poll_s)
+
+
+class SQLiteBroker:
+    """
+    Local stand-in for a message broker: an append-only SQLite topic with
+    per-consumer-group committed offsets, so events survive restarts and are
+    delivered at least once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # One connection, used from worker threads one call at a time
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("pragma journal_mode=WAL")
+            self._conn.execute("create table if not exists po_events (offset integer primary key autoincrement, payload text not null)")
+            self._conn.execute("create table if not exists consumer_offsets (consumer_group text primary key, offset integer not null)")
+
+    def publish(self, events):
+        with self._lock, self._conn:
+            self._conn.executemany("insert into po_events (payload) values (?)", [(json.dumps(e),) for e in events])
+
+    def committed(self, group):
+        with self._lock:
+            row = self._conn.execute("select offset from consumer_offsets where consumer_group = ?", (group,)).fetchone()
+        return row[0] if row else 0
+
+    def commit(self, group, offset):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "insert into consumer_offsets (consumer_group, offset) values (?, ?) "
+                "on conflict (consumer_group) do update set offset = excluded.offset",
+                (group, offset),
+            )
+
+    def fetch(self, after, limit):
+        with self._lock:
+            return self._conn.execute("select offset, payload from po_events where offset > ? order by offset limit ?",
+                                      (after, limit)).fetchall()
+
+    def close(self):
+        self._conn.close()
+
+
+class BrokerSource:
+    """Consumes a SQLiteBroker topic as `group`; offsets are committed once the enforcer has written (or dead-lettered) the POs."""
+
+    def __init__(self, broker, group: str = "enforcer", poll_s: float = 0.1, follow: bool = True):
+        self.broker = broker
+        self.group = group
+        self.poll_s = poll_s
+        self.follow = follow
+        self.position = None
+
+    async def batches(self, max_batch):
+        self.position = await asyncio.to_thread(self.broker.committed, self.group)
+        while True:
+            rows = await asyncio.to_thread(self.broker.fetch, self.position, max_batch)
+            if not rows:
+                if not self.follow:
+                    return
+                await asyncio.sleep(self.poll_s)
+                continue
+            self.position = rows[-1][0]
+            yield [json.loads(payload) for _, payload in rows]
+
+    async def commit(self, position):
+        await asyncio.to_thread(self.broker.commit, self.group, position)
+
+
+def make_source(spec: str = ENFORCEMENT_SOURCE):
+    """Builds the source named by ENFORCEMENT_SOURCE, or None for "off"."""
+    if not spec or spec == "off":
+        return None
+    if spec == "queue":
+        return QueueSource()
+    kind, _, path = spec.partition(":")
+    if kind == "file" and path:
+        return FileTailSource(path)
+    if kind == "broker" and path:
+        return BrokerSource(SQLiteBroker(path))
+    raise ValueError(f"Unknown enforcement source: {spec}")
+
+
+class PoEnforcer:
+    """
+    Checks each PO event against a ContractPriceIndex as soon as it is read and
+    hands the ones above the drift threshold to `on_flagged(rows)` right away.
+    All valid POs are then appended to `pos` in batches of `batch_size` (or
+    after `flush_s`), one write at a time on a worker thread; the po_drift
+    triggers and the data version bump make them visible to the rest of the app.
+    While a write is running and `max_pending` checked POs are waiting behind
+    it, the consumer stops reading from its source. A batch that still fails
+    after `max_retries` attempts is moved to DEAD_LETTER_TABLE (or, if even that
+    fails, dropped and counted) so that the stream keeps moving.
+    """
+
+    def __init__(self, engine, index, drift_threshold: float | None = None, on_flagged=None,
+                 batch_size: int = ENFORCEMENT_BATCH_SIZE, flush_s: float = ENFORCEMENT_FLUSH_S,
+                 max_pending: int = ENFORCEMENT_MAX_PENDING, max_retries: int = ENFORCEMENT_MAX_RETRIES):
+        self.engine = engine
+        self.index = index
+        self.drift_threshold = drift_threshold
+        self.on_flagged = on_flagged
+        self.batch_size = batch_size
+        self.flush_s = flush_s
+        self.max_pending = max_pending
+        self.max_retries = max(1, max_retries)
+        self._pending = []
+        self._writing = None
+        self._flush_lock = asyncio.Lock()
+        self._last_flush = time.monotonic()
+        self.started_at = None
+        self.consumed = 0
+        self.flagged = 0
+        self.invalid = 0
+        self.written = 0
+        self.flushes = 0
+        self.write_errors = 0
+        self.dead_lettered = 0
+        self.dropped = 0
+        self.backpressure_waits = 0
+
+    def check(self, batch):
+        """Returns the valid POs of `batch` and, separately, the flagged ones with their drift."""
+        valid, flagged = [], []
+        for po in batch:
+            try:
+                unit_price = float(po["unit_price"])
+            except (KeyError, TypeError, ValueError):
+                self.invalid += 1
+                continue
+            verdict = self.index.check(po.get("contract_id"), unit_price, self.drift_threshold)
+            valid.append(po)
+            if verdict["block"]:
+                flagged.append({**po, "contract_unit_price": verdict["contract_unit_price"],
+                                "price_drift": verdict["price_drift"]})
+        return valid, flagged
+
+    async def run(self, source):
+        """Consumes `source` until it ends (or the task is cancelled), then writes what is left."""
+        self.started_at = time.time()
+        if not self.index.loaded:
+            await asyncio.to_thread(self.index.refresh)
+        ticker = asyncio.create_task(self._tick(source))
+        try:
+            async for batch in source.batches(self.batch_size):
+                valid, flagged = self.check(batch)
+                self.consumed += len(batch)
+                if flagged:
+                    self.flagged += len(flagged)
+                    if self.on_flagged is not None:
+                        self.on_flagged(flagged)
+                self._pending.extend(valid)
+                if len(self._pending) >= self.batch_size:
+                    await self._flush(source)
+        finally:
+            ticker.cancel()
+            await self._flush(source, wait=True)
+
+    async def _tick(self, source):
+        # Writes POs that have waited flush_s when the stream goes quiet
+        while True:
+            await asyncio.sleep(self.flush_s)
+            if self._pending and time.monotonic() - self._last_flush >= self.flush_s:
+                await self._flush(source)
+
+    async def _flush(self, source, wait=False):
+        # The consumer and the ticker both flush; the lock keeps writes (and offset commits) in order
+        async with self._flush_lock:
+            await self._flush_locked(source, wait)
+
+    async def _flush_locked(self, source, wait):
+        if self._writing is not None and not self._writing.done():
+            if len(self._pending) < self.max_pending and not wait:
+                # Keep accumulating behind the running write
+                return
+            if not wait:
+                self.backpressure_waits += 1
+            await asyncio.shield(self._writing)
+        if self._pending:
+            rows, self._pending = self._pending, []
+            self._last_flush = time.monotonic()
+            self._writing = asyncio.create_task(self._write(rows, source, getattr(source, "position", None)))
+        if wait and self._writing is not None:
+            await asyncio.shield(self._writing)
+
+    async def _write(self, rows, source, position):
+        # Retried here rather than re-queued, so later batches still wait for this one
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self._write_rows, rows)
+            except Exception as e:
+                print(f"Enforcement write of {len(rows)} POs failed (attempt {attempt}/{self.max_retries}): {e}")
+                self.write_errors += 1
+                if attempt == self.max_retries:
+                    await asyncio.to_thread(self._dead_letter, rows, e)
+                else:
+                    await asyncio.sleep(self.flush_s)
+                continue
+            self.written += len(rows)
+            self.flushes += 1
+            break
+        # Written or set aside: either way the source may move past these events
+        if position is not None and hasattr(source, "commit"):
+            await source.commit(position)
+
+    def _dead_letter(self, rows, error):
+        records = [{"failed_at": time.time(), "error": str(error), "po": json.dumps(po, default=str)} for po in rows]
+        try:
+            with self.engine.begin() as conn:
+                conn.execute(text(f"create table if not exists {DEAD_LETTER_TABLE} (failed_at real, error text, po text)"))
+                conn.execute(text(f"insert into {DEAD_LETTER_TABLE} (failed_at, error, po) values (:failed_at, :error, :po)"),
+                             records)
+        except Exception as e:
+            print(f"Dropping {len(rows)} POs, dead-letter write failed: {e}")
+            self.dropped += len(rows)
+            return
+        self.dead_lettered += len(rows)
+
+    def _write_rows(self, rows):
+        # Only the pos columns: unknown keys in an event must not break this or any later write
+        df = pd.DataFrame.from_records(rows).reindex(columns=PO_COLUMNS)
+        bulk_load(df, "pos", self.engine, if_exists="append")
+        # No-op once the triggers exist; (re)builds po_drift if this write created `pos`
+        ensure_po_drift(self.engine)
+        if columnar_store.COLUMNAR_BACKEND:
+            columnar_store.append_table(df, "pos")
+        bump_data_version(self.engine)
+
+    def stats(self):
+        elapsed = time.time() - self.started_at if self.started_at else 0
+        return {
+            "consumed": self.consumed,
+            "flagged": self.flagged,
+            "invalid": self.invalid,
+            "written": self.written,
+            "pending": len(self._pending),
+            "flushes": self.flushes,
+            "write_errors": self.write_errors,
+            "dead_lettered": self.dead_lettered,
+            "dropped": self.dropped,
+            "backpressure_waits": self.backpressure_waits,
+            "consumed_per_s": round(self.consumed / elapsed, 1) if elapsed > 0 else None,
+        }
@@ -1,100 +1,589 @@
 # src/agents/price_detector.py
 import pandas as pd
+import numpy as np
+import base64
+import hashlib
+import json
+import multiprocessing
 import os
-from sqlalchemy import create_engine, inspect
-from src.tools.llm_client import summarize_drift_with_gemini
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import create_engine, inspect, text
+from src.agents.summarizer import PENDING_SUMMARY, SKIPPED_SUMMARY, SUMMARY_MAX_ROWS, summarize_drifts
+from src.agents.drift_table import MATERIALIZED_QUERY, PAGE_QUERY, PAGE_AFTER_CURSOR, ensure_po_drift
+from src.agents.compact_frames import exact_float64, expand_frame, read_compact
+from src.tools import columnar_store
+from src.tools.thresholds import threshold_ratio
+from src.tools.metrics import DETECTION_DRIFTS, detection_failed, detection_run, detection_stage
 
 # Use the same database URL as the ingestor, with a fallback
 db_url = os.getenv("DATABASE_URL", "sqlite:///data/procure.db")
 engine = create_engine(db_url)
 
-def detect_public_only(drift_threshold: float | None = None):
+# Columns the frontend expects on every drift row
+RESULT_COLUMNS = ['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary']
+
+# "full" re-reads both tables on every call, "incremental" only evaluates POs
+# added since the last run (see _detect_incremental), "sql" runs the join and
+# threshold filter inside the database (see _read_drifts_sql), "materialized"
+# range-reads the trigger-maintained po_drift table (see drift_table.py) and
+# "columnar" scans the Arrow/Parquet copy written by the ingestors, "parallel"
+# runs the full join in worker processes, one contract_id hash shard each, and
+# "compact" runs it in-process on categorical/float32 frames (see compact_frames.py)
+DEFAULT_MODE = os.getenv("DETECTION_MODE", "full")
+# Worker processes (and shards) for "parallel" mode; unset or empty means the CPU count
+DETECTION_WORKERS = int(os.getenv("DETECTION_WORKERS") or os.cpu_count() or 1)
+
+# Incremental mode persists every PO priced above its contract (drift > 1.0), so any
+# threshold the dashboard slider can produce (0-100%) is answered from the stored rows.
+INCREMENTAL_FLOOR = 1.0
+INCREMENTAL_STATE_TABLE = "drift_state"
+INCREMENTAL_RESULTS_TABLE = "drift_results"
+
+
+def _empty_result():
+    return pd.DataFrame(columns=RESULT_COLUMNS)
+
+
+def _merge_and_filter(pos_df, contracts_df, threshold):
+    """
+    Joins POs to their contracts and keeps the rows whose unit price exceeds
+    the contract price by more than `threshold` (a ratio). Returns the result
+    columns without the summary.
+    """
+    with detection_stage("merge"):
+        # Ensure contract_id is the same type in both dataframes
+        pos_df['contract_id'] = pos_df['contract_id'].astype(str)
+        contracts_df['contract_id'] = contracts_df['contract_id'].astype(str)
+
+        # Merge POs with contracts
+        merged_df = pd.merge(pos_df, contracts_df, on="contract_id", how="left", suffixes=('_po', '_contract'))
+
+    with detection_stage("filter"):
+        # Detect price drift on POs with a (positive) contract price, like the SQL
+        # modes; a zero price would give an infinite drift. Only flagged rows are copied.
+        price_drift = merged_df['unit_price'] / merged_df['contract_unit_price']
+        flagged = (merged_df['contract_unit_price'] > 0) & (price_drift > threshold)
+        drifts = merged_df[flagged].assign(price_drift=price_drift[flagged])
+
+    # Rename columns to match frontend expectation
+    drifts.rename(columns={
+        'vendor_id_po': 'vendor_id',
+        'item_id_po': 'item_id'
+    }, inplace=True)
+
+    return _with_result_columns(drifts)
+
+
+def _with_result_columns(drifts):
+    """Adds missing result columns (except the summary) and drops everything else."""
+    for col in RESULT_COLUMNS[:-1]:
+        if col not in drifts.columns:
+            drifts[col] = None
+
+    return drifts[RESULT_COLUMNS[:-1]]
+
+
+# Join, ratio and threshold predicate evaluated by the database, so only flagged
+# rows are transferred. Relies on the contract_id indexes created by the ingestors.
+DRIFT_QUERY = """
+    select p.*, c.contract_unit_price, p.unit_price * 1.0 / c.contract_unit_price as price_drift
+    from pos p
+    join contracts c on c.contract_id = p.contract_id
+    where c.contract_unit_price > 0
+      and p.unit_price * 1.0 / c.contract_unit_price > :threshold
+"""
+
+
+def _read_drifts_sql(threshold):
+    drifts = pd.read_sql(text(DRIFT_QUERY), engine, params={"threshold": threshold})
+    return _with_result_columns(drifts)
+
+
+def _read_drifts_materialized(threshold):
+    # Installs and backfills po_drift the first time; a no-op afterwards
+    ensure_po_drift(engine)
+    drifts = pd.read_sql(text(MATERIALIZED_QUERY), engine, params={"threshold": threshold})
+    return _with_result_columns(drifts)
+
+
+def _read_drifts_compact(threshold):
+    """
+    Full detection over compact frames, or None if either table is empty. The
+    join only carries PO row numbers and contract prices (categorical contract_id
+    codes on both sides); the other PO columns are taken, and expanded back to
+    plain dtypes, for the flagged rows only.
+    """
+    with detection_stage("read"):
+        pos = read_compact("select * from pos", engine)
+        contracts = read_compact("select contract_id, contract_unit_price from contracts", engine)
+    if pos.empty or contracts.empty:
+        return None
+
+    with detection_stage("merge"):
+        contracts = contracts[contracts['contract_id'].notna() & (contracts['contract_unit_price'] > 0)]
+        keys = pd.CategoricalDtype(pos['contract_id'].cat.categories.union(contracts['contract_id'].cat.categories))
+        probe = pd.DataFrame({'contract_id': pos['contract_id'].astype(keys), '_row': np.arange(len(pos))})
+        build = pd.DataFrame({'contract_id': contracts['contract_id'].astype(keys).values,
+                              'contract_unit_price': contracts['contract_unit_price'].to_numpy()})
+        joined = probe[probe['contract_id'].notna()].merge(build, on='contract_id', how='inner')
+
+    with detection_stage("filter"):
+        rows = joined['_row'].to_numpy()
+        contract_price = joined['contract_unit_price'].to_numpy()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            drift = pos['unit_price'].to_numpy()[rows].astype(np.float64) / contract_price.astype(np.float64)
+        # float32 rounds prices, so keep borderline rows and re-check them on the exact values
+        keep = drift > threshold * (1 - 1e-6)
+        drifts = expand_frame(pos.iloc[rows[keep]])
+        drifts['contract_unit_price'] = exact_float64(pd.Series(contract_price[keep], index=drifts.index))
+        drifts['price_drift'] = drifts['unit_price'] / drifts['contract_unit_price']
+        drifts = drifts[drifts['price_drift'] > threshold]
+    return _with_result_columns(drifts)
+
+
+def _summarize(drifts, on_late_summary=None):
+    """
+    Fills `gemini_summary` for the rows of `drifts` (the first SUMMARY_MAX_ROWS
+    when that cap is set), which must already be in display order with a 0..n-1
+    index; the time budget decides how many finish. Summaries that miss the
+    time budget are marked pending and passed to `on_late_summary(position, text)`
+    once they arrive; without a callback they are reported as skipped.
+    """
+    # Summarize the top drifts concurrently, within the time budget
+    top = drifts if SUMMARY_MAX_ROWS is None else drifts.head(SUMMARY_MAX_ROWS)
+    rows = list(zip(top.index, top['contract_unit_price'], top['unit_price']))
+    summaries = summarize_drifts(rows, on_late=on_late_summary)
+
+    unfinished = PENDING_SUMMARY if on_late_summary is not None else SKIPPED_SUMMARY
+    drifts['gemini_summary'] = SKIPPED_SUMMARY
+    drifts.loc[top.index, 'gemini_summary'] = unfinished
+    for idx, summary in summaries.items():
+        drifts.at[idx, 'gemini_summary'] = summary
+    return drifts
+
+
+def _json_safe(drifts):
+    # Replace NaN/Inf with None for JSON serialization
+    drifts = drifts.replace([float('inf'), float('-inf')], None)
+    return drifts.where(pd.notnull(drifts), None)
+
+
+def _finalize(drifts, on_late_summary=None, json_safe=True, presorted=False):
+    """
+    Sorts by drift (0..n-1 index) unless `presorted`, adds the Gemini summaries
+    and, unless `json_safe` is off, replaces NaN/Inf with None. Callers that
+    serialize with `DataFrame.to_json` (which already writes null for them) skip that copy.
+    """
+    if not presorted:
+        with detection_stage("sort"):
+            drifts = drifts.sort_values('price_drift', ascending=False)
+    drifts = drifts.reset_index(drop=True)
+    with detection_stage("summarize"):
+        drifts = _summarize(drifts, on_late_summary)
+    with detection_stage("serialize"):
+        if json_safe:
+            drifts = _json_safe(drifts)
+        return drifts[RESULT_COLUMNS]
+
+
+def _read_drifts_columnar(threshold):
+    """
+    Drift detection over the columnar store. Only contract_id and unit_price are
+    read from the (memory-mapped) pos table for the join and filter; the other
+    columns are fetched for the flagged rows only.
+    """
+    # One version of pos for both reads, even if the ingestor replaces it in between
+    pos_parts = columnar_store.list_parts("pos")
+    pos = columnar_store.read_table("pos", columns=["contract_id", "unit_price"], parts=pos_parts)
+    contracts = columnar_store.read_table("contracts", columns=["contract_id", "contract_unit_price"])
+
+    # Same key normalization as the pandas path, which compares contract_id as str
+    probe = pa.table({
+        "contract_id": pc.cast(pos["contract_id"], pa.string()),
+        "unit_price": pc.cast(pos["unit_price"], pa.float64()),
+        "_row": pa.array(np.arange(pos.num_rows)),
+    })
+    contracts = contracts.set_column(0, "contract_id", pc.cast(contracts["contract_id"], pa.string()))
+    joined = probe.join(contracts, "contract_id", join_type="inner")
+    joined = joined.filter(pc.fill_null(pc.greater(joined["contract_unit_price"], 0), False))
+
+    price_drift = pc.divide(joined["unit_price"], pc.cast(joined["contract_unit_price"], pa.float64()))
+    flagged = pc.greater(price_drift, threshold)
+    hits = joined.filter(flagged)
+
+    drifts = columnar_store.take_rows("pos", hits["_row"].to_numpy(), parts=pos_parts).to_pandas()
+    drifts["contract_id"] = drifts["contract_id"].astype(str)
+    drifts["contract_unit_price"] = hits["contract_unit_price"].to_numpy()
+    drifts["price_drift"] = price_drift.filter(flagged).to_numpy()
+    return _with_result_columns(drifts)
+
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _get_pool(workers):
+    """Process pool reused across calls; spawned so workers don't inherit the API's threads."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+    return _pool
+
+
+def _shard_contracts(contracts_df, shards):
+    """Splits contracts into `shards` groups by a stable hash of contract_id (as text, like the merge key)."""
+    hashes = pd.util.hash_pandas_object(contracts_df['contract_id'].astype(str), index=False).to_numpy()
+    shard_of = hashes % shards
+    return [contracts_df[shard_of == i] for i in range(shards)]
+
+
+def _detect_shard(database_url, contracts_df, threshold):
+    """
+    Process pool task: reads the POs of one contract shard and runs merge, ratio
+    and filter on them. Returns the drifts sorted by price_drift, descending.
+    """
+    shard_engine = create_engine(database_url)
+    try:
+        with shard_engine.begin() as conn:
+            # Only this shard's POs cross into the process; the join uses ix_pos_contract_id
+            conn.execute(text("create temp table shard_contracts (contract_id)"))
+            ids = contracts_df['contract_id'].drop_duplicates().tolist()
+            if ids:
+                conn.execute(text("insert into shard_contracts (contract_id) values (:c)"), [{"c": c} for c in ids])
+            pos_df = pd.read_sql(text("select p.* from pos p join shard_contracts s on p.contract_id = s.contract_id"), conn)
+    finally:
+        shard_engine.dispose()
+
+    if pos_df.empty:
+        return _empty_result().drop(columns=['gemini_summary'])
+    drifts = _merge_and_filter(pos_df, contracts_df.copy(), threshold)
+    return drifts.sort_values('price_drift', ascending=False, kind='stable').reset_index(drop=True)
+
+
+def _merge_shards(shards):
+    """
+    Combines shard results into one frame sorted by price_drift (descending).
+    Ties keep shard order, then each shard's own order, since the sort is stable.
+    """
+    shards = [s for s in shards if len(s)]
+    if not shards:
+        return _empty_result().drop(columns=['gemini_summary'])
+    merged = pd.concat(shards, ignore_index=True)
+    order = np.argsort(-merged['price_drift'].to_numpy(dtype=float), kind='stable')
+    return merged.iloc[order]
+
+
+def _detect_parallel(threshold, workers=None):
+    """
+    Full detection spread over `workers` processes: contracts are hash-partitioned
+    by contract_id, each worker joins its shard's POs, and the sorted shard
+    results are merged on price_drift.
+    """
+    workers = workers or DETECTION_WORKERS
+    contracts_df = pd.read_sql("select * from contracts", engine)
+    database_url = engine.url.render_as_string(hide_password=False)
+    in_memory = engine.dialect.name == "sqlite" and engine.url.database in (None, "", ":memory:")
+    if in_memory:
+        # Worker processes can't open an in-memory database
+        drifts = _merge_and_filter(pd.read_sql("select * from pos", engine), contracts_df, threshold)
+        return drifts.sort_values('price_drift', ascending=False, kind='stable')
+    if workers <= 1:
+        return _detect_shard(database_url, contracts_df, threshold)
+
+    shards = _shard_contracts(contracts_df, workers)
+    results = _get_pool(workers).map(_detect_shard, [database_url] * workers, shards, [threshold] * workers)
+    return _merge_shards(list(results))
+
+
+def detect_public_only(drift_threshold: float | None = None, mode: str | None = None, on_late_summary=None,
+                       json_safe: bool = True):
     """
     Detects price drifts in public data.
-    
+
     A "drift" is when a purchase order's unit price is significantly higher than
     the agreed-upon price in the contract.
+
+    `mode` selects how the data is read: "full" (default) rescans both tables,
+    "incremental" only evaluates POs inserted since the previous incremental run,
+    "sql" pushes the join and threshold filter down into the database and
+    "materialized" reads the write-time maintained `po_drift` table,
+    "columnar" reads the Arrow/Parquet files instead of the database,
+    "parallel" runs the full-mode join in DETECTION_WORKERS processes and
+    "compact" runs it on categorical/float32 frames to cut peak memory.
+    Every mode only compares against positive contract prices: POs whose
+    contract price is zero or missing are never flagged.
+
+    `on_late_summary(position, text)` receives AI summaries that finish after
+    the result has been returned (see summarizer.summarize_drifts). With
+    `json_safe=False` NaN/Inf are left in place for callers using `to_json`.
     """
-    if drift_threshold is None:
-        drift_threshold = 1.05
-    else:
-        drift_threshold = 1 + (drift_threshold / 100.0)
+    mode = mode or DEFAULT_MODE
+    with detection_run(mode):
+        drifts = _detect(threshold_ratio(drift_threshold), mode, on_late_summary, json_safe)
+        DETECTION_DRIFTS.labels(mode).observe(len(drifts))
+        return drifts
+
+
+def _detect(threshold, mode, on_late_summary, json_safe):
+    """detect_public_only for a threshold ratio; stages are timed under the caller's mode."""
+    if mode == "columnar":
+        if not columnar_store.has_table("pos") or not columnar_store.has_table("contracts"):
+            print("Columnar data not found. Please run the ingestor with COLUMNAR_BACKEND=1.")
+            return _empty_result()
+        try:
+            with detection_stage("read"):
+                drifts = _read_drifts_columnar(threshold)
+        except Exception as e:
+            print(f"Error reading columnar data: {e}")
+            detection_failed()
+            return _empty_result()
+        return _finalize(drifts, on_late_summary, json_safe)
 
     inspector = inspect(engine)
     if not inspector.has_table("pos") or not inspector.has_table("contracts"):
         print("Database tables not found. Please run the ingestor first.")
         # Return an empty dataframe with the expected columns
-        return pd.DataFrame(columns=['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary'])
+        return _empty_result()
+
+    if mode == "incremental":
+        if threshold < INCREMENTAL_FLOOR:
+            # Stored results only cover drifts above the floor
+            mode = "full"
+        else:
+            try:
+                with detection_stage("read"):
+                    drifts = _detect_incremental(threshold)
+            except Exception as e:
+                print(f"Error during incremental detection: {e}")
+                detection_failed()
+                return _empty_result()
+            return _finalize(drifts, on_late_summary, json_safe)
+
+    if mode in ("sql", "materialized"):
+        reader = _read_drifts_sql if mode == "sql" else _read_drifts_materialized
+        try:
+            with detection_stage("read"):
+                drifts = reader(threshold)
+        except Exception as e:
+            print(f"Error reading from database: {e}")
+            detection_failed()
+            return _empty_result()
+        return _finalize(drifts, on_late_summary, json_safe)
+
+    if mode == "compact":
+        try:
+            drifts = _read_drifts_compact(threshold)
+        except Exception as e:
+            print(f"Error during compact detection: {e}")
+            detection_failed()
+            return _empty_result()
+        if drifts is None:
+            print("No data in POs or contracts table.")
+            return _empty_result()
+        return _finalize(drifts, on_late_summary, json_safe)
+
+    if mode == "parallel":
+        try:
+            # Merge and filter happen in the worker processes
+            with detection_stage("shards"):
+                drifts = _detect_parallel(threshold)
+        except Exception as e:
+            print(f"Error during parallel detection: {e}")
+            detection_failed()
+            return _empty_result()
+        return _finalize(drifts, on_late_summary, json_safe, presorted=True)
+
+    if mode != "full":
+        raise ValueError(f"Unknown detection mode: {mode}")
 
     try:
-        pos_df = pd.read_sql("select * from pos", engine)
-        contracts_df = pd.read_sql("select * from contracts", engine)
+        with detection_stage("read"):
+            pos_df = pd.read_sql("select * from pos", engine)
+            contracts_df = pd.read_sql("select * from contracts", engine)
     except Exception as e:
         print(f"Error reading from database: {e}")
-        return pd.DataFrame(columns=['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary'])
+        detection_failed()
+        return _empty_result()
 
     if pos_df.empty or contracts_df.empty:
         print("No data in POs or contracts table.")
-        return pd.DataFrame(columns=['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary'])
-
-    # Ensure contract_id is the same type in both dataframes
-    pos_df['contract_id'] = pos_df['contract_id'].astype(str)
-    contracts_df['contract_id'] = contracts_df['contract_id'].astype(str)
-
-    # Merge POs with contracts
-    merged_df = pd.merge(pos_df, contracts_df, on="contract_id", how="left", suffixes=('_po', '_contract'))
-    
-    # Filter for POs with a contract
-    contracted_pos = merged_df[merged_df['contract_unit_price'].notna()].copy()
-    
-    if contracted_pos.empty:
-        return pd.DataFrame(columns=['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary'])
-
-    # Detect price drift
-    contracted_pos['price_drift'] = contracted_pos['unit_price'] / contracted_pos['contract_unit_price']
-    
-    drifts = contracted_pos[contracted_pos['price_drift'] > drift_threshold].copy()
-    
-    # Add Gemini summary - OPTIMIZED: Only summarize top 5 to prevent timeout
-    drifts.sort_values('price_drift', ascending=False, inplace=True)
-    
-    # Initialize with None
-    drifts['gemini_summary'] = None
-    
-    # Take top 5 for AI summary
-    top_5_indices = drifts.index[:5]
-    
-    # Apply Gemini only to top 5
-    for idx in top_5_indices:
-        row = drifts.loc[idx]
-        drifts.at[idx, 'gemini_summary'] = summarize_drift_with_gemini(row['contract_unit_price'], row['unit_price'])
-        
-    # Fill the rest with a static message
-    drifts['gemini_summary'] = drifts['gemini_summary'].fillna("Drift detected (AI summary skipped for speed)")
+        return _empty_result()
 
-    # Rename columns to match frontend expectation
-    drifts.rename(columns={
-        'vendor_id_po': 'vendor_id',
-        'item_id_po': 'item_id'
-    }, inplace=True)
-    
-    # Ensure we return the columns the frontend expects
-    cols_to_keep = ['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id', 'contract_unit_price', 'price_drift', 'gemini_summary']
-    
-    # Filter for columns that actually exist
-    existing_cols = [c for c in cols_to_keep if c in drifts.columns]
-    
-    # Add missing columns with default values if they don't exist
-    for col in cols_to_keep:
-        if col not in drifts.columns:
-            drifts[col] = None
+    drifts = _merge_and_filter(pos_df, contracts_df, threshold)
 
-    # Replace NaN/Inf with None for JSON serialization
-    drifts = drifts.replace([float('inf'), float('-inf')], None)
-    drifts = drifts.where(pd.notnull(drifts), None)
+    return _finalize(drifts, on_late_summary, json_safe)
+
+
+def encode_cursor(values) -> str:
+    """Opaque pagination cursor for a JSON-serializable list of sort-key values."""
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def detect_page(drift_threshold: float | None = None, limit: int = 100, cursor: str | None = None,
+                summarize: bool = True, json_safe: bool = True):
+    """
+    Returns one page of drifts as (drifts, next_cursor), ordered by price_drift
+    (descending), then po_id. Pages are read from the po_drift table with keyset
+    pagination, so a page costs the same wherever it is in the result set and
+    nothing but the page is held in memory. `next_cursor` is None on the last page.
+    A cursor records the threshold it was issued for and is rejected (ValueError)
+    when used with a different one.
+    """
+    threshold = threshold_ratio(drift_threshold)
+    inspector = inspect(engine)
+    if not inspector.has_table("pos") or not inspector.has_table("contracts"):
+        return _empty_result(), None
+
+    params = {"threshold": threshold, "limit": limit + 1}
+    query = PAGE_QUERY.format(after="")
+    if cursor:
+        values = decode_cursor(cursor)
+        if not isinstance(values, list) or len(values) != 4:
+            raise ValueError("Invalid cursor")
+        if values[3] != threshold:
+            raise ValueError("Cursor was issued for a different drift_threshold")
+        params.update(after_drift=values[0], after_po=values[1], after_rowid=values[2])
+        query = PAGE_QUERY.format(after=PAGE_AFTER_CURSOR)
+
+    ensure_po_drift(engine)
+    page = pd.read_sql(text(query), engine, params=params)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page.iloc[:limit]
+        last = page.iloc[-1]
+        po_id = last['po_id'].item() if isinstance(last['po_id'], np.generic) else last['po_id']
+        next_cursor = encode_cursor([float(last['price_drift']), po_id, int(last['_po_rowid']), threshold])
+
+    drifts = _with_result_columns(page).reset_index(drop=True)
+    if summarize:
+        drifts = _summarize(drifts)
+    else:
+        drifts['gemini_summary'] = SKIPPED_SUMMARY
+    if json_safe:
+        drifts = _json_safe(drifts)
+    return drifts[RESULT_COLUMNS], next_cursor
+
+
+def iter_drift_batches(drift_threshold: float | None = None, batch_size: int = 1000):
+    """
+    Yields the full drift result set as frames of `batch_size` rows, walking the
+    keyset pages. Only the first (top) batch is sent for AI summaries.
+    """
+    cursor = None
+    first = True
+    while True:
+        batch, cursor = detect_page(drift_threshold, limit=batch_size, cursor=cursor, summarize=first, json_safe=False)
+        first = False
+        if len(batch):
+            yield batch
+        if cursor is None:
+            return
+
+
+def _contracts_fingerprint(conn):
+    """Cheap signature of the contracts table; changes when contracts are reloaded or edited."""
+    row = conn.execute(text("select count(*), max(rowid), total(contract_unit_price) from contracts")).fetchone()
+    return f"{row[0]}:{row[1]}:{row[2]}"
+
+
+def _pos_identity(conn, rowid):
+    """
+    Identifies the `pos` table as seen at `rowid`: its root page (new whenever the
+    table is dropped and recreated, or rebuilt by VACUUM) plus a hash of the row
+    stored under that rowid. A replaced table, whatever its size, or renumbered
+    rowids give a different token.
+    """
+    rootpage = conn.execute(text("select rootpage from sqlite_master where type = 'table' and name = 'pos'")).scalar()
+    row = conn.execute(text("select * from pos where rowid = :rowid"), {"rowid": rowid}).fetchone()
+    digest = hashlib.sha1(repr(tuple(row)).encode()).hexdigest() if row is not None else ""
+    return f"{rootpage}:{digest}"
+
+
+def _detect_incremental(threshold):
+    """
+    Evaluates only the POs added since the last run, using the SQLite rowid of the
+    `pos` table as a high-water mark, and merges the new drifts into the persisted
+    `drift_results` table. The stored results are rebuilt from scratch when the
+    contracts change or when `pos` is no longer the table the watermark was taken
+    on (see _pos_identity): replaced by a load of any size, or vacuumed.
+
+    SQLite only: this relies on rowids that only grow for appended rows, which
+    holds for tables without an INTEGER PRIMARY KEY as long as rows are not deleted.
+    """
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        have_results = inspector.has_table(INCREMENTAL_RESULTS_TABLE)
+        state = None
+        if inspector.has_table(INCREMENTAL_STATE_TABLE):
+            columns = {c["name"] for c in inspector.get_columns(INCREMENTAL_STATE_TABLE)}
+            # State written before pos_identity existed is treated as missing
+            if "pos_identity" in columns:
+                state = conn.execute(text(
+                    f"select pos_watermark, contracts_fingerprint, pos_identity from {INCREMENTAL_STATE_TABLE}"
+                )).fetchone()
+
+        fingerprint = _contracts_fingerprint(conn)
+        high_water = conn.execute(text("select coalesce(max(rowid), 0) from pos")).scalar()
+
+        watermark = 0
+        if (state is not None and have_results and state[1] == fingerprint and state[0] <= high_water
+                and state[2] == _pos_identity(conn, state[0])):
+            watermark = state[0]
+        else:
+            # Contracts changed or pos was replaced: start over
+            conn.execute(text(f"drop table if exists {INCREMENTAL_RESULTS_TABLE}"))
+            have_results = False
+
+        if high_water > watermark or not have_results:
+            new_pos = pd.read_sql(
+                text("select * from pos where rowid > :low and rowid <= :high"),
+                conn,
+                params={"low": watermark, "high": high_water},
+            )
+            contracts_df = pd.read_sql("select * from contracts", conn)
+            new_drifts = _merge_and_filter(new_pos, contracts_df, INCREMENTAL_FLOOR)
+            new_drifts.to_sql(INCREMENTAL_RESULTS_TABLE, conn, if_exists="append", index=False)
+            print(f"Incremental detection evaluated {len(new_pos)} new POs, {len(new_drifts)} drifts stored.")
+
+        conn.execute(text(f"drop table if exists {INCREMENTAL_STATE_TABLE}"))
+        conn.execute(text(
+            f"create table {INCREMENTAL_STATE_TABLE} (pos_watermark integer, contracts_fingerprint text, pos_identity text)"
+        ))
+        conn.execute(
+            text(f"insert into {INCREMENTAL_STATE_TABLE} values (:watermark, :fingerprint, :identity)"),
+            {"watermark": high_water, "fingerprint": fingerprint, "identity": _pos_identity(conn, high_water)},
+        )
+
+        return pd.read_sql(
+            text(f"select * from {INCREMENTAL_RESULTS_TABLE} where price_drift > :threshold"),
+            conn,
+            params={"threshold": threshold},
+        )
+
+
+def reset_incremental_state(db_engine=None):
+    """Drops the incremental watermark and stored drifts; the next incremental run rescans everything."""
+    with (db_engine or engine).begin() as conn:
+        conn.execute(text(f"drop table if exists {INCREMENTAL_STATE_TABLE}"))
+        conn.execute(text(f"drop table if exists {INCREMENTAL_RESULTS_TABLE}"))
 
-    return drifts[cols_to_keep]
 
 def evaluate_with_private_labels():
     # ... (not implemented for now)
-    pass
\ No newline at end of file
+    pass
@@ -0,0 +1,317 @@
+# src/agents/rollups.py
+import datetime
+import os
+from sqlalchemy import inspect, text
+from src.tools.thresholds import threshold_ratio
+
+# Per-vendor and per-item drift aggregates by day, kept up to date by SQLite
+# triggers on `pos` and `contracts` (like po_drift), so that the rolling-window summaries read
+# at most one row per entity and day instead of scanning every PO.
+ROLLUP_TABLE = "drift_rollups"
+ROLLUP_WINDOWS = (7, 30, 90)
+ROLLUP_DIMENSIONS = {"vendor": "vendor_id", "item": "item_id"}
+ROLLUP_SORT_COLUMNS = ("leakage", "drift_count", "max_drift", "po_count")
+# A PO counts as a drift (and its overpayment as leakage) above this percentage,
+# the same default as detect_public_only. Changing it rebuilds the table.
+ROLLUP_DRIFT_THRESHOLD = float(os.getenv("ROLLUP_DRIFT_THRESHOLD", "5"))
+
+_ROLLUP_COLUMNS = {"vendor_id", "item_id", "unit_price", "qty", "date", "contract_id"}
+
+# What each PO added to the rollups (keys, day, drift, drift flag, leakage), by pos
+# rowid. Removing a PO subtracts exactly these values, and a bucket's max drift
+# is recomputed from its entries here through the (key, day, drift) indexes
+# instead of from `pos`.
+ROLLUP_POS_TABLE = "drift_rollup_pos"
+
+# Lowest positive price of the PO's contract, as in the contract price index
+_PRICE = "(select min(contract_unit_price) from contracts where contract_id = {row}.contract_id and contract_unit_price > 0)"
+
+# POs without a unit price, a parseable date or a (positive) contract price have no drift and are left out
+_ADD_PO = """
+    insert or replace into {pos_table} (po_rowid, vendor_id, item_id, day, drift, drifted, leakage)
+    select new.rowid, cast(new.vendor_id as text), cast(new.item_id as text), date(new.date), drift, drift > {ratio},
+           case when drift > {ratio} then (new.unit_price - price) * coalesce(new.qty, 0) else 0 end
+    from (select price, new.unit_price * 1.0 / price as drift from (select {price} as price))
+    where price is not null and new.unit_price is not null and date(new.date) is not null;
+"""
+
+_ADD = """
+    insert into {table} (dimension, entity_id, day, po_count, drift_count, leakage, max_drift)
+    select '{dimension}', {column}, day, 1, drifted, leakage, drift
+    from {pos_table}
+    where po_rowid = new.rowid and {column} is not null
+    on conflict (dimension, entity_id, day) do update set
+        po_count = po_count + 1,
+        drift_count = drift_count + excluded.drift_count,
+        leakage = leakage + excluded.leakage,
+        max_drift = max(max_drift, excluded.max_drift);
+"""
+
+# Sums and counts are subtracted; the max only has to be recomputed when the
+# removed PO held it. Runs before the PO's entry is deleted (see _REMOVE_PO).
+_REMOVE = """
+    update {table} set
+        po_count = po_count - 1,
+        drift_count = drift_count - (select drifted from {pos_table} where po_rowid = old.rowid),
+        leakage = leakage - (select leakage from {pos_table} where po_rowid = old.rowid)
+    where {bucket};
+    update {table} set max_drift = (
+        select max(s.drift) from {pos_table} s
+        where s.{column} = {table}.entity_id and s.day = {table}.day and s.po_rowid != old.rowid
+    )
+    where {bucket} and max_drift <= (select drift from {pos_table} where po_rowid = old.rowid);
+    delete from {table} where {bucket} and po_count <= 0;
+"""
+
+_REMOVE_PO = """
+    delete from {pos_table} where po_rowid = old.rowid;
+"""
+
+_BUCKET = (
+    "dimension = '{dimension}' and (entity_id, day) = "
+    "(select {column}, day from {pos_table} where po_rowid = old.rowid)"
+)
+
+# One pass over pos (contract prices come from the grouped subquery); the
+# rollups are then aggregated from the per-PO table
+_REBUILD_POS = """
+    insert into {pos_table} (po_rowid, vendor_id, item_id, day, drift, drifted, leakage)
+    select p.rowid, cast(p.vendor_id as text), cast(p.item_id as text), date(p.date),
+           p.unit_price * 1.0 / c.price, p.unit_price * 1.0 / c.price > {ratio},
+           case when p.unit_price * 1.0 / c.price > {ratio} then (p.unit_price - c.price) * coalesce(p.qty, 0) else 0 end
+    from pos p
+    join (select contract_id, min(contract_unit_price) as price from contracts
+          where contract_unit_price > 0 group by contract_id) c on c.contract_id = p.contract_id
+    where p.unit_price is not null and date(p.date) is not null
+"""
+
+# A contract change re-derives the entries of that contract's POs (found through
+# ix_pos_contract_id), then re-aggregates every bucket those POs fall in from the
+# per-PO table; run for the old and the new contract_id of an update
+_REFRESH_CONTRACT_POS = """
+    delete from {pos_table} where po_rowid in (select rowid from pos where contract_id = {row}.contract_id);
+    insert into {pos_table} (po_rowid, vendor_id, item_id, day, drift, drifted, leakage)
+    select po_rowid, vendor_id, item_id, day, drift, drift > {ratio},
+           case when drift > {ratio} then (unit_price - price) * qty else 0 end
+    from (
+        select p.rowid as po_rowid, cast(p.vendor_id as text) as vendor_id, cast(p.item_id as text) as item_id,
+               date(p.date) as day, p.unit_price, coalesce(p.qty, 0) as qty, c.price,
+               p.unit_price * 1.0 / c.price as drift
+        from pos p, (select {price} as price) c
+        where p.contract_id = {row}.contract_id and c.price is not null
+          and p.unit_price is not null and date(p.date) is not null
+    );
+"""
+
+_REFRESH_CONTRACT_BUCKETS = """
+    delete from {table} where dimension = '{dimension}' and (entity_id, day) in ({keys});
+    insert into {table} (dimension, entity_id, day, po_count, drift_count, leakage, max_drift)
+    select '{dimension}', {column}, day, count(*), sum(drifted), total(leakage), max(drift)
+    from {pos_table}
+    where ({column}, day) in ({keys})
+    group by {column}, day;
+"""
+
+_CONTRACT_KEYS = "select cast({column} as text), date(date) from pos where contract_id = {row}.contract_id"
+
+_REBUILD = """
+    insert into {table} (dimension, entity_id, day, po_count, drift_count, leakage, max_drift)
+    select '{dimension}', {column}, day, count(*), sum(drifted), total(leakage), max(drift)
+    from {pos_table}
+    where {column} is not null
+    group by {column}, day
+"""
+
+
+def _ratio(threshold):
+    return repr(threshold_ratio(threshold))
+
+
+def _triggers(threshold):
+    ratio = _ratio(threshold)
+    tables = {"table": ROLLUP_TABLE, "pos_table": ROLLUP_POS_TABLE}
+    add = _ADD_PO.format(ratio=ratio, price=_PRICE.format(row="new"), **tables) + "".join(
+        _ADD.format(dimension=dimension, column=column, **tables)
+        for dimension, column in ROLLUP_DIMENSIONS.items()
+    )
+    remove = "".join(
+        _REMOVE.format(column=column, bucket=_BUCKET.format(dimension=dimension, column=column, **tables), **tables)
+        for dimension, column in ROLLUP_DIMENSIONS.items()
+    ) + _REMOVE_PO.format(**tables)
+    return {
+        "trg_pos_rollups_insert": f"create trigger trg_pos_rollups_insert after insert on pos\nbegin{add}end",
+        "trg_pos_rollups_update": (
+            "create trigger trg_pos_rollups_update "
+            "after update of vendor_id, item_id, unit_price, qty, date, contract_id on pos\n"
+            f"begin{remove}{add}end"
+        ),
+        "trg_pos_rollups_delete": f"create trigger trg_pos_rollups_delete after delete on pos\nbegin{remove}end",
+        "trg_contracts_rollups_insert": (
+            "create trigger trg_contracts_rollups_insert after insert on contracts\n"
+            f"begin{_refresh_contract(ratio, 'new')}end"
+        ),
+        "trg_contracts_rollups_update": (
+            "create trigger trg_contracts_rollups_update after update of contract_id, contract_unit_price on contracts\n"
+            f"begin{_refresh_contract(ratio, 'old')}{_refresh_contract(ratio, 'new')}end"
+        ),
+        "trg_contracts_rollups_delete": (
+            "create trigger trg_contracts_rollups_delete after delete on contracts\n"
+            f"begin{_refresh_contract(ratio, 'old')}end"
+        ),
+    }
+
+
+def _refresh_contract(ratio, row):
+    tables = {"table": ROLLUP_TABLE, "pos_table": ROLLUP_POS_TABLE}
+    return _REFRESH_CONTRACT_POS.format(ratio=ratio, row=row, price=_PRICE.format(row=row), **tables) + "".join(
+        _REFRESH_CONTRACT_BUCKETS.format(dimension=dimension, column=column,
+                                         keys=_CONTRACT_KEYS.format(column=column, row=row), **tables)
+        for dimension, column in ROLLUP_DIMENSIONS.items()
+    )
+
+
+def _state(conn, threshold):
+    """(expected triggers, installed rollup triggers, whether pos has the rollup columns)."""
+    triggers = _triggers(threshold)
+    rows = conn.execute(text(
+        "select name, sql from sqlite_master where type = 'trigger' and tbl_name in ('pos', 'contracts')"
+    )).fetchall()
+    # SQLite stores the statement with its leading "CREATE TRIGGER" upper-cased
+    installed = {name: sql.lower() for name, sql in rows if name in triggers}
+    has_columns = _ROLLUP_COLUMNS <= {c["name"] for c in inspect(conn).get_columns("pos")}
+    return triggers, installed, has_columns
+
+
+def rollups_current(conn, threshold: float | None = None) -> bool:
+    """Read-only check: True when ensure_rollups would have nothing to do."""
+    triggers, installed, has_columns = _state(conn, ROLLUP_DRIFT_THRESHOLD if threshold is None else threshold)
+    if not has_columns:
+        return not installed
+    inspector = inspect(conn)
+    return (
+        inspector.has_table(ROLLUP_TABLE)
+        and inspector.has_table(ROLLUP_POS_TABLE)
+        and installed == {name: ddl.lower() for name, ddl in triggers.items()}
+    )
+
+
+def ensure_rollups(conn, rebuild: bool = False, threshold: float | None = None):
+    """
+    Creates the `drift_rollups` table, its per-PO companion and their triggers
+    on `pos` and `contracts` inside the caller's transaction (see
+    ensure_po_drift). Both tables are rebuilt from `pos` and `contracts` when
+    they do not exist, when `rebuild` is set, or when the installed triggers
+    differ from the current ones (missing because `pos` or `contracts` was
+    recreated, or written for another threshold).
+    """
+    threshold = ROLLUP_DRIFT_THRESHOLD if threshold is None else threshold
+    triggers, installed, has_columns = _state(conn, threshold)
+    if not has_columns:
+        # The triggers would make every insert fail on a `pos` without these columns
+        for name in installed:
+            conn.execute(text(f"drop trigger {name}"))
+        return
+    if not rebuild and rollups_current(conn, threshold):
+        return
+
+    for name in installed:
+        conn.execute(text(f"drop trigger {name}"))
+    conn.execute(text(f"drop table if exists {ROLLUP_TABLE}"))
+    conn.execute(text(f"drop table if exists {ROLLUP_POS_TABLE}"))
+    # The pos triggers look up contract prices through ix_contracts_contract_id and the
+    # contracts triggers find their POs through ix_pos_contract_id (both also created
+    # by ensure_po_drift)
+    conn.execute(text("create index if not exists ix_contracts_contract_id on contracts (contract_id)"))
+    conn.execute(text("create index if not exists ix_pos_contract_id on pos (contract_id)"))
+    conn.execute(text(f"""
+        create table {ROLLUP_POS_TABLE} (
+            po_rowid integer primary key,
+            vendor_id text,
+            item_id text,
+            day text not null,
+            drift real not null,
+            drifted integer not null,
+            leakage real not null
+        )
+    """))
+    for column in ROLLUP_DIMENSIONS.values():
+        conn.execute(text(f"create index ix_{ROLLUP_POS_TABLE}_{column} on {ROLLUP_POS_TABLE} ({column}, day, drift)"))
+    conn.execute(text(f"""
+        create table {ROLLUP_TABLE} (
+            dimension text not null,
+            entity_id text not null,
+            day text not null,
+            po_count integer not null,
+            drift_count integer not null,
+            leakage real not null,
+            max_drift real,
+            primary key (dimension, entity_id, day)
+        )
+    """))
+    # Serves the window scans in query_rollups
+    conn.execute(text(f"create index ix_drift_rollups_day on {ROLLUP_TABLE} (dimension, day)"))
+    conn.execute(text(_REBUILD_POS.format(pos_table=ROLLUP_POS_TABLE, ratio=_ratio(threshold))))
+    for dimension, column in ROLLUP_DIMENSIONS.items():
+        conn.execute(text(_REBUILD.format(table=ROLLUP_TABLE, pos_table=ROLLUP_POS_TABLE, dimension=dimension,
+                                          column=column)))
+    for ddl in triggers.values():
+        conn.execute(text(ddl))
+    print(f"Rebuilt {ROLLUP_TABLE} table.")
+
+
+def _window_columns():
+    columns = []
+    for days in ROLLUP_WINDOWS:
+        since = f"day > :since_{days}"
+        columns += [
+            f"sum(case when {since} then leakage else 0 end) as leakage_{days}d",
+            f"sum(case when {since} then drift_count else 0 end) as drift_count_{days}d",
+            f"max(case when {since} then max_drift end) as max_drift_{days}d",
+            f"sum(case when {since} then po_count else 0 end) as po_count_{days}d",
+        ]
+    return ",\n           ".join(columns)
+
+
+ROLLUPS_QUERY = f"""
+    select entity_id,
+           {_window_columns()}
+    from {ROLLUP_TABLE}
+    where dimension = :dimension and day > :since and day <= :as_of
+    group by entity_id
+    order by {{sort}} desc, entity_id
+    limit :limit
+"""
+
+
+def query_rollups(engine, dimension: str = "vendor", sort: str = "leakage", window: int = 30,
+                  limit: int = 100, as_of: str | None = None):
+    """
+    Top `limit` vendors or items by `sort` over the `window`-day window, with
+    leakage, drift count, max drift and contracted PO count for every window
+    ending on `as_of` (today by default). Reads only the rollup rows of the
+    last max(ROLLUP_WINDOWS) days, however many POs there are.
+    """
+    if dimension not in ROLLUP_DIMENSIONS:
+        raise ValueError(f"dimension must be one of {', '.join(ROLLUP_DIMENSIONS)}")
+    if sort not in ROLLUP_SORT_COLUMNS:
+        raise ValueError(f"sort must be one of {', '.join(ROLLUP_SORT_COLUMNS)}")
+    if window not in ROLLUP_WINDOWS:
+        raise ValueError(f"window must be one of {', '.join(map(str, ROLLUP_WINDOWS))}")
+    end = datetime.date.fromisoformat(as_of) if as_of else datetime.date.today()
+
+    params = {"dimension": dimension, "as_of": end.isoformat(), "limit": limit,
+              "since": (end - datetime.timedelta(days=max(ROLLUP_WINDOWS))).isoformat()}
+    for days in ROLLUP_WINDOWS:
+        params[f"since_{days}"] = (end - datetime.timedelta(days=days)).isoformat()
+    if not inspect(engine).has_table(ROLLUP_TABLE):
+        rows = []
+    else:
+        with engine.connect() as conn:
+            rows = conn.execute(text(ROLLUPS_QUERY.format(sort=f"{sort}_{window}d")), params).mappings().all()
+    return {
+        "dimension": dimension,
+        "as_of": end.isoformat(),
+        "windows": list(ROLLUP_WINDOWS),
+        "drift_threshold": ROLLUP_DRIFT_THRESHOLD,
+        "rows": [dict(row) for row in rows],
+    }
@@ -0,0 +1,104 @@
+# src/agents/summarizer.py
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from src.tools.llm_client import fallback_drift_summary, summarize_drift_with_gemini
+
+# Max LLM calls in flight, per-call timeout, and how long detection waits for
+# summaries before returning; unfinished summaries keep running in the background
+# only when the caller takes late results (on_late), otherwise they are dropped.
+SUMMARY_CONCURRENCY = int(os.getenv("LLM_SUMMARY_CONCURRENCY", "8"))
+SUMMARY_TIMEOUT_S = float(os.getenv("LLM_SUMMARY_TIMEOUT_S", "10"))
+SUMMARY_BUDGET_S = float(os.getenv("LLM_SUMMARY_BUDGET_S", "2"))
+# Optional cap on the drifts queued for summarization per detection run; unset or
+# empty queues every flagged row and leaves SUMMARY_BUDGET_S as the only bound
+SUMMARY_MAX_ROWS = int(os.getenv("LLM_SUMMARY_MAX_ROWS") or 0) or None
+
+PENDING_SUMMARY = "AI summary pending"
+SKIPPED_SUMMARY = "Drift detected (AI summary skipped for speed)"
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    """Starts (once) the event loop that runs summarization in a daemon thread."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            loop = asyncio.new_event_loop()
+            # The blocking SDK calls run here; sized to the concurrency limit
+            loop.set_default_executor(ThreadPoolExecutor(max_workers=SUMMARY_CONCURRENCY, thread_name_prefix="llm-summary"))
+            threading.Thread(target=loop.run_forever, name="llm-summary-loop", daemon=True).start()
+            _loop = loop
+    return _loop
+
+
+class _SummaryBatch:
+    """Collects summaries as they finish; after the budget, late ones go to `on_late`."""
+
+    def __init__(self, on_late):
+        self.on_late = on_late
+        self.results = {}
+        self.closed = False
+        self.lock = threading.Lock()
+
+    def add(self, key, summary):
+        with self.lock:
+            self.results[key] = summary
+            late = self.closed
+        if late and self.on_late is not None:
+            try:
+                self.on_late(key, summary)
+            except Exception as e:
+                print(f"Late summary delivery failed: {e}")
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            return dict(self.results)
+
+
+async def _summarize_one(semaphore, batch, key, contract_price, po_price):
+    await semaphore.acquire()
+    # A thread can't be interrupted: on timeout the caller moves on with the
+    # fallback, but the slot is only given back once the call really returns,
+    # so abandoned calls still count against SUMMARY_CONCURRENCY
+    call = asyncio.ensure_future(asyncio.to_thread(summarize_drift_with_gemini, contract_price, po_price))
+    call.add_done_callback(lambda _: semaphore.release())
+    try:
+        summary = await asyncio.wait_for(asyncio.shield(call), timeout=SUMMARY_TIMEOUT_S)
+    except Exception as e:
+        # Timeouts included: a slow provider gets the deterministic summary
+        print(f"Drift summary failed: {e!r}")
+        summary = fallback_drift_summary(contract_price, po_price)
+    batch.add(key, summary)
+
+
+async def _summarize_all(batch, rows):
+    semaphore = asyncio.Semaphore(SUMMARY_CONCURRENCY)
+    await asyncio.gather(*(_summarize_one(semaphore, batch, *row) for row in rows))
+
+
+def summarize_drifts(rows, budget_s: float | None = None, on_late=None):
+    """
+    Summarizes `rows` of (key, contract_price, po_price) concurrently.
+
+    Waits at most `budget_s` and returns the summaries finished by then as a
+    {key: summary} dict. With `on_late`, calls still in flight continue in the
+    background and each result is handed to `on_late(key, summary)` when it
+    arrives; without it nobody would read them, so rows not started yet are
+    cancelled instead of spending rate-limit budget.
+    """
+    batch = _SummaryBatch(on_late)
+    if not rows:
+        return {}
+
+    future = asyncio.run_coroutine_threadsafe(_summarize_all(batch, rows), _get_loop())
+    try:
+        future.result(timeout=SUMMARY_BUDGET_S if budget_s is None else budget_s)
+    except FutureTimeout:
+        if on_late is None:
+            future.cancel()
+    return batch.close()
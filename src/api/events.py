@@ -0,0 +1,190 @@
+# src/api/events.py
+import asyncio
+import json
+import math
+import os
+from sqlalchemy import inspect, text
+from src.agents.drift_table import PO_DRIFT_TABLE
+from src.tools.job_queue import ACTIVE_STATES, get_job_queue
+from src.tools.result_cache import get_data_version
+from src.tools.thresholds import threshold_ratio
+
+# How often the shared poller checks for changes, how many events a slow client may
+# fall behind before it is dropped, and the idle keep-alive interval
+EVENTS_POLL_S = float(os.getenv("EVENTS_POLL_S", "0.5"))
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "1000"))
+EVENTS_KEEPALIVE_S = 15.0
+# Max new drift rows read per poll
+_DRIFT_BATCH = 500
+
+NEW_DRIFTS_QUERY = f"""
+select p.*, d.contract_unit_price, d.price_drift, d.po_rowid as _po_rowid
+from {PO_DRIFT_TABLE} d
+join pos p on p.rowid = d.po_rowid
+where d.po_rowid > :after and d.price_drift > 1.0
+order by d.po_rowid
+limit :limit
+"""
+
+
+class Subscriber:
+    def __init__(self, task_id=None, threshold=None):
+        self.task_id = task_id
+        # Same ratio as detection: 5% default
+        self.threshold = threshold_ratio(threshold)
+        self.queue = asyncio.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        self.dropped = False
+
+    def put(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client stopped reading; end its stream rather than buffer without bound
+            self.dropped = True
+
+
+class EventHub:
+    """
+    Turns job-table and po_drift changes into events for every open stream. A
+    single poller per process reads the shared SQLite state, so changes made by
+    other uvicorn workers (jobs they run, POs they insert) are seen too, and the
+    database cost does not grow with the number of connected dashboards.
+    """
+
+    def __init__(self, engine, poll_s: float = EVENTS_POLL_S):
+        self.engine = engine
+        self.poll_s = poll_s
+        self.subscribers = set()
+        self._task = None
+        self._task_state = {}
+        self._data_version = None
+        self._drift_rowid = None
+
+    def subscribe(self, task_id=None, drift_threshold=None):
+        subscriber = Subscriber(task_id, drift_threshold)
+        self.subscribers.add(subscriber)
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._run())
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        self.subscribers.discard(subscriber)
+
+    def publish_flagged(self, rows):
+        """
+        Pushes POs flagged by the streaming enforcer (src.agents.po_stream) to the
+        dashboard streams as `po_flagged` events, before they reach the database.
+        """
+        for subscriber in list(self.subscribers):
+            if subscriber.task_id is not None:
+                continue
+            flagged = [r for r in rows if r["price_drift"] > subscriber.threshold]
+            if flagged:
+                subscriber.put({"event": "po_flagged", "data": flagged})
+
+    async def _run(self):
+        while self.subscribers:
+            try:
+                events = await asyncio.to_thread(self._poll, {s.task_id for s in self.subscribers if s.task_id})
+            except Exception as e:
+                print(f"Event poll failed: {e}")
+                events = []
+            for event in events:
+                for subscriber in list(self.subscribers):
+                    if event["event"] == "task":
+                        if event["data"]["task_id"] == subscriber.task_id:
+                            subscriber.put(event)
+                        continue
+                    rows = [r for r in event["data"] if r["price_drift"] > subscriber.threshold]
+                    if rows:
+                        subscriber.put({"event": "drifts", "data": rows})
+            await asyncio.sleep(self.poll_s)
+        # Fresh baseline on the next subscribe
+        self._task_state.clear()
+        self._data_version = None
+        self._drift_rowid = None
+
+    def _poll(self, task_ids):
+        events = []
+        jobs = get_job_queue()
+        for task_id in task_ids:
+            job = jobs.get(task_id) or {"task_id": task_id, "status": "not_found"}
+            state = (job["status"], job.get("progress"), job.get("message"))
+            if self._task_state.get(task_id) != state:
+                self._task_state[task_id] = state
+                events.append({"event": "task", "data": job})
+        for task_id in list(self._task_state):
+            if task_id not in task_ids:
+                del self._task_state[task_id]
+
+        # New POs bump the data version; only then is po_drift read
+        version = get_data_version(self.engine)
+        if version != self._data_version:
+            drifts, caught_up = self._new_drifts()
+            if caught_up:
+                self._data_version = version
+            if drifts:
+                events.append({"event": "drifts", "data": drifts})
+        return events
+
+    def _new_drifts(self):
+        """Returns (drift rows added since the last call, whether all of them were read)."""
+        if not inspect(self.engine).has_table(PO_DRIFT_TABLE):
+            return [], True
+        with self.engine.connect() as conn:
+            high_water = conn.execute(text(f"select coalesce(max(po_rowid), 0) from {PO_DRIFT_TABLE}")).scalar()
+            if self._drift_rowid is None or high_water < self._drift_rowid:
+                # First poll, or pos was reloaded: start from the current end
+                self._drift_rowid = high_water
+                return [], True
+            rows = conn.execute(text(NEW_DRIFTS_QUERY), {"after": self._drift_rowid, "limit": _DRIFT_BATCH}).mappings().all()
+
+        drifts = [dict(row) for row in rows]
+        if len(drifts) < _DRIFT_BATCH:
+            self._drift_rowid = high_water
+            caught_up = True
+        else:
+            # A burst larger than one batch continues from here on the next poll
+            self._drift_rowid = drifts[-1]["_po_rowid"]
+            caught_up = False
+        for drift in drifts:
+            del drift["_po_rowid"]
+        return drifts, caught_up
+
+
+def _finite(value):
+    """`value` with NaN/Infinity floats (which are not valid JSON) replaced by None."""
+    if isinstance(value, float):
+        return value if math.isfinite(value) else None
+    if isinstance(value, dict):
+        return {k: _finite(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite(v) for v in value]
+    return value
+
+
+def format_sse(event) -> str:
+    data = json.dumps(_finite(event['data']), default=str, allow_nan=False)
+    return f"event: {event['event']}\ndata: {data}\n\n"
+
+
+async def stream_events(hub, request, task_id=None, drift_threshold=None):
+    """Server-Sent Events for one client: task state changes and new drifts, until it disconnects."""
+    subscriber = hub.subscribe(task_id, drift_threshold)
+    try:
+        yield ": connected\n\n"
+        while not subscriber.dropped:
+            try:
+                event = await asyncio.wait_for(subscriber.queue.get(), timeout=EVENTS_KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keep-alive\n\n"
+                continue
+            yield format_sse(event)
+            # A stream opened for one task ends once that task has finished
+            if event["event"] == "task" and event["data"]["status"] not in ACTIVE_STATES:
+                break
+    finally:
+        hub.unsubscribe(subscriber)
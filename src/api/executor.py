@@ -0,0 +1,99 @@
+# src/api/executor.py
+import asyncio
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+# Threads for blocking pandas/SQLite work done on behalf of API requests, and how
+# many more calls may wait for one before requests are turned away with a 503
+API_EXECUTOR_WORKERS = int(os.getenv("API_EXECUTOR_WORKERS", "4"))
+API_EXECUTOR_QUEUE = int(os.getenv("API_EXECUTOR_QUEUE", "16"))
+
+_DONE = object()
+
+
+class ExecutorBusy(Exception):
+    """Raised when the executor already has its maximum of running plus waiting calls."""
+
+
+class BlockingExecutor:
+    """
+    Runs blocking calls off the event loop on a dedicated thread pool. At most
+    `workers + queue_size` calls are admitted at once; beyond that `run` raises
+    ExecutorBusy immediately instead of letting requests pile up.
+    """
+
+    def __init__(self, workers: int = API_EXECUTOR_WORKERS, queue_size: int = API_EXECUTOR_QUEUE):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="api-blocking")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        with self._lock:
+            if self._in_flight >= self.max_pending:
+                self.rejected += 1
+                raise ExecutorBusy(f"{self._in_flight} blocking calls already pending")
+            self._in_flight += 1
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def run(self, fn, *args, **kwargs):
+        """Awaits `fn(*args, **kwargs)` on the pool; raises ExecutorBusy when full."""
+        self._acquire()
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+        # Released when the call finishes, even if the awaiting request went away
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    def stream(self, iterator):
+        """
+        Admits a streamed response now (raising ExecutorBusy when full, before any
+        headers are sent) and returns an async iterator that pulls each item of the
+        blocking `iterator` on the pool, holding a single slot until the stream
+        ends. The slot is given back in the generator's finally block, or when the
+        generator is garbage collected without ever having been started.
+        """
+        self._acquire()
+        held = [True]
+
+        def release_once():
+            with self._lock:
+                was_held, held[0] = held[0], False
+            if was_held:
+                self._release()
+
+        async def _items():
+            try:
+                while True:
+                    item = await asyncio.wrap_future(self._pool.submit(next, iterator, _DONE))
+                    if item is _DONE:
+                        return
+                    yield item
+            finally:
+                release_once()
+
+        items = _items()
+        weakref.finalize(items, release_once)
+        return items
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
@@ -1,32 +1,143 @@
 # src/api/fastapi_app.py
 import pandas as pd
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from src.agents.price_detector import detect_public_only
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from src.agents.price_detector import decode_cursor, detect_page, detect_public_only, encode_cursor, engine, iter_drift_batches
+from src.agents.summarizer import PENDING_SUMMARY
+from src.tools.result_cache import LRUCache, SingleFlight, bump_data_version, get_data_version
+from src.tools import columnar_store
+from src.tools.bulk_loader import bulk_load
+from src.tools.job_queue import CANCELLED, COMPLETED, FAILED, QUEUED, RUNNING, get_job_queue
+from src.tools import metrics, profiler
+from src.tools.contract_index import ContractPriceIndex
+from src.agents import po_stream
+from src.agents.rollups import query_rollups
+from src.agents.drift_table import ensure_po_drift
+from src.api.events import EventHub, stream_events
+from src.api.executor import BlockingExecutor, ExecutorBusy
+import asyncio
+import hmac
+import json
 import os
-import uuid
+from contextlib import asynccontextmanager
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app):
+    global enforcement_source, enforcement_task
+    # Workers pick up jobs left queued (or orphaned) by a previous run
+    _jobs().start()
+    await asyncio.to_thread(contract_index.start)
+    # Built here so that its queue belongs to the serving event loop
+    enforcement_source = po_stream.make_source()
+    if enforcement_source is not None:
+        _start_enforcement()
+    yield
+    # Clearing the task first stops a pending restart from starting a new one
+    task, enforcement_task = enforcement_task, None
+    if task is not None:
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            print(f"Enforcer had failed: {e!r}")
+    contract_index.stop()
+    _jobs().stop(timeout=5)
 
-# In-memory store for task statuses
-tasks = {}
+app = FastAPI(lifespan=lifespan)
+
+# Detection, SQLite reads and serialization run here, never on the event loop
+blocking = BlockingExecutor()
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry shortly"}, headers={"Retry-After": "1"})
+
+@app.exception_handler(profiler.ProfilerBusy)
+async def profiler_busy_handler(request: Request, exc: profiler.ProfilerBusy):
+    return JSONResponse(status_code=409, content={"detail": str(exc)})
+
+def _require_admin(request: Request):
+    """Profiling is only available with PROFILING_ADMIN_TOKEN set and sent in X-Admin-Token."""
+    token = request.headers.get("x-admin-token", "")
+    if not profiler.profiling_enabled() or not hmac.compare_digest(token, profiler.PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Profiling requires a valid X-Admin-Token")
 
 # Mount static files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
-def run_detection_task(task_id: str):
-    """Simulates a long-running detection task."""
+# Pagination defaults for /api/leaks and task results, rows per NDJSON batch
+DEFAULT_PAGE_SIZE = int(os.getenv("LEAKS_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = 10000
+NDJSON_BATCH_SIZE = int(os.getenv("LEAKS_NDJSON_BATCH_SIZE", "1000"))
+
+_COLUMNAR_MEDIA_TYPES = {
+    "arrow": columnar_store.ARROW_STREAM_MEDIA_TYPE,
+    "parquet": columnar_store.PARQUET_MEDIA_TYPE,
+}
+
+def _columnar_format(request: Request, response_format: str | None):
+    """"arrow"/"parquet" when asked for via ?format= or the Accept header, else None (JSON)."""
+    if response_format in _COLUMNAR_MEDIA_TYPES:
+        return response_format
+    accept = request.headers.get("accept", "")
+    if columnar_store.ARROW_STREAM_MEDIA_TYPE in accept:
+        return "arrow"
+    if columnar_store.PARQUET_MEDIA_TYPE in accept or "application/x-parquet" in accept:
+        return "parquet"
+    return None
+
+def _columnar_response(frame, fmt: str, next_cursor: str | None = None):
+    # Pagination state travels in a header since the body is a bare table
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    with metrics.api_serialization(fmt):
+        content = columnar_store.serialize_frame(frame, fmt)
+    return Response(content=content, media_type=_COLUMNAR_MEDIA_TYPES[fmt], headers=headers)
+
+def _json_response(meta: dict, key: str, frame):
+    """
+    Responds with the fields of `meta`, in order, followed by `key` holding the
+    frame's rows, which pandas serializes without building per-row dicts.
+    """
+    with metrics.api_serialization("json"):
+        members = [f"{json.dumps(name)}: {json.dumps(value)}" for name, value in meta.items() if name != key]
+        members.append(f"{json.dumps(key)}: {frame.to_json(orient='records', double_precision=15)}")
+        body = "{" + ", ".join(members) + "}"
+    return Response(content=body, media_type="application/json")
+
+def run_detection_job(job):
+    """Runs detection for a queued job; the result frame is stored by the job queue."""
+    job.report(0.05, "Detecting price drifts")
+
+    # AI summaries that miss the detection time budget are patched into the
+    # stored result as they arrive, even if that is before it has been written
+    def _on_late_summary(position, summary):
+        get_job_queue().patch_result(job.id, position, "gemini_summary", summary)
+
     try:
-        drifts = detect_public_only()
-        tasks[task_id] = {"status": "completed", "result": drifts.to_dict(orient="records")}
+        if job.params.get("profile"):
+            # The report is stored under the task id (GET /api/profiles/{task_id})
+            drifts, _ = profiler.profile_call(detect_public_only, on_late_summary=_on_late_summary, json_safe=False,
+                                              profile_id=job.id)
+        else:
+            drifts = detect_public_only(on_late_summary=_on_late_summary, json_safe=False)
     except FileNotFoundError as e:
-        tasks[task_id] = {"status": "failed", "error": f"Data file not found: {e}"}
+        raise RuntimeError(f"Data file not found: {e}") from e
     except pd.errors.EmptyDataError as e:
-        tasks[task_id] = {"status": "failed", "error": f"Data file is empty: {e}"}
+        raise RuntimeError(f"Data file is empty: {e}") from e
     except Exception as e:
-        tasks[task_id] = {"status": "failed", "error": f"An unexpected error occurred: {e}"}
+        raise RuntimeError(f"An unexpected error occurred: {e}") from e
+    job.report(0.9, f"{len(drifts)} drifts found")
+    return drifts
+
+def _jobs():
+    queue = get_job_queue()
+    queue.register("detection", run_detection_job)
+    return queue
 
 @app.get("/")
 async def read_index():
@@ -36,30 +147,339 @@ async def read_index():
 async def read_leaks():
     return FileResponse(os.path.join(static_dir, 'leaks.html'))
 
+# Concurrent identical requests in this process share one computation
+leaks_flight = SingleFlight()
+detection_flight = SingleFlight()
+
+def _submit_detection(version, profile=False):
+    # Identical requests against the same data share one queued/running job,
+    # also across processes, through the job table
+    params = {"data_version": version, "profile": True} if profile else {"data_version": version}
+    task_id, created = _jobs().submit("detection", params)
+    if not created:
+        detection_flight.record_deduplicated()
+    response = {"task_id": task_id, "status": _jobs().get(task_id)["status"]}
+    if profile:
+        response["profile_url"] = f"/api/profiles/{task_id}"
+    return response
+
 @app.post("/api/run-detection")
-async def run_detection_api(background_tasks: BackgroundTasks):
-    task_id = str(uuid.uuid4())
-    tasks[task_id] = {"status": "in_progress"}
-    background_tasks.add_task(run_detection_task, task_id)
-    return {"task_id": task_id, "status": "in_progress"}
+async def run_detection_api(request: Request, profile: bool = False):
+    """Queues a detection job. With profile=true (admin only) the run is profiled under its task id."""
+    version = await blocking.run(get_data_version, engine)
+    if profile:
+        _require_admin(request)
+        return await blocking.run(_submit_detection, version, True)
+    return await detection_flight.do(version, lambda: blocking.run(_submit_detection, version))
 
 @app.get("/api/run-detection/{task_id}")
-async def get_task_status(task_id: str):
-    return tasks.get(task_id, {"status": "not_found"})
+async def get_task_status(request: Request, task_id: str, limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE),
+                          cursor: str | None = None, response_format: str | None = Query(None, alias="format")):
+    fmt = _columnar_format(request, response_format)
+    return await blocking.run(_task_response, task_id, limit, cursor, fmt)
+
+def _task_response(task_id, limit, cursor, fmt):
+    meta = _jobs().get(task_id)
+    if meta is None:
+        return {"status": "not_found"}
+    frame = _jobs().result(task_id) if meta["status"] == "completed" else None
+    if frame is None:
+        return meta
+
+    meta["summaries_pending"] = int((frame["gemini_summary"] == PENDING_SUMMARY).sum())
+    if limit is None and cursor is None:
+        if fmt:
+            return _columnar_response(frame, fmt)
+        return _json_response(meta, "result", frame)
+
+    # Task results are a fixed, sorted frame, so the cursor is just an offset
+    start = 0
+    if cursor:
+        try:
+            start = int(decode_cursor(cursor)[0])
+        except (ValueError, TypeError, IndexError, KeyError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    end = start + (limit or DEFAULT_PAGE_SIZE)
+    meta["next_cursor"] = encode_cursor([end]) if end < len(frame) else None
+    if fmt:
+        return _columnar_response(frame.iloc[start:end], fmt, meta["next_cursor"])
+    return _json_response(meta, "result", frame.iloc[start:end])
+
+def _cancel_task(task_id):
+    if _jobs().get(task_id) is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    cancelled = _jobs().cancel(task_id)
+    return {**_jobs().get(task_id), "cancel_requested": cancelled}
+
+@app.delete("/api/run-detection/{task_id}")
+async def cancel_task(task_id: str):
+    return await blocking.run(_cancel_task, task_id)
+
+event_hub = EventHub(engine)
+
+@app.get("/api/events")
+async def get_events(request: Request, task_id: str | None = None, drift_threshold: float | None = None):
+    """
+    Server-Sent Events replacing status polling: `task` events carry the job's
+    status/progress whenever it changes (the stream ends when `task_id`
+    finishes), `drifts` events carry newly inserted POs above the threshold.
+    """
+    return StreamingResponse(
+        stream_events(event_hub, request, task_id, drift_threshold),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/jobs/stats")
+async def get_job_stats():
+    return await blocking.run(_jobs().stats)
+
+def _render_metrics():
+    stats = _jobs().stats()
+    metrics.record_job_queue({status: stats.get(status, 0) for status in (QUEUED, RUNNING, COMPLETED, FAILED, CANCELLED)})
+    return metrics.render()
+
+@app.get("/metrics")
+async def get_metrics():
+    # Not on the bounded executor: scrapes must still succeed when it is saturated
+    body, content_type = await asyncio.to_thread(_render_metrics)
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/executor-stats")
+async def get_executor_stats():
+    return blocking.stats()
+
+# /api/leaks reads the trigger-maintained po_drift table by default
+LEAKS_DETECTION_MODE = os.getenv("LEAKS_DETECTION_MODE", "materialized")
+
+# Detection results keyed by (threshold, data version); writers bump the version
+leaks_cache = LRUCache(maxsize=int(os.getenv("LEAKS_CACHE_SIZE", "64")))
+
+def _ndjson_lines(drift_threshold):
+    # One pandas serialization per batch; only the current batch is in memory
+    for batch in iter_drift_batches(drift_threshold, batch_size=NDJSON_BATCH_SIZE):
+        lines = batch.to_json(orient="records", lines=True, double_precision=15)
+        yield lines if lines.endswith("\n") else lines + "\n"
 
 @app.get("/api/leaks")
-async def get_leaks_api(drift_threshold: float | None = None):
-    leaks = detect_public_only(drift_threshold=drift_threshold)
-    return leaks.to_dict(orient="records")
+async def get_leaks_api(request: Request, drift_threshold: float | None = None,
+                        limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), cursor: str | None = None,
+                        response_format: str | None = Query(None, alias="format"), profile: bool = False):
+    """
+    Flagged POs, highest drift first. By default the full list; with `limit`
+    and/or `cursor` one page as {"items", "next_cursor"}; with format=ndjson
+    (or Accept: application/x-ndjson) the whole set streamed one row per line.
+    format=arrow|parquet (or the matching Accept type) returns the same rows as
+    an Arrow IPC stream or Parquet file, with the page cursor in X-Next-Cursor.
+    With profile=true (admin only) the full list is recomputed under the
+    profiler and the report id is returned in X-Profile-Id.
+    """
+    if profile:
+        _require_admin(request)
+        return await blocking.run(_leaks_profiled, drift_threshold, _columnar_format(request, response_format))
+    if response_format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", ""):
+        return StreamingResponse(blocking.stream(_ndjson_lines(drift_threshold)), media_type="application/x-ndjson")
+    fmt = _columnar_format(request, response_format)
+    if limit is not None or cursor is not None:
+        return await blocking.run(_leaks_page, drift_threshold, limit, cursor, fmt)
+    version = await blocking.run(get_data_version, engine)
+    # The built response (immutable bytes) is shared by every coalesced request
+    return await leaks_flight.do((drift_threshold, version, fmt), lambda: blocking.run(_leaks_all, drift_threshold, version, fmt))
+
+def _leaks_page(drift_threshold, limit, cursor, fmt):
+    try:
+        page, next_cursor = detect_page(drift_threshold, limit=limit or DEFAULT_PAGE_SIZE, cursor=cursor, json_safe=False)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if fmt:
+        return _columnar_response(page, fmt, next_cursor)
+    return _json_response({"next_cursor": next_cursor}, "items", page)
+
+def _leaks_all(drift_threshold, version, fmt):
+    key = (drift_threshold, version)
+    hit, leaks = leaks_cache.get(key)
+    if not hit:
+        # Not JSON-safe: to_json writes NaN/Inf as null, and Arrow keeps them as floats
+        leaks = detect_public_only(drift_threshold=drift_threshold, mode=LEAKS_DETECTION_MODE, json_safe=False)
+        leaks_cache.set(key, leaks)
+    return _leaks_response(leaks, fmt)
+
+def _leaks_response(leaks, fmt):
+    if fmt:
+        return _columnar_response(leaks, fmt)
+    with metrics.api_serialization("json"):
+        content = leaks.to_json(orient="records", double_precision=15)
+    return Response(content=content, media_type="application/json")
+
+def _leaks_profiled(drift_threshold, fmt):
+    # Skips the result cache and coalescing so the detection itself is measured
+    def build():
+        leaks = detect_public_only(drift_threshold=drift_threshold, mode=LEAKS_DETECTION_MODE, json_safe=False)
+        return _leaks_response(leaks, fmt)
+
+    response, report = profiler.profile_call(build)
+    response.headers["X-Profile-Id"] = report["id"]
+    return response
+
+@app.get("/api/profiles/{profile_id}")
+async def get_profile(request: Request, profile_id: str):
+    _require_admin(request)
+    try:
+        report = await blocking.run(profiler.load_report, profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if report is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return report
+
+@app.get("/api/cache-stats")
+async def get_cache_stats():
+    return leaks_cache.stats()
+
+@app.get("/api/coalescing-stats")
+async def get_coalescing_stats():
+    return {
+        "leaks": leaks_flight.stats(),
+        "run_detection": detection_flight.stats(),
+    }
+
+# contract_id -> price snapshot for /api/check-po, refreshed when contracts change
+contract_index = ContractPriceIndex(engine)
+
+class POCheck(BaseModel):
+    po_id: str | int | None = None
+    contract_id: str | int
+    unit_price: float
+
+class POCheckSingle(POCheck):
+    drift_threshold: float | None = None
+
+class POCheckBatch(BaseModel):
+    pos: list[POCheck] = Field(max_length=MAX_PAGE_SIZE)
+    drift_threshold: float | None = None
+
+def _check(po: POCheck, drift_threshold):
+    return {"po_id": po.po_id, "contract_id": po.contract_id, "unit_price": po.unit_price,
+            **contract_index.check(po.contract_id, po.unit_price, drift_threshold)}
+
+@app.post("/api/check-po")
+async def check_po(body: POCheckBatch | POCheckSingle):
+    """
+    Pre-submission drift check against the in-memory contract price index; no
+    database access once the index is loaded. Send one PO ({"contract_id",
+    "unit_price", "po_id"?}) or a batch ({"pos": [...]}); `verdict` is "ok",
+    "drift" (`block` is true) or "no_contract".
+    """
+    if not contract_index.loaded:
+        await blocking.run(contract_index.refresh)
+    if isinstance(body, POCheckBatch):
+        results = [_check(po, body.drift_threshold) for po in body.pos]
+        return {"results": results, "blocked": sum(r["block"] for r in results)}
+    return _check(body, body.drift_threshold)
+
+@app.get("/api/contract-index/stats")
+async def get_contract_index_stats():
+    return contract_index.stats()
+
+def _rollups(dimension, sort, window, limit, as_of):
+    # Creates the rollups on a database ingested before they existed; a no-op afterwards
+    ensure_po_drift(engine)
+    return query_rollups(engine, dimension=dimension, sort=sort, window=window, limit=limit, as_of=as_of)
+
+@app.get("/api/rollups")
+async def get_rollups(dimension: str = "vendor", sort: str = "leakage", window: int = 30,
+                      limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE), as_of: str | None = None):
+    """
+    Per-vendor or per-item leakage, drift count, max drift and PO count over
+    the rolling 7/30/90-day windows ending on `as_of` (YYYY-MM-DD, today by
+    default), top `limit` by `sort` over `window` days. Read from the
+    incrementally maintained daily rollups, not from `pos`.
+    """
+    try:
+        return await blocking.run(_rollups, dimension, sort, window, limit, as_of)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Streaming enforcement (see src.agents.po_stream): flagged POs go to the SSE
+# streams as soon as they are read, all POs are written to `pos` in batches.
+# The source and the task are created by lifespan; a crashed task is restarted
+# after ENFORCEMENT_RESTART_S, and /api/po-events answers 503 until it is.
+ENFORCEMENT_RESTART_S = 1.0
+enforcement_source = None
+enforcement_task = None
+enforcer = po_stream.PoEnforcer(engine, contract_index, on_flagged=event_hub.publish_flagged)
+
+def _start_enforcement():
+    global enforcement_task
+    enforcement_task = asyncio.create_task(enforcer.run(enforcement_source))
+    enforcement_task.add_done_callback(_enforcement_done)
+
+def _enforcement_done(task):
+    if task.cancelled() or task.exception() is None:
+        return
+    print(f"Enforcer crashed, restarting in {ENFORCEMENT_RESTART_S}s: {task.exception()!r}")
+    asyncio.get_running_loop().call_later(ENFORCEMENT_RESTART_S, _restart_enforcement, task)
+
+def _restart_enforcement(crashed):
+    # Not after shutdown cleared the task, nor twice for the same crash
+    if enforcement_task is crashed:
+        _start_enforcement()
+
+class POEvent(BaseModel):
+    po_id: str | int
+    vendor_id: str | int | None = None
+    item_id: str | int | None = None
+    unit_price: float
+    qty: float | None = None
+    total: float | None = None
+    date: str | None = None
+    contract_id: str | int | None = None
+
+class POEventBatch(BaseModel):
+    pos: list[POEvent] = Field(max_length=MAX_PAGE_SIZE)
+
+def _enforcement_queue():
+    if not isinstance(enforcement_source, po_stream.QueueSource):
+        raise HTTPException(status_code=409, detail=f"Enforcement source is '{po_stream.ENFORCEMENT_SOURCE}', not 'queue'")
+    if enforcement_task is not None and enforcement_task.done():
+        raise HTTPException(status_code=503, detail="Enforcer is restarting, retry shortly", headers={"Retry-After": "1"})
+    return enforcement_source
+
+@app.post("/api/po-events", status_code=202)
+async def post_po_events(body: POEventBatch | POEvent):
+    """
+    Publishes one PO or a batch ({"pos": [...]}) to the in-process enforcement
+    queue. Returns once they are queued; while the queue is full the request
+    waits, which slows producers down to what the enforcer can write.
+    """
+    queue = _enforcement_queue()
+    pos = body.pos if isinstance(body, POEventBatch) else [body]
+    await queue.put_many(po.model_dump() for po in pos)
+    return {"queued": len(pos)}
+
+@app.get("/api/enforcement/stats")
+async def get_enforcement_stats():
+    return {"source": po_stream.ENFORCEMENT_SOURCE, **enforcer.stats()}
 
 # Import data generator functions
 from data_generator import gen_items, gen_vendors, gen_contracts, gen_pos
-from src.agents.price_detector import engine
 import random
 
 @app.post("/api/simulate-traffic")
 async def simulate_traffic(background_tasks: BackgroundTasks):
-    """Generates new random POs and appends them to the database to simulate live traffic."""
+    """
+    Generates new random POs to simulate live traffic. They go through the
+    enforcement queue when it is the configured source, else straight to the database.
+    """
+    if isinstance(enforcement_source, po_stream.QueueSource):
+        def _generate():
+            contracts_df = pd.read_sql("select * from contracts", engine)
+            new_pos_df, _ = gen_pos(gen_vendors(n=10), gen_items(n=50), contracts_df, n_pos=50, leak_prob=0.5)
+            return new_pos_df.to_dict("records")
+
+        await enforcement_source.put_many(await blocking.run(_generate))
+        return {"status": "simulation_started", "message": "Queued 50 new transactions for enforcement..."}
+
     def _generate_and_insert():
         # Generate small batch of new data
         items = gen_items(n=50)
@@ -74,8 +494,12 @@ async def simulate_traffic(background_tasks: BackgroundTasks):
         # Generate 50 new POs with a very high leak probability (50%) to ensure leaks appear in demo
         new_pos_df, _ = gen_pos(vendors, items, contracts_df, n_pos=50, leak_prob=0.5)
         
-        # Append to DB
-        new_pos_df.to_sql("pos", engine, if_exists="append", index=False)
+        # Append to DB; the po_drift triggers compute drift for the new rows
+        ensure_po_drift(engine)
+        bulk_load(new_pos_df, "pos", engine, if_exists="append")
+        if columnar_store.COLUMNAR_BACKEND:
+            columnar_store.append_table(new_pos_df, "pos")
+        bump_data_version(engine)
         print(f"Simulated 50 new POs.")
 
     background_tasks.add_task(_generate_and_insert)
@@ -6,27 +6,30 @@ document.getElementById('run-detection').addEventListener('click', () => {
         .then(response => response.json())
         .then(data => {
             const taskId = data.task_id;
-            resultsContainer.innerHTML = `<p>Task ${taskId} is in progress. Polling for results...</p>`;
-            
-            const interval = setInterval(() => {
-                fetch(`/api/run-detection/${taskId}`)
-                    .then(response => response.json())
-                    .then(task => {
-                        if (task.status === 'completed') {
-                            clearInterval(interval);
+            resultsContainer.innerHTML = `<p>Task ${taskId} is in progress. Waiting for results...</p>`;
+
+            // The server pushes task state changes; the result is fetched once it completes
+            const events = new EventSource(`/api/events?task_id=${taskId}`);
+            events.addEventListener('task', event => {
+                const task = JSON.parse(event.data);
+                if (task.status === 'completed') {
+                    events.close();
+                    fetch(`/api/run-detection/${taskId}`)
+                        .then(response => response.json())
+                        .then(task => {
                             const results = task.result;
                             if (results.length === 0) {
                                 resultsContainer.innerHTML = '<p>No price drifts detected.</p>';
                                 return;
                             }
-                            
+
                             let table = '<table id="results">';
                             table += '<thead><tr>';
                             Object.keys(results[0]).forEach(key => {
                                 table += `<th>${key}</th>`;
                             });
                             table += '</tr></thead>';
-                            
+
                             table += '<tbody>';
                             results.forEach(row => {
                                 table += '<tr>';
@@ -36,14 +39,16 @@ document.getElementById('run-detection').addEventListener('click', () => {
                                 table += '</tr>';
                             });
                             table += '</tbody></table>';
-                            
+
                             resultsContainer.innerHTML = table;
-                        } else if (task.status === 'failed') {
-                            clearInterval(interval);
-                            resultsContainer.innerHTML = `<p>Error: ${task.error}</p>`;
-                        }
-                    });
-            }, 2000);
+                        });
+                } else if (task.status === 'failed' || task.status === 'cancelled' || task.status === 'not_found') {
+                    events.close();
+                    resultsContainer.innerHTML = `<p>Error: ${task.error || task.status}</p>`;
+                } else if (task.progress !== undefined) {
+                    resultsContainer.innerHTML = `<p>Task ${taskId}: ${Math.round(task.progress * 100)}% ${task.message || ''}</p>`;
+                }
+            });
         })
         .catch(error => {
             resultsContainer.innerHTML = `<p>Error: ${error}</p>`;
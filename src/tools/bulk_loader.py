@@ -0,0 +1,135 @@
+# src/tools/bulk_loader.py
+import os
+import time
+import pandas as pd
+from src.tools.metrics import INGEST_BATCH_ROWS, INGEST_ROWS, INGEST_ROWS_PER_S, INGEST_SECONDS
+
+# Rows per executemany call; all batches of one load share a single transaction
+BULK_BATCH_SIZE = int(os.getenv("BULK_BATCH_SIZE", "50000"))
+
+# WAL lets readers keep using the old table while a load is in progress;
+# synchronous=NORMAL is durable in WAL mode and avoids an fsync per commit
+SQLITE_PRAGMAS = [
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-65536",  # 64 MiB
+    "temp_store=MEMORY",
+]
+
+
+def apply_sqlite_pragmas(cursor):
+    """Applies SQLITE_PRAGMAS; must run outside a transaction (journal_mode can't change inside one)."""
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(f"pragma {pragma}")
+
+
+def _quote(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _rows(batch):
+    """Converts a frame slice to tuples of plain Python values that sqlite3 can bind."""
+    batch = batch.copy()
+    for col in batch.columns:
+        if pd.api.types.is_datetime64_any_dtype(batch[col]):
+            batch[col] = batch[col].dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    batch = batch.astype(object).where(batch.notna(), None)
+    return list(batch.itertuples(index=False, name=None))
+
+
+def _insert_batches(cursor, df, table, batch_size):
+    columns = ", ".join(_quote(c) for c in df.columns)
+    placeholders = ", ".join("?" for _ in df.columns)
+    sql = f"insert into {_quote(table)} ({columns}) values ({placeholders})"
+    batches = 0
+    for start in range(0, len(df), batch_size):
+        batch = df.iloc[start:start + batch_size]
+        cursor.executemany(sql, _rows(batch))
+        INGEST_BATCH_ROWS.labels(table.removesuffix("__staging")).observe(len(batch))
+        batches += 1
+    return batches
+
+
+def _table_exists(cursor, table):
+    row = cursor.execute("select 1 from sqlite_master where type = 'table' and name = ?", (table,)).fetchone()
+    return row is not None
+
+
+def _bulk_load_sqlite(df, table, engine, if_exists, batch_size):
+    # Drive the sqlite3 connection directly so the whole load, including the
+    # staging table swap, is one explicit BEGIN IMMEDIATE ... COMMIT
+    raw = engine.raw_connection()
+    dbapi = raw.driver_connection
+    previous_isolation = dbapi.isolation_level
+    dbapi.isolation_level = None
+    cursor = dbapi.cursor()
+    try:
+        apply_sqlite_pragmas(cursor)
+        cursor.execute("begin immediate")
+        try:
+            if if_exists == "replace":
+                staging = f"{table}__staging"
+                cursor.execute(f"drop table if exists {_quote(staging)}")
+                cursor.execute(pd.io.sql.get_schema(df, staging))
+                batches = _insert_batches(cursor, df, staging, batch_size)
+                cursor.execute(f"drop table if exists {_quote(table)}")
+                # Triggers on other tables (po_drift's on pos) may reference `table`;
+                # legacy mode skips re-validating them while it is briefly missing
+                cursor.execute("pragma legacy_alter_table=ON")
+                try:
+                    cursor.execute(f"alter table {_quote(staging)} rename to {_quote(table)}")
+                finally:
+                    cursor.execute("pragma legacy_alter_table=OFF")
+            else:
+                if not _table_exists(cursor, table):
+                    cursor.execute(pd.io.sql.get_schema(df, table))
+                batches = _insert_batches(cursor, df, table, batch_size)
+            cursor.execute("commit")
+        except Exception:
+            cursor.execute("rollback")
+            raise
+    finally:
+        cursor.close()
+        dbapi.isolation_level = previous_isolation
+        raw.close()
+    return batches
+
+
+def bulk_load(df, table, engine, if_exists="replace", batch_size=None):
+    """
+    Loads `df` into `table` and returns throughput stats.
+
+    On SQLite the rows are inserted with batched executemany calls inside one
+    transaction after applying SQLITE_PRAGMAS. With if_exists="replace" they go
+    into a staging table that is swapped in (drop + rename) in that same
+    transaction, so readers see either the old or the new table, never a
+    partial one. Indexes and triggers of the replaced table are not carried
+    over; callers recreate them. Other databases fall back to a multi-row
+    `to_sql`.
+    """
+    batch_size = batch_size or BULK_BATCH_SIZE
+    started = time.perf_counter()
+    batches = 0
+
+    if engine.dialect.name != "sqlite":
+        df.to_sql(table, engine, if_exists=if_exists, index=False, method="multi", chunksize=batch_size)
+        batches = -(-len(df) // batch_size)
+        for start in range(0, len(df), batch_size):
+            INGEST_BATCH_ROWS.labels(table).observe(min(batch_size, len(df) - start))
+    else:
+        batches = _bulk_load_sqlite(df, table, engine, if_exists, batch_size)
+
+    seconds = time.perf_counter() - started
+    INGEST_ROWS.labels(table).inc(len(df))
+    INGEST_SECONDS.labels(table).observe(seconds)
+    if seconds > 0:
+        INGEST_ROWS_PER_S.labels(table).set(len(df) / seconds)
+    stats = {
+        "table": table,
+        "rows": len(df),
+        "batches": batches,
+        "seconds": round(seconds, 4),
+        "rows_per_s": round(len(df) / seconds, 1) if seconds > 0 else None,
+    }
+    print(f"Loaded {len(df)} rows into {table} in {seconds:.2f}s ({stats['rows_per_s'] or 0:,.0f} rows/s).")
+    return stats
@@ -0,0 +1,192 @@
+# src/tools/columnar_store.py
+import os
+import shutil
+import uuid
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Optional columnar copy of the pos/contracts tables. Each table is a directory of
+# part files: ingest replaces the table, simulate_traffic appends a part.
+COLUMNAR_BACKEND = os.getenv("COLUMNAR_BACKEND", "0") == "1"
+COLUMNAR_DIR = os.getenv("COLUMNAR_DIR", "data/columnar")
+# "arrow" parts (Arrow IPC, uncompressed) are memory-mapped by the reader;
+# "parquet" parts are smaller on disk but have to be decoded
+COLUMNAR_FORMAT = os.getenv("COLUMNAR_FORMAT", "arrow")
+
+_EXTENSIONS = {"arrow": ".arrow", "parquet": ".parquet"}
+
+# Media types for frames sent over the API in columnar form
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+
+
+# Each table directory holds versioned subdirectories of part files and a CURRENT
+# file naming the live one. Replacing a table writes a new version and then swaps
+# CURRENT with a single os.replace, so readers always find a complete table.
+_CURRENT = "CURRENT"
+
+
+def _table_dir(name, directory=None):
+    return os.path.join(directory or COLUMNAR_DIR, name)
+
+
+def _version_dir(name, directory=None):
+    """Directory of the live version of `name` (the table directory itself for tables written before versioning)."""
+    table_dir = _table_dir(name, directory)
+    try:
+        with open(os.path.join(table_dir, _CURRENT)) as f:
+            return os.path.join(table_dir, f.read().strip())
+    except FileNotFoundError:
+        return table_dir
+
+
+def _part_files(name, directory=None):
+    version_dir = _version_dir(name, directory)
+    if not os.path.isdir(version_dir):
+        return []
+    return sorted(
+        os.path.join(version_dir, f) for f in os.listdir(version_dir)
+        if os.path.splitext(f)[1] in _EXTENSIONS.values()
+    )
+
+
+def _write_part(table, table_dir, fmt):
+    os.makedirs(table_dir, exist_ok=True)
+    # Part names sort by write order; written to a temp name first so readers never see half a file
+    part = os.path.join(table_dir, f"part-{len(os.listdir(table_dir)):06d}-{uuid.uuid4().hex[:8]}{_EXTENSIONS[fmt]}")
+    tmp = part + ".tmp"
+    if fmt == "arrow":
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        pq.write_table(table, tmp)
+    os.replace(tmp, part)
+
+
+def has_table(name, directory=None) -> bool:
+    return bool(_part_files(name, directory))
+
+
+def list_parts(name, directory=None):
+    """
+    Part files of the current version of `name`. Pass them to read_table and
+    take_rows to read one consistent version across calls; a replaced version
+    stays on disk until the write after the one that replaced it.
+    """
+    return _part_files(name, directory)
+
+
+def write_table(df, name, directory=None, fmt=None):
+    """Replaces table `name` with the contents of `df`."""
+    fmt = fmt or COLUMNAR_FORMAT
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table_dir = _table_dir(name, directory)
+    previous = _version_dir(name, directory)
+    version = f"v-{uuid.uuid4().hex[:12]}"
+    _write_part(table, os.path.join(table_dir, version), fmt)
+
+    pointer = os.path.join(table_dir, f"{_CURRENT}.tmp-{uuid.uuid4().hex[:8]}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(table_dir, _CURRENT))
+
+    # The version just retired is kept until the next write so that a reader
+    # that listed its parts before the swap can still open them
+    keep = {version, os.path.basename(previous)}
+    for entry in os.listdir(table_dir):
+        path = os.path.join(table_dir, entry)
+        if entry.startswith("v-") and entry not in keep:
+            shutil.rmtree(path, ignore_errors=True)
+        elif previous == table_dir and os.path.splitext(entry)[1] in _EXTENSIONS.values():
+            # Parts of a table written before versioning
+            os.remove(path)
+
+
+def append_table(df, name, directory=None, fmt=None):
+    """Adds `df` as a new part of table `name`, cast to the existing schema."""
+    fmt = fmt or COLUMNAR_FORMAT
+    schema = None
+    parts = _part_files(name, directory)
+    if parts:
+        schema = _part_schema(parts[0])
+        df = df[[c for c in schema.names if c in df.columns]]
+        schema = pa.schema([schema.field(c) for c in df.columns])
+    _write_part(pa.Table.from_pandas(df, schema=schema, preserve_index=False), _version_dir(name, directory), fmt)
+
+
+def _part_schema(path):
+    if path.endswith(_EXTENSIONS["arrow"]):
+        return pa.ipc.open_file(pa.memory_map(path, "r")).schema
+    return pq.read_schema(path)
+
+
+def _read_part(path, columns):
+    if path.endswith(_EXTENSIONS["arrow"]):
+        # Zero-copy: buffers point into the page cache, only touched columns get paged in
+        source = pa.memory_map(path, "r")
+        table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns)
+
+
+def read_table(name, columns=None, directory=None, parts=None):
+    """
+    Reads table `name` as a pyarrow Table, projected to `columns` when given.
+    Arrow parts are memory-mapped; parquet parts only decode the requested columns.
+    """
+    parts = parts or _part_files(name, directory)
+    if not parts:
+        raise FileNotFoundError(f"No columnar data for table '{name}' in {directory or COLUMNAR_DIR}")
+    tables = [_read_part(p, columns) for p in parts]
+    if len(tables) == 1:
+        return tables[0]
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def _part_num_rows(path):
+    if path.endswith(_EXTENSIONS["arrow"]):
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    return pq.ParquetFile(path).metadata.num_rows
+
+
+def take_rows(name, rows, directory=None, parts=None):
+    """
+    All columns of table `name` for the row positions `rows` (positions in
+    read_table order), in the order given. Only the parts holding those rows
+    are read, so a few flagged rows don't cost a full read of every column.
+    """
+    parts = parts or _part_files(name, directory)
+    if not parts:
+        raise FileNotFoundError(f"No columnar data for table '{name}' in {directory or COLUMNAR_DIR}")
+    rows = np.asarray(rows, dtype=np.int64)
+    order = np.argsort(rows, kind="stable")
+    wanted = rows[order]
+
+    pieces, start = [], 0
+    for path in parts:
+        end = start + _part_num_rows(path)
+        lo, hi = np.searchsorted(wanted, [start, end])
+        if hi > lo:
+            pieces.append(_read_part(path, None).take(pa.array(wanted[lo:hi] - start)))
+        start = end
+    if not pieces:
+        return pa.Table.from_batches([], schema=_part_schema(parts[0]))
+    taken = pieces[0] if len(pieces) == 1 else pa.concat_tables(pieces, promote_options="permissive")
+    # Back from position order to the caller's order
+    return taken.take(pa.array(np.argsort(order, kind="stable")))
+
+
+def serialize_frame(df, fmt) -> bytes:
+    """Encodes `df` as an Arrow IPC stream (fmt="arrow") or a Parquet file (fmt="parquet")."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    if fmt == "arrow":
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+    elif fmt == "parquet":
+        pq.write_table(table, sink)
+    else:
+        raise ValueError(f"Unknown columnar format: {fmt}")
+    return sink.getvalue().to_pybytes()
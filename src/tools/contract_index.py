@@ -0,0 +1,142 @@
+# src/tools/contract_index.py
+import os
+import threading
+import time
+from sqlalchemy import inspect, text
+from src.tools.thresholds import threshold_ratio
+
+# How often the refresher checks whether contracts changed (a single-row read of
+# the counter below); POs are checked against the in-memory snapshot and never
+# hit the DB.
+CONTRACT_INDEX_REFRESH_S = float(os.getenv("CONTRACT_INDEX_REFRESH_S", "5"))
+
+# Single-row counter bumped by triggers on every insert, update and delete on
+# `contracts`, so direct SQL edits are seen and PO writes are not. Replacing the
+# table drops the triggers; the next refresh reinstalls them and reloads.
+CONTRACTS_VERSION_TABLE = "contracts_version"
+
+_VERSION_TRIGGERS = {
+    f"trg_contracts_version_{event}": f"""
+        create trigger if not exists trg_contracts_version_{event} after {event} on contracts
+        begin
+            update {CONTRACTS_VERSION_TABLE} set version = version + 1;
+        end
+    """
+    for event in ("insert", "update", "delete")
+}
+
+# Same predicate as the SQL detection modes: only positive contract prices give a drift.
+# A contract_id with several rows (one per item/vendor in the SF data) keeps its
+# lowest price, so a PO is flagged whenever the detector would flag one of its rows.
+_PRICES_QUERY = """
+    select contract_id, min(contract_unit_price)
+    from contracts
+    where contract_unit_price > 0
+    group by contract_id
+"""
+
+NO_CONTRACT = "no_contract"
+OK = "ok"
+DRIFT = "drift"
+
+
+class ContractPriceIndex:
+    """
+    contract_id -> contract_unit_price hash index, loaded once from `contracts`
+    and swapped for a fresh one whenever the contracts version changes. Reads
+    go to the current dict without locking. Keys are compared as text, like the
+    detector's join.
+    """
+
+    def __init__(self, engine, refresh_s: float = CONTRACT_INDEX_REFRESH_S):
+        self.engine = engine
+        self.refresh_s = refresh_s
+        self._prices = {}
+        self._version = None
+        self.loaded = False
+        self.loaded_at = None
+        self.reloads = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _contracts_version(self):
+        """
+        Returns the contracts counter (None without a contracts table), first
+        installing its triggers when they are missing, i.e. on the first call or
+        after `contracts` was replaced; that install bumps the counter too.
+        """
+        with self.engine.connect() as conn:
+            if not inspect(conn).has_table("contracts"):
+                return None
+            installed = {r[0] for r in conn.execute(text("select name from sqlite_master where type = 'trigger'"))}
+            if set(_VERSION_TRIGGERS) <= installed:
+                return conn.execute(text(f"select version from {CONTRACTS_VERSION_TABLE}")).scalar()
+
+        with self.engine.begin() as conn:
+            conn.execute(text(f"create table if not exists {CONTRACTS_VERSION_TABLE} (version integer not null)"))
+            if not conn.execute(text(f"update {CONTRACTS_VERSION_TABLE} set version = version + 1")).rowcount:
+                conn.execute(text(f"insert into {CONTRACTS_VERSION_TABLE} (version) values (1)"))
+            for ddl in _VERSION_TRIGGERS.values():
+                conn.execute(text(ddl))
+            return conn.execute(text(f"select version from {CONTRACTS_VERSION_TABLE}")).scalar()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads the index if the contracts version moved (or `force`); returns whether it was reloaded."""
+        with self._lock:
+            # Read before the prices: a write in between only causes one extra reload
+            version = self._contracts_version()
+            if version == self._version and self.loaded and not force:
+                return False
+            with self.engine.connect() as conn:
+                has_table = inspect(conn).has_table("contracts")
+                rows = conn.execute(text(_PRICES_QUERY)).fetchall() if has_table else []
+            # One assignment: readers see either the old or the new dict
+            self._prices = {str(contract_id): float(price) for contract_id, price in rows}
+            self._version = version
+            self.loaded = True
+            self.loaded_at = time.time()
+            self.reloads += 1
+            return True
+
+    def start(self):
+        """Loads the index and starts the background refresher (idempotent)."""
+        if self._thread is not None:
+            return
+        self.refresh()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="contract-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.refresh_s + 1)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.refresh_s):
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep serving the last good snapshot
+                print(f"Contract index refresh failed: {e}")
+
+    def price(self, contract_id):
+        return self._prices.get(str(contract_id))
+
+    def check(self, contract_id, unit_price: float, drift_threshold: float | None = None):
+        """
+        Drift verdict for one PO against the indexed contract price. The
+        threshold is a percentage, 5 by default, as in detect_public_only.
+        """
+        threshold = threshold_ratio(drift_threshold)
+        contract_price = self._prices.get(str(contract_id))
+        if contract_price is None:
+            return {"contract_unit_price": None, "price_drift": None, "verdict": NO_CONTRACT, "block": False}
+        drift = unit_price / contract_price
+        verdict = DRIFT if drift > threshold else OK
+        return {"contract_unit_price": contract_price, "price_drift": drift, "verdict": verdict, "block": verdict == DRIFT}
+
+    def stats(self):
+        return {"contracts": len(self._prices), "loaded_at": self.loaded_at, "reloads": self.reloads}
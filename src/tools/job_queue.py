@@ -0,0 +1,370 @@
+# src/tools/job_queue.py
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+import pyarrow as pa
+from src.tools.metrics import JOB_SECONDS
+
+# SQLite-backed job table shared by every API process on the host; results are
+# written next to it as Arrow IPC files so any process can serve them.
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", "data/jobs.db")
+JOB_RESULTS_DIR = os.getenv("JOB_RESULTS_DIR", "data/job_results")
+# Jobs run at once per process
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Finished jobs (and their results) are deleted this long after they finish
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+# A running job whose process stops heartbeating for this long is requeued
+JOB_LEASE_S = float(os.getenv("JOB_LEASE_S", "30"))
+
+QUEUED = "queued"
+RUNNING = "in_progress"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+# Idle workers re-check the table this often (jobs may be submitted by another process)
+_POLL_S = 0.5
+_CLEANUP_EVERY_S = 60
+
+_JOB_FIELDS = ["id", "kind", "status", "progress", "message", "error", "created_at", "started_at", "finished_at"]
+
+
+class JobCancelled(Exception):
+    """Raised from Job.report once cancellation of the job has been requested."""
+
+
+class Job:
+    """Handle given to a job handler: its id and params, plus progress reporting."""
+
+    def __init__(self, queue, job_id, params):
+        self.queue = queue
+        self.id = job_id
+        self.params = params
+
+    def report(self, progress: float, message: str | None = None):
+        """Records progress (0..1); raises JobCancelled if the job has been cancelled."""
+        self.queue._report(self.id, progress, message)
+
+
+class JobQueue:
+    """
+    Durable job queue: jobs live in a SQLite table, so they survive restarts and
+    are visible to every uvicorn worker. Each process runs up to `workers` jobs
+    at a time; a job claimed by a process that dies is requeued once its lease
+    runs out. Submitting a job identical (same kind and params) to one that is
+    still queued or running returns the existing job instead of a new one.
+    """
+
+    def __init__(self, path: str = JOB_QUEUE_PATH, results_dir: str = JOB_RESULTS_DIR, workers: int = JOB_WORKERS,
+                 ttl_s: float = JOB_TTL_S, lease_s: float = JOB_LEASE_S):
+        self.path = path
+        self.results_dir = results_dir
+        self.workers = workers
+        self.ttl_s = ttl_s
+        self.lease_s = lease_s
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._handlers = {}
+        self._threads = []
+        self._running = set()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._last_cleanup = 0.0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.makedirs(results_dir, exist_ok=True)
+        conn = self._connect()
+        conn.execute("""
+            create table if not exists jobs (
+                id text primary key,
+                kind text not null,
+                params text not null,
+                dedup_key text not null,
+                status text not null,
+                progress real not null default 0,
+                message text,
+                error text,
+                cancel_requested integer not null default 0,
+                worker text,
+                created_at real not null,
+                started_at real,
+                finished_at real,
+                heartbeat_at real
+            )
+        """)
+        conn.execute("create index if not exists ix_jobs_status_created on jobs (status, created_at)")
+        conn.execute("create index if not exists ix_jobs_dedup_key on jobs (dedup_key, status)")
+        # Cell updates applied to a stored result when it is read (e.g. late AI summaries)
+        conn.execute("""
+            create table if not exists job_result_patches (
+                job_id text not null,
+                row integer not null,
+                column_name text not null,
+                value text,
+                primary key (job_id, row, column_name)
+            )
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=WAL")
+            conn.execute("pragma synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _result_path(self, job_id):
+        return os.path.join(self.results_dir, f"{job_id}.arrow")
+
+    def register(self, kind: str, handler):
+        """Registers `handler(job) -> DataFrame | None` for jobs of `kind`."""
+        self._handlers[kind] = handler
+
+    def start(self):
+        """Starts the worker threads (once) plus the lease heartbeat."""
+        with self._lock:
+            if self._threads:
+                return
+            self._stop.clear()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._heartbeat, name="job-heartbeat", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        """Stops taking new jobs and waits for the threads; jobs still running are requeued after their lease."""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def submit(self, kind: str, params: dict | None = None):
+        """Queues a job and returns (job_id, created); created is False when an identical job was already active."""
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        params = params or {}
+        dedup_key = f"{kind}:{json.dumps(params, sort_keys=True)}"
+        conn = self._connect()
+        conn.execute("begin immediate")
+        try:
+            row = conn.execute(
+                f"select id from jobs where dedup_key = ? and status in ({','.join('?' * len(ACTIVE_STATES))}) "
+                "and cancel_requested = 0 order by created_at limit 1",
+                (dedup_key, *ACTIVE_STATES),
+            ).fetchone()
+            if row is None:
+                job_id = str(uuid.uuid4())
+                conn.execute(
+                    "insert into jobs (id, kind, params, dedup_key, status, created_at) values (?, ?, ?, ?, ?, ?)",
+                    (job_id, kind, json.dumps(params), dedup_key, QUEUED, time.time()),
+                )
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+        if row is not None:
+            return row[0], False
+        self.start()
+        self._wake.set()
+        return job_id, True
+
+    def get(self, job_id: str):
+        """Returns the job's status fields as a dict, or None if it doesn't exist (or has expired)."""
+        row = self._connect().execute(f"select {', '.join(_JOB_FIELDS)} from jobs where id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_JOB_FIELDS, row))
+        job["task_id"] = job.pop("id")
+        return job
+
+    def result(self, job_id: str):
+        """Returns the completed job's result as a DataFrame with patches applied, or None."""
+        path = self._result_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with pa.memory_map(path, "r") as source:
+            frame = pa.ipc.open_file(source).read_all().to_pandas()
+        patches = self._connect().execute(
+            "select row, column_name, value from job_result_patches where job_id = ?", (job_id,)
+        ).fetchall()
+        for row, column, value in patches:
+            if row < len(frame):
+                frame.at[row, column] = value
+        return frame
+
+    def patch_result(self, job_id: str, row: int, column: str, value: str):
+        """Overrides one cell of the job's result; may be called before the result is stored."""
+        self._connect().execute(
+            "insert or replace into job_result_patches (job_id, row, column_name, value) values (?, ?, ?, ?)",
+            (job_id, int(row), column, value),
+        )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancels a queued job right away; a running job is flagged and stops at its
+        next progress report. Returns False if the job doesn't exist or has finished.
+        """
+        conn = self._connect()
+        now = time.time()
+        cur = conn.execute(
+            "update jobs set status = ?, cancel_requested = 1, finished_at = ? where id = ? and status = ?",
+            (CANCELLED, now, job_id, QUEUED),
+        )
+        if cur.rowcount:
+            return True
+        cur = conn.execute("update jobs set cancel_requested = 1 where id = ? and status = ?", (job_id, RUNNING))
+        return bool(cur.rowcount)
+
+    def cleanup(self):
+        """Deletes finished jobs older than the TTL, with their results."""
+        conn = self._connect()
+        cutoff = time.time() - self.ttl_s
+        expired = [r[0] for r in conn.execute(
+            f"select id from jobs where status not in ({','.join('?' * len(ACTIVE_STATES))}) and finished_at < ?",
+            (*ACTIVE_STATES, cutoff),
+        ).fetchall()]
+        for job_id in expired:
+            conn.execute("delete from job_result_patches where job_id = ?", (job_id,))
+            conn.execute("delete from jobs where id = ?", (job_id,))
+            try:
+                os.remove(self._result_path(job_id))
+            except FileNotFoundError:
+                pass
+        return len(expired)
+
+    def stats(self):
+        counts = dict(self._connect().execute("select status, count(*) from jobs group by status").fetchall())
+        with self._lock:
+            running_here = len(self._running)
+        return {"workers": self.workers, "running_in_process": running_here, **counts}
+
+    def _report(self, job_id, progress, message):
+        conn = self._connect()
+        conn.execute(
+            "update jobs set progress = ?, message = coalesce(?, message), heartbeat_at = ? where id = ?",
+            (min(max(progress, 0.0), 1.0), message, time.time(), job_id),
+        )
+        row = conn.execute("select cancel_requested from jobs where id = ?", (job_id,)).fetchone()
+        if row is None or row[0]:
+            raise JobCancelled(job_id)
+
+    def _claim(self):
+        conn = self._connect()
+        now = time.time()
+        kinds = list(self._handlers)
+        if not kinds:
+            return None
+        conn.execute("begin immediate")
+        try:
+            # Jobs whose process stopped heartbeating (crash, restart) go back to the queue
+            conn.execute(
+                "update jobs set status = ?, worker = null where status = ? and heartbeat_at < ?",
+                (QUEUED, RUNNING, now - self.lease_s),
+            )
+            row = conn.execute(
+                f"select id, kind, params from jobs where status = ? and kind in ({','.join('?' * len(kinds))}) "
+                "order by created_at limit 1",
+                (QUEUED, *kinds),
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "update jobs set status = ?, worker = ?, started_at = ?, heartbeat_at = ? where id = ?",
+                    (RUNNING, self.worker_id, now, now, row[0]),
+                )
+            conn.execute("commit")
+        except Exception:
+            conn.execute("rollback")
+            raise
+        return row
+
+    def _finish(self, job_id, status, error=None):
+        self._connect().execute(
+            "update jobs set status = ?, error = ?, finished_at = ?, progress = case when ? then 1 else progress end "
+            "where id = ? and worker = ?",
+            (status, error, time.time(), status == COMPLETED, job_id, self.worker_id),
+        )
+
+    def _write_result(self, job_id, frame):
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        path = self._result_path(job_id)
+        tmp = path + ".tmp"
+        with pa.OSFile(tmp, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp, path)
+
+    def _run(self, job_id, kind, params):
+        with self._lock:
+            self._running.add(job_id)
+        started = time.perf_counter()
+        status = FAILED
+        try:
+            result = self._handlers[kind](Job(self, job_id, json.loads(params)))
+            if result is not None:
+                self._write_result(job_id, result)
+            status = COMPLETED
+            self._finish(job_id, COMPLETED)
+        except JobCancelled:
+            status = CANCELLED
+            self._finish(job_id, CANCELLED)
+        except Exception as e:
+            print(f"Job {job_id} ({kind}) failed: {e}")
+            self._finish(job_id, FAILED, error=str(e))
+        finally:
+            JOB_SECONDS.labels(kind, status).observe(time.perf_counter() - started)
+            with self._lock:
+                self._running.discard(job_id)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                if time.monotonic() - self._last_cleanup > _CLEANUP_EVERY_S:
+                    self._last_cleanup = time.monotonic()
+                    self.cleanup()
+                row = self._claim()
+            except sqlite3.Error as e:
+                print(f"Job queue error: {e}")
+                row = None
+            if row is None:
+                self._wake.wait(_POLL_S)
+                self._wake.clear()
+                continue
+            self._run(*row)
+
+    def _heartbeat(self):
+        # Keeps the lease of this process's running jobs alive between progress reports
+        while not self._stop.wait(self.lease_s / 3):
+            with self._lock:
+                running = list(self._running)
+            if running:
+                try:
+                    self._connect().execute(
+                        f"update jobs set heartbeat_at = ? where id in ({','.join('?' * len(running))})",
+                        (time.time(), *running),
+                    )
+                except sqlite3.Error as e:
+                    print(f"Job heartbeat failed: {e}")
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue():
+    """Process-wide queue instance; its workers start with the first submit (or an explicit start())."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+    return _queue
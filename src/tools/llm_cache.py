@@ -0,0 +1,110 @@
+# src/tools/llm_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# Disk-backed cache of model responses, shared by every process on the host.
+# An empty LLM_CACHE_PATH disables it.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "data/llm_cache.db")
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+# Eviction scans the table, so it only runs every N writes
+_EVICT_EVERY = 100
+
+
+def cache_key(model: str, prompt: str) -> str:
+    """Hash of the model name and the whitespace-normalized prompt."""
+    normalized = " ".join(prompt.split())
+    return hashlib.sha256(f"{model}\n{normalized}".encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    SQLite-backed response cache with TTL expiry and LRU eviction beyond
+    `max_entries`. WAL mode lets several uvicorn workers read and write it
+    concurrently; each thread keeps its own connection.
+    """
+
+    def __init__(self, path: str, ttl_s: float = LLM_CACHE_TTL_S, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                create table if not exists llm_cache (
+                    key text primary key,
+                    model text not null,
+                    response text not null,
+                    created_at real not null,
+                    last_access real not null
+                )
+            """)
+            conn.execute("create index if not exists ix_llm_cache_last_access on llm_cache (last_access)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("pragma journal_mode=WAL")
+            conn.execute("pragma synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, model: str, prompt: str):
+        """Returns the cached response, or None when missing or expired."""
+        key = cache_key(model, prompt)
+        conn = self._connect()
+        row = conn.execute("select response, created_at from llm_cache where key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.ttl_s:
+            conn.execute("delete from llm_cache where key = ?", (key,))
+            return None
+        conn.execute("update llm_cache set last_access = ? where key = ?", (now, key))
+        return row[0]
+
+    def set(self, model: str, prompt: str, response: str):
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            "insert or replace into llm_cache (key, model, response, created_at, last_access) values (?, ?, ?, ?, ?)",
+            (cache_key(model, prompt), model, response, now, now),
+        )
+        self._writes += 1
+        if self._writes % _EVICT_EVERY == 0:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones beyond `max_entries`."""
+        conn = self._connect()
+        conn.execute("delete from llm_cache where created_at < ?", (time.time() - self.ttl_s,))
+        conn.execute(
+            "delete from llm_cache where key in (select key from llm_cache order by last_access desc limit -1 offset ?)",
+            (self.max_entries,),
+        )
+
+    def __len__(self):
+        return self._connect().execute("select count(*) from llm_cache").fetchone()[0]
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache():
+    """Process-wide cache instance, or None when caching is disabled."""
+    global _cache
+    if not LLM_CACHE_PATH:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(LLM_CACHE_PATH)
+    return _cache
@@ -5,13 +5,248 @@ env_path = pathlib.Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 import os
+import threading
+import time
 import requests
 import google.generativeai as genai
+from src.tools.llm_cache import get_llm_cache
+from src.tools.metrics import LLM_REQUEST_SECONDS, LLM_REQUESTS
+
+GEMINI_MODEL = 'gemini-1.5-flash'
+OPENAI_MODEL = 'gpt-4o-mini'
+
+# Shared limits for every provider call made through the gateway
+LLM_RATE_LIMIT_PER_S = float(os.getenv("LLM_RATE_LIMIT_PER_S", "5"))
+LLM_RATE_LIMIT_BURST = int(os.getenv("LLM_RATE_LIMIT_BURST", "10"))
+# How long a call may wait for a rate-limit token before using the fallback
+LLM_RATE_LIMIT_WAIT_S = float(os.getenv("LLM_RATE_LIMIT_WAIT_S", "1"))
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_S = float(os.getenv("LLM_CIRCUIT_RESET_S", "30"))
 
 def get_llm_provider():
     provider = os.getenv("LLM_PROVIDER", "local")
     return provider
 
+def fallback_drift_summary(contract_price, po_price):
+    """Deterministic summary used when the model is unavailable or too slow."""
+    drift_pct = ((po_price - contract_price) / contract_price) * 100
+    return f"⚠️ High Drift Detected: PO price is {drift_pct:.1f}% higher than contract. (AI Summary Unavailable)"
+
+def local_draft(prompt):
+    # local fallback: simple template-based deterministic draft (no network)
+    return "DRAFT: " + prompt[:400]
+
+
+class TokenBucket:
+    """Allows `rate_per_s` calls per second on average with bursts up to `capacity`."""
+
+    def __init__(self, rate_per_s: float, capacity: int):
+        self.rate_per_s = rate_per_s
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_s)
+        self._updated = now
+
+    def acquire(self, timeout: float = 0) -> bool:
+        """Takes one token, waiting up to `timeout` seconds. Returns False if none became available."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate_per_s if self.rate_per_s > 0 else timeout
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout_s`; then lets a single trial call through (half-open), which
+    closes the circuit on success or re-opens it on failure.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_timeout_s:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout_s or self._trial_in_flight:
+                return False
+            self._trial_in_flight = True
+            return True
+
+    def release(self):
+        """Gives back a half-open trial slot for a call that was never made."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def _gemini_client():
+    genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    return lambda prompt: model.generate_content(prompt).text
+
+def _openai_client():
+    # placeholder - requires LLM_API_KEY in env; DO NOT COMMIT
+    import openai
+    openai.api_key = os.getenv("LLM_API_KEY")
+    def call(prompt):
+        resp = openai.ChatCompletion.create(model=OPENAI_MODEL, messages=[{"role":"user","content":prompt}], max_tokens=300)
+        return resp.choices[0].message.content
+    return call
+
+def _local_client():
+    return local_draft
+
+
+class LLMGateway:
+    """
+    Single entry point for model calls. Each provider's client is built once and
+    reused; calls go through the response cache, a per-provider token bucket and
+    a per-provider circuit breaker. Whenever a call is rejected or fails, the
+    caller's deterministic fallback is returned instead of raising. An
+    unregistered provider name is served by the local provider, which is not
+    rate limited (it makes no network call).
+    """
+
+    def __init__(self, rate_per_s: float = LLM_RATE_LIMIT_PER_S, burst: int = LLM_RATE_LIMIT_BURST,
+                 rate_limit_wait_s: float = LLM_RATE_LIMIT_WAIT_S, failure_threshold: int = LLM_CIRCUIT_FAILURES,
+                 reset_timeout_s: float = LLM_CIRCUIT_RESET_S):
+        self.rate_per_s = rate_per_s
+        self.burst = burst
+        self.rate_limit_wait_s = rate_limit_wait_s
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        # name -> (model name used as cache key or None to skip caching, client factory, rate limited)
+        self._providers = {
+            "gemini": (GEMINI_MODEL, _gemini_client, True),
+            "openai": (OPENAI_MODEL, _openai_client, True),
+            "local": (None, _local_client, False),
+        }
+        self._warned = set()
+        self._clients = {}
+        self._buckets = {}
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def register_provider(self, name, client_factory, model=None, rate_limited=True):
+        """Adds or replaces a provider; `client_factory()` returns a callable(prompt) -> str."""
+        with self._lock:
+            self._providers[name] = (model, client_factory, rate_limited)
+            self._clients.pop(name, None)
+
+    def _resolve(self, provider):
+        with self._lock:
+            if provider in self._providers:
+                return provider
+            if provider not in self._warned:
+                self._warned.add(provider)
+                print(f"Unknown LLM provider '{provider}', using the local draft instead.")
+            return "local"
+
+    def _state_for(self, provider):
+        """(cache model, token bucket or None if not rate limited, circuit breaker) for a registered provider."""
+        with self._lock:
+            model, _, rate_limited = self._providers[provider]
+            if provider not in self.breakers:
+                self._buckets[provider] = TokenBucket(self.rate_per_s, self.burst) if rate_limited else None
+                self.breakers[provider] = CircuitBreaker(self.failure_threshold, self.reset_timeout_s)
+            return model, self._buckets[provider], self.breakers[provider]
+
+    def _client(self, provider):
+        with self._lock:
+            if provider not in self._clients:
+                self._clients[provider] = self._providers[provider][1]()
+            return self._clients[provider]
+
+    def generate(self, prompt, provider=None, fallback=None):
+        """Returns the model's response to `prompt`, or `fallback` if the call is rejected or fails."""
+        provider = self._resolve(provider or get_llm_provider())
+        model, bucket, breaker = self._state_for(provider)
+
+        cache = get_llm_cache() if model else None
+        if cache is not None:
+            cached = cache.get(model, prompt)
+            if cached is not None:
+                LLM_REQUESTS.labels(provider, "cache_hit").inc()
+                return cached
+
+        if not breaker.allow():
+            LLM_REQUESTS.labels(provider, "circuit_open").inc()
+            return fallback
+        if bucket is not None and not bucket.acquire(timeout=self.rate_limit_wait_s):
+            print(f"LLM rate limit reached for {provider}, using fallback.")
+            LLM_REQUESTS.labels(provider, "rate_limited").inc()
+            breaker.release()
+            return fallback
+
+        started = time.perf_counter()
+        try:
+            response = self._client(provider)(prompt)
+        except Exception as e:
+            LLM_REQUEST_SECONDS.labels(provider).observe(time.perf_counter() - started)
+            LLM_REQUESTS.labels(provider, "error").inc()
+            breaker.record_failure()
+            print(f"{provider} API Error: {e}")
+            return fallback
+        LLM_REQUEST_SECONDS.labels(provider).observe(time.perf_counter() - started)
+        LLM_REQUESTS.labels(provider, "ok").inc()
+        breaker.record_success()
+
+        if cache is not None:
+            cache.set(model, prompt, response)
+        return response
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """Process-wide gateway shared by every caller."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+    return _gateway
+
 def summarize_drift_with_gemini(contract_price, po_price):
     """
     Uses Gemini to summarize a price drift.
@@ -19,35 +254,10 @@ def summarize_drift_with_gemini(contract_price, po_price):
     api_key = os.getenv("GEMINI_API_KEY")
     if not api_key:
         return "Gemini API Key not found. Please set GEMINI_API_KEY in .env."
-        
-    try:
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        prompt = f"Here is a price mismatch: Contract ${contract_price}, PO ${po_price}. Write a one-sentence summary for the dashboard."
-        response = model.generate_content(prompt)
-        return response.text
-    except Exception as e:
-        print(f"Gemini API Error: {e}")
-        # Fallback for demo purposes if API key is invalid/restricted
-        drift_pct = ((po_price - contract_price) / contract_price) * 100
-        return f"⚠️ High Drift Detected: PO price is {drift_pct:.1f}% higher than contract. (AI Summary Unavailable)"
-
-def draft_message(prompt):
-    provider = get_llm_provider()
-    if provider == "openai":
-        # placeholder - requires LLM_API_KEY in env; DO NOT COMMIT
-        import openai
-        openai.api_key = os.getenv("LLM_API_KEY")
-        resp = openai.ChatCompletion.create(model="gpt-4o-mini", messages=[{"role":"user","content":prompt}], max_tokens=300)
-        return resp.choices[0].message.content
-    elif provider == "gemini":
-        genai.configure(api_key=os.getenv("GEMINI_API_KEY"))
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        response = model.generate_content(prompt)
-        return response.text
-    else:
-        # local fallback: simple template-based deterministic draft (no network)
-        return "DRAFT: " + prompt[:400]
-
 
+    prompt = f"Here is a price mismatch: Contract ${contract_price}, PO ${po_price}. Write a one-sentence summary for the dashboard."
+    # Fallback for demo purposes if API key is invalid/restricted or the provider is degraded
+    return get_gateway().generate(prompt, provider="gemini", fallback=fallback_drift_summary(contract_price, po_price))
 
+def draft_message(prompt):
+    return get_gateway().generate(prompt, provider=get_llm_provider(), fallback=local_draft(prompt))
@@ -0,0 +1,122 @@
+# src/tools/metrics.py
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Prometheus metrics for the hot paths, served by the API on /metrics. Each
+# process (uvicorn worker) exports its own; aggregate them in Prometheus.
+
+DETECTION_SECONDS = Histogram(
+    "procurement_detection_seconds", "Wall time of detect_public_only calls", ["mode"],
+)
+DETECTION_STAGE_SECONDS = Histogram(
+    "procurement_detection_stage_seconds", "Time spent in each detection stage", ["mode", "stage"],
+)
+DETECTION_ERRORS = Counter(
+    "procurement_detection_errors_total", "Detection runs that failed and returned no rows", ["mode"],
+)
+DETECTION_DRIFTS = Histogram(
+    "procurement_detection_drifts", "Drifts returned per detection run", ["mode"],
+    buckets=(0, 10, 100, 1000, 10_000, 100_000, 1_000_000),
+)
+
+# outcome: ok, error, cache_hit, rate_limited, circuit_open
+LLM_REQUESTS = Counter(
+    "procurement_llm_requests_total", "LLM gateway calls by outcome", ["provider", "outcome"],
+)
+LLM_REQUEST_SECONDS = Histogram(
+    "procurement_llm_request_seconds", "Latency of LLM provider calls (cache misses only)", ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30),
+)
+
+INGEST_ROWS = Counter("procurement_ingest_rows_total", "Rows written by bulk_load", ["table"])
+INGEST_SECONDS = Histogram(
+    "procurement_ingest_seconds", "Wall time of bulk_load calls", ["table"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300),
+)
+INGEST_ROWS_PER_S = Gauge("procurement_ingest_rows_per_second", "Throughput of the last bulk_load", ["table"])
+INGEST_BATCH_ROWS = Histogram(
+    "procurement_ingest_batch_rows", "Rows per insert batch", ["table"],
+    buckets=(10, 100, 1000, 10_000, 50_000, 100_000, 500_000),
+)
+
+JOB_QUEUE_JOBS = Gauge("procurement_job_queue_jobs", "Jobs in the job table by status", ["status"])
+JOB_SECONDS = Histogram(
+    "procurement_job_seconds", "Run time of jobs, from claim to finish", ["kind", "status"],
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 300, 900),
+)
+
+API_SERIALIZE_SECONDS = Histogram(
+    "procurement_api_serialize_seconds", "Time to serialize API response bodies", ["format"],
+)
+
+_detection_mode = ContextVar("detection_mode", default="unknown")
+# Set by collect_stage_times (profiling); stage durations are also added to it
+_stage_times = ContextVar("stage_times", default=None)
+
+
+@contextmanager
+def detection_run(mode):
+    """Times one detection call; stages timed inside it are labelled with `mode`."""
+    token = _detection_mode.set(mode)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        DETECTION_SECONDS.labels(mode).observe(time.perf_counter() - started)
+        _detection_mode.reset(token)
+
+
+@contextmanager
+def detection_stage(stage):
+    """Times a stage of the current detection run (see detection_run)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        DETECTION_STAGE_SECONDS.labels(_detection_mode.get(), stage).observe(elapsed)
+        times = _stage_times.get()
+        if times is not None:
+            times[stage] = times.get(stage, 0.0) + elapsed
+
+
+@contextmanager
+def collect_stage_times():
+    """Yields a dict that sums the detection stage times recorded in this context (thread)."""
+    times = {}
+    token = _stage_times.set(times)
+    try:
+        yield times
+    finally:
+        _stage_times.reset(token)
+
+
+@contextmanager
+def api_serialization(fmt):
+    """Times serializing an API response body; profiled requests see it as the "response" stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        API_SERIALIZE_SECONDS.labels(fmt).observe(elapsed)
+        times = _stage_times.get()
+        if times is not None:
+            times["response"] = times.get("response", 0.0) + elapsed
+
+
+def detection_failed():
+    DETECTION_ERRORS.labels(_detection_mode.get()).inc()
+
+
+def record_job_queue(counts):
+    """Sets the job queue gauges from a {status: job count} dict."""
+    for status, count in counts.items():
+        JOB_QUEUE_JOBS.labels(status).set(count)
+
+
+def render():
+    """Returns (body, content type) for a /metrics response."""
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,126 @@
+# src/tools/profiler.py
+import cProfile
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from src.tools.metrics import collect_stage_times
+
+# Profiling is off unless an admin token is configured; requests opt in by
+# sending it (see fastapi_app), so normal traffic never runs under a profiler.
+PROFILING_ADMIN_TOKEN = os.getenv("PROFILING_ADMIN_TOKEN", "")
+# Reports (JSON) and raw cProfile dumps (.prof, for snakeviz/pstats) are kept here
+PROFILE_DIR = os.getenv("PROFILE_DIR", "data/profiles")
+# Functions and allocation sites listed in a report
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "30"))
+
+# tracemalloc is process-wide, so only one profiled call runs at a time
+_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when another profiled call is already running in this process."""
+
+
+def profiling_enabled() -> bool:
+    return bool(PROFILING_ADMIN_TOKEN)
+
+
+def _top_functions(profile, n):
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in pstats.Stats(profile).stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({name})",
+            "ncalls": ncalls,
+            "tottime_s": round(tottime, 6),
+            "cumtime_s": round(cumtime, 6),
+        })
+    rows.sort(key=lambda r: r["cumtime_s"], reverse=True)
+    return rows[:n]
+
+
+def _top_allocations(snapshot, n):
+    return [
+        {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+        for stat in snapshot.statistics("lineno")[:n]
+    ]
+
+
+def profile_call(fn, *args, profile_id=None, **kwargs):
+    """
+    Runs `fn(*args, **kwargs)` under cProfile and tracemalloc and returns
+    (result, report). The report has the wall time, the detection stage times
+    recorded during the call, the peak traced memory with the largest
+    allocation sites, and the top functions by cumulative time. It is stored
+    under `profile_id` (a new id if None; see load_report) next to the raw
+    .prof dump. cProfile only sees the calling thread; tracemalloc counts
+    every thread's allocations.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profiled call is already running")
+    try:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline, _ = tracemalloc.get_traced_memory()
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            with collect_stage_times() as stages:
+                profile.enable()
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    profile.disable()
+            wall_s = time.perf_counter() - started
+            _, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            if not was_tracing:
+                tracemalloc.stop()
+    finally:
+        _lock.release()
+
+    profile_id = profile_id or uuid.uuid4().hex
+    report = {
+        "id": profile_id,
+        "created_at": time.time(),
+        "wall_s": round(wall_s, 6),
+        "stages_s": {stage: round(seconds, 6) for stage, seconds in stages.items()},
+        "memory": {
+            "peak_bytes": peak - baseline,
+            "top_allocations": _top_allocations(snapshot, PROFILE_TOP_N),
+        },
+        "functions": _top_functions(profile, PROFILE_TOP_N),
+    }
+    _save(report, profile)
+    return result, report
+
+
+def _report_path(profile_id, ext):
+    # Ids are task ids or generated hex strings; anything else could escape PROFILE_DIR
+    if not profile_id.replace("-", "").isalnum():
+        raise ValueError(f"Invalid profile id: {profile_id}")
+    return os.path.join(PROFILE_DIR, f"{profile_id}{ext}")
+
+
+def _save(report, profile):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    profile.dump_stats(_report_path(report["id"], ".prof"))
+    path = _report_path(report["id"], ".json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(report, f)
+    os.replace(path + ".tmp", path)
+
+
+def load_report(profile_id):
+    """Returns the stored report, or None if there is none for `profile_id`."""
+    try:
+        with open(_report_path(profile_id, ".json")) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
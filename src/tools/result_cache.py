@@ -0,0 +1,113 @@
+# src/tools/result_cache.py
+import asyncio
+import threading
+from collections import OrderedDict
+from sqlalchemy import inspect, text
+
+# Single-row counter bumped by every writer (ingestors, simulate_traffic). Cached
+# results are keyed on it, so a bump invalidates them in every process at once.
+DATA_VERSION_TABLE = "data_version"
+
+
+def get_data_version(engine) -> int:
+    """Returns the current data version, 0 if nothing has bumped it yet."""
+    with engine.connect() as conn:
+        if not inspect(conn).has_table(DATA_VERSION_TABLE):
+            return 0
+        version = conn.execute(text(f"select version from {DATA_VERSION_TABLE}")).scalar()
+    return version or 0
+
+
+def bump_data_version(engine) -> int:
+    """Marks the pos/contracts data as changed and returns the new version."""
+    with engine.begin() as conn:
+        conn.execute(text(f"create table if not exists {DATA_VERSION_TABLE} (version integer not null)"))
+        updated = conn.execute(text(f"update {DATA_VERSION_TABLE} set version = version + 1")).rowcount
+        if not updated:
+            conn.execute(text(f"insert into {DATA_VERSION_TABLE} (version) values (1)"))
+        return conn.execute(text(f"select version from {DATA_VERSION_TABLE}")).scalar()
+
+
+class LRUCache:
+    """Thread-safe, size-bounded LRU cache with hit/miss counters."""
+
+    def __init__(self, maxsize: int = 64):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Returns (True, value) on a hit and (False, None) on a miss."""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical async calls: while a call for `key` is in
+    flight, later callers await the same result instead of starting their own.
+    Nothing is kept once the call finishes; pair with a cache for that.
+    `deduplicated` counts calls that, once executed, were still merged with
+    existing work further down (e.g. the job table); it is bumped from worker
+    threads, so under a lock.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.coalesced = 0
+        self.deduplicated = 0
+
+    def record_deduplicated(self):
+        with self._lock:
+            self.deduplicated += 1
+
+    async def do(self, key, fn):
+        """Returns the result of `await fn()`, shared with concurrent callers using the same key."""
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one caller disconnecting does not cancel the others' result
+        return await asyncio.shield(task)
+
+    def stats(self):
+        with self._lock:
+            deduplicated = self.deduplicated
+        return {"in_flight": len(self._in_flight), "executed": self.executed, "coalesced": self.coalesced,
+                "deduplicated": deduplicated}
@@ -0,0 +1,11 @@
+# src/tools/thresholds.py
+
+# Drift threshold used when a caller passes none, as a percentage over the contract price
+DEFAULT_DRIFT_THRESHOLD = 5
+
+
+def threshold_ratio(drift_threshold=None) -> float:
+    """Converts a percentage threshold (e.g. 5) into a price ratio (e.g. 1.05)."""
+    if drift_threshold is None:
+        drift_threshold = DEFAULT_DRIFT_THRESHOLD
+    return 1 + (drift_threshold / 100.0)
@@ -0,0 +1,55 @@
+import asyncio
+import gc
+import threading
+import pytest
+from fastapi.testclient import TestClient
+from src.api.executor import BlockingExecutor, ExecutorBusy
+
+
+def test_executor_rejects_beyond_capacity_and_keeps_loop_free():
+    executor = BlockingExecutor(workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = [asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorBusy):
+            await executor.run(lambda: None)
+        # The event loop is still responsive while both slots are blocked
+        assert await asyncio.wait_for(asyncio.sleep(0, result='ok'), timeout=1) == 'ok'
+        release.set()
+        await asyncio.gather(*running)
+        return await executor.run(lambda: 42)
+
+    assert asyncio.run(scenario()) == 42
+    assert executor.stats()['rejected'] == 1
+    assert executor.stats()['in_flight'] == 0
+
+
+def test_api_returns_503_when_executor_full(monkeypatch):
+    from src.api import fastapi_app
+    busy = BlockingExecutor(workers=1, queue_size=0)
+    busy._in_flight = busy.max_pending
+    monkeypatch.setattr(fastapi_app, 'blocking', busy)
+
+    response = TestClient(fastapi_app.app).get('/api/leaks')
+    assert response.status_code == 503
+    assert response.headers['retry-after'] == '1'
+
+
+def test_stream_takes_its_slot_up_front_and_always_gives_it_back():
+    executor = BlockingExecutor(workers=1, queue_size=0)
+
+    async def scenario():
+        unused = executor.stream(iter([1, 2]))
+        # Admitted before any headers go out, so a second stream gets the 503
+        with pytest.raises(ExecutorBusy):
+            executor.stream(iter([3]))
+        # Never iterated: the slot is returned when the generator is dropped
+        del unused
+        gc.collect()
+        assert executor.stats()['in_flight'] == 0
+        return [item async for item in executor.stream(iter([1, 2]))]
+
+    assert asyncio.run(scenario()) == [1, 2]
+    assert executor.stats()['in_flight'] == 0
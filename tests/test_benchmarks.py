@@ -0,0 +1,36 @@
+import json
+import pandas as pd
+from benchmarks.run_benchmarks import BASELINE_PATH, compare, main, prepare_data
+
+
+def test_compare_flags_regressions_past_tolerance():
+    baseline = {'detect_full[10000]': {'wall_s': 1.0, 'rows_per_s': 10000, 'peak_rss_mb': 200}}
+    current = {'detect_full[10000]': {'wall_s': 1.2, 'rows_per_s': 7000, 'peak_rss_mb': 300},
+               'ingest[10000]': {'wall_s': 9.0}}
+    assert compare(current, baseline, tolerance=0.25) == [
+        ('detect_full[10000]', 'rows_per_s', 10000, 7000),
+        ('detect_full[10000]', 'peak_rss_mb', 200, 300),
+    ]
+    # Tiny absolute changes are noise, whatever the ratio
+    assert compare({'k': {'wall_s': 0.02}}, {'k': {'wall_s': 0.01}}) == []
+
+
+def test_prepare_data_writes_ingestor_and_sf_inputs(tmp_path):
+    prepare_data(tmp_path, 500)
+    pos = pd.read_csv(tmp_path / 'data' / 'pos.csv')
+    sf = pd.read_csv(tmp_path / 'data' / 'sf_data' / 'sf_procurement.csv')
+    assert len(pos) == len(sf) == 500
+    assert sf['Purchase Order'].tolist() == pos['po_id'].tolist()
+    assert (tmp_path / 'data' / 'contracts.csv').exists()
+
+
+def test_missing_baseline_fails_without_update(tmp_path):
+    assert main(['--sizes', '10', '--baseline', str(tmp_path / 'missing.json')]) == 2
+    assert not (tmp_path / 'missing.json').exists()
+
+
+def test_committed_baseline_covers_default_cases():
+    baseline = json.loads(BASELINE_PATH.read_text())
+    for rows in (10000, 1000000, 10000000):
+        for case in ('ingest', 'detect_full', 'detect_sql', 'api_leaks', 'ingest_sf_streaming'):
+            assert 'wall_s' in baseline[f'{case}[{rows}]']
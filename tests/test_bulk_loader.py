@@ -0,0 +1,47 @@
+import pandas as pd
+from sqlalchemy import create_engine, text
+from src.agents.drift_table import ensure_po_drift
+from src.tools.bulk_loader import bulk_load
+
+
+def test_replace_swaps_in_staging_table(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'procure.db'}")
+    pd.DataFrame({'po_id': ['old'], 'unit_price': [1.0]}).to_sql('pos', engine, index=False)
+
+    df = pd.DataFrame({'po_id': ['a', 'b', 'c'], 'unit_price': [1.5, None, 3.0],
+                       'date': pd.to_datetime(['2024-01-01', '2024-01-02', '2024-01-03'])})
+    stats = bulk_load(df, 'pos', engine, batch_size=2)
+
+    assert stats['rows'] == 3 and stats['batches'] == 2 and stats['rows_per_s'] > 0
+    with engine.connect() as conn:
+        assert conn.execute(text("pragma journal_mode")).scalar() == 'wal'
+        tables = {r[0] for r in conn.execute(text("select name from sqlite_master where type = 'table'"))}
+        rows = conn.execute(text("select po_id, unit_price from pos order by po_id")).fetchall()
+    assert 'pos__staging' not in tables
+    assert [tuple(r) for r in rows] == [('a', 1.5), ('b', None), ('c', 3.0)]
+
+
+def test_append_fires_po_drift_triggers():
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1], 'contract_id': [1], 'unit_price': [100]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    ensure_po_drift(engine)
+
+    bulk_load(pd.DataFrame({'po_id': [2, 3], 'contract_id': [1, 1], 'unit_price': [120, 90]}),
+              'pos', engine, if_exists='append')
+
+    with engine.connect() as conn:
+        drifts = conn.execute(text("select po_id, price_drift from po_drift order by po_id")).fetchall()
+    assert [tuple(r) for r in drifts] == [(1, 1.0), (2, 1.2), (3, 0.9)]
+
+
+def test_replace_table_referenced_by_trigger(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'load.db'}")
+    bulk_load(pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100.0]}), 'contracts', engine)
+    bulk_load(pd.DataFrame({'po_id': [1], 'contract_id': [1], 'unit_price': [110.0]}), 'pos', engine)
+    ensure_po_drift(engine)
+
+    # The pos triggers read contracts, which is swapped out underneath them
+    bulk_load(pd.DataFrame({'contract_id': [1], 'contract_unit_price': [50.0]}), 'contracts', engine)
+    with engine.connect() as conn:
+        assert conn.execute(text("select contract_unit_price from contracts")).scalar() == 50.0
@@ -0,0 +1,76 @@
+import os
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from src.agents.price_detector import detect_public_only
+from src.tools import columnar_store
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_columnar_mode_matches_full(tmp_path, monkeypatch, fmt):
+    monkeypatch.setattr(columnar_store, 'COLUMNAR_DIR', str(tmp_path))
+    monkeypatch.setattr(columnar_store, 'COLUMNAR_FORMAT', fmt)
+
+    pos_df = pd.DataFrame({'po_id': [1, 2, 3, 4, 5],
+                           'contract_id': [1, 1, 2, 2, 3],
+                           'unit_price': [110, 100, 205, 200, 300]})
+    contracts_df = pd.DataFrame({'contract_id': [1, 2],
+                                 'contract_unit_price': [100, 200]})
+    columnar_store.write_table(pos_df, 'pos')
+    columnar_store.write_table(contracts_df, 'contracts')
+    columnar_store.append_table(pd.DataFrame({'po_id': [6], 'contract_id': [2], 'unit_price': [260.0]}), 'pos')
+
+    engine = create_engine('sqlite:///:memory:')
+    pd.concat([pos_df, pd.DataFrame({'po_id': [6], 'contract_id': [2], 'unit_price': [260]})]) \
+        .to_sql('pos', engine, index=False)
+    contracts_df.to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    df = detect_public_only(drift_threshold=2, mode="columnar")
+    full = detect_public_only(drift_threshold=2, mode="full")
+
+    assert df['po_id'].tolist() == full['po_id'].tolist() == [6, 1, 3]
+    assert df['price_drift'].tolist() == full['price_drift'].tolist()
+
+
+def test_read_table_projects_columns(tmp_path):
+    columnar_store.write_table(pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}), 't', directory=str(tmp_path))
+    columnar_store.write_table(pd.DataFrame({'a': [3]}), 't', directory=str(tmp_path))
+
+    table = columnar_store.read_table('t', columns=['a'], directory=str(tmp_path))
+    assert table.column_names == ['a']
+    assert table['a'].to_pylist() == [3]
+
+
+def test_write_table_swaps_current_version(tmp_path):
+    columnar_store.write_table(pd.DataFrame({'a': [1]}), 't', directory=str(tmp_path))
+    first = columnar_store._version_dir('t', directory=str(tmp_path))
+    columnar_store.write_table(pd.DataFrame({'a': [2]}), 't', directory=str(tmp_path))
+    columnar_store.write_table(pd.DataFrame({'a': [3]}), 't', directory=str(tmp_path))
+
+    # The live version and the one it replaced; older versions are removed
+    versions = sorted(e for e in os.listdir(tmp_path / 't') if e.startswith('v-'))
+    assert len(versions) == 2 and os.path.basename(first) not in versions
+    assert columnar_store.read_table('t', directory=str(tmp_path))['a'].to_pylist() == [3]
+
+
+def test_columnar_read_error_returns_empty_result(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar_store, 'COLUMNAR_DIR', str(tmp_path))
+    columnar_store.write_table(pd.DataFrame({'po_id': [1], 'contract_id': [1], 'unit_price': [110.0]}), 'pos')
+    # contracts without the contract_unit_price column
+    columnar_store.write_table(pd.DataFrame({'contract_id': [1]}), 'contracts')
+
+    df = detect_public_only(drift_threshold=2, mode="columnar")
+    assert df.empty
+
+
+@pytest.mark.parametrize("fmt", ["arrow", "parquet"])
+def test_take_rows_across_parts_keeps_requested_order(tmp_path, fmt):
+    directory = str(tmp_path)
+    columnar_store.write_table(pd.DataFrame({'a': [0, 1, 2], 'b': ['x', 'y', 'z']}), 't', directory=directory, fmt=fmt)
+    columnar_store.append_table(pd.DataFrame({'a': [3, 4], 'b': ['u', 'v']}), 't', directory=directory, fmt=fmt)
+    columnar_store.append_table(pd.DataFrame({'a': [5], 'b': ['w']}), 't', directory=directory, fmt=fmt)
+
+    table = columnar_store.take_rows('t', [4, 0, 3], directory=directory)
+    assert table['a'].to_pylist() == [4, 0, 3] and table['b'].to_pylist() == ['v', 'x', 'u']
+    assert columnar_store.take_rows('t', [], directory=directory).column_names == ['a', 'b']
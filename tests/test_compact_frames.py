@@ -0,0 +1,78 @@
+import pandas as pd
+from sqlalchemy import create_engine
+from src.agents import compact_frames
+from src.agents.compact_frames import compact_frame, expand_frame
+from src.agents.price_detector import detect_public_only
+
+
+def _frames(n=3000):
+    pos = pd.DataFrame({
+        'po_id': [f'PO{i:06d}' for i in range(n)],
+        'vendor_id': [f'V{i % 7}' for i in range(n)],
+        'item_id': [f'ITEM{i % 13}' for i in range(n)],
+        'unit_price': [round(10.01 + (i % 17) * 1.37, 2) for i in range(n)],
+        'qty': [1 + i % 5 for i in range(n)],
+        'date': [f'2024-01-{1 + i % 28:02d}' for i in range(n)],
+        'contract_id': [f'C{i % 11}' if i % 4 else '' for i in range(n)],
+    })
+    pos['total'] = (pos['unit_price'] * pos['qty']).round(2)
+    contracts = pd.DataFrame({'contract_id': [f'C{i}' for i in range(10)],
+                              'contract_unit_price': [10.01 + i * 1.5 for i in range(10)]})
+    return pos, contracts
+
+
+def test_compact_frame_is_smaller_and_round_trips():
+    pos, _ = _frames()
+    compact = compact_frame(pos)
+    assert isinstance(compact['vendor_id'].dtype, pd.CategoricalDtype)
+    assert compact['unit_price'].dtype == 'float32'
+    assert pd.api.types.is_datetime64_any_dtype(compact['date'])
+    assert compact.memory_usage(deep=True).sum() * 3 < pos.memory_usage(deep=True).sum()
+
+    expanded = expand_frame(compact)
+    pd.testing.assert_frame_equal(expanded[pos.columns], pos, check_dtype=False)
+
+
+def test_compact_mode_matches_full(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pos, contracts = _frames()
+    pos.to_sql('pos', engine, index=False)
+    contracts.to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+    # Several chunks, so categoricals from different chunks are merged
+    monkeypatch.setattr(compact_frames, 'COMPACT_CHUNK_ROWS', 700)
+
+    for threshold in (0, 5, 20):
+        full = detect_public_only(drift_threshold=threshold, mode='full')
+        compact = detect_public_only(drift_threshold=threshold, mode='compact')
+        key = ['price_drift', 'po_id']
+        full = full.sort_values(key, ascending=[False, True]).reset_index(drop=True)
+        compact = compact.sort_values(key, ascending=[False, True]).reset_index(drop=True)
+        assert len(compact) > 0
+        pd.testing.assert_frame_equal(compact, full, check_dtype=False)
+
+
+def test_large_amounts_keep_float64_and_match_full(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pos, contracts = _frames(500)
+    # Beyond float32's ~7 significant digits
+    pos['unit_price'] = pos['unit_price'] * 100003 + 0.01
+    pos['total'] = (pos['unit_price'] * pos['qty']).round(2)
+    contracts['contract_unit_price'] = contracts['contract_unit_price'] * 100003 + 0.01
+    assert pos['total'].min() >= 1_000_000
+
+    compact = compact_frame(pos)
+    assert compact['unit_price'].dtype == 'float64' and compact['total'].dtype == 'float64'
+    pd.testing.assert_frame_equal(expand_frame(compact)[pos.columns], pos, check_dtype=False)
+
+    pos.to_sql('pos', engine, index=False)
+    contracts.to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+
+    key = ['price_drift', 'po_id']
+    full = detect_public_only(drift_threshold=5, mode='full').sort_values(key, ascending=[False, True])
+    compact = detect_public_only(drift_threshold=5, mode='compact').sort_values(key, ascending=[False, True])
+    assert len(compact) > 0
+    pd.testing.assert_frame_equal(compact.reset_index(drop=True), full.reset_index(drop=True), check_dtype=False)
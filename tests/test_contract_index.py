@@ -0,0 +1,90 @@
+import asyncio
+import httpx
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from src.tools.contract_index import ContractPriceIndex
+from src.tools.result_cache import bump_data_version
+from src.tools.thresholds import threshold_ratio
+
+
+def _engine():
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    pd.DataFrame({'contract_id': [1, 2, 2, 3], 'contract_unit_price': [100.0, 200.0, 180.0, 0.0]}) \
+        .to_sql('contracts', engine, index=False)
+    return engine
+
+
+def test_index_checks_and_reloads_on_change():
+    engine = _engine()
+    index = ContractPriceIndex(engine)
+    assert index.refresh()
+    assert not index.refresh()  # unchanged
+
+    assert index.check('1', 104)['verdict'] == 'ok'
+    assert index.check(1, 110) == {'contract_unit_price': 100.0, 'price_drift': 1.1, 'verdict': 'drift', 'block': True}
+    assert index.check(1, 110, drift_threshold=20)['block'] is False
+    # Duplicate contract rows keep the lowest price; zero prices are not indexed
+    assert index.price(2) == 180.0
+    assert index.check(3, 10)['verdict'] == 'no_contract'
+
+    with engine.begin() as conn:
+        conn.execute(text("update contracts set contract_unit_price = 50 where contract_id = 1"))
+    assert index.refresh()
+    assert index.price(1) == 50.0
+
+
+def test_index_reloads_on_price_swap():
+    engine = _engine()
+    index = ContractPriceIndex(engine)
+    index.refresh()
+
+    # Same row count, max rowid and price total: only the contracts triggers tell
+    with engine.begin() as conn:
+        conn.execute(text("update contracts set contract_unit_price = case contract_id when 1 then 200.0 else 100.0 end"
+                          " where rowid in (1, 2)"))
+    assert index.refresh()
+    assert index.price(1) == 200.0 and index.price(2) == 100.0
+
+
+def test_index_ignores_other_writes_and_survives_table_replacement():
+    engine = _engine()
+    index = ContractPriceIndex(engine)
+    index.refresh()
+
+    # PO writers bump the global data version; the contracts did not change
+    bump_data_version(engine)
+    assert not index.refresh()
+
+    # Replacing the table drops the triggers; they come back and the index reloads
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [70.0]}).to_sql('contracts', engine, index=False,
+                                                                            if_exists='replace')
+    assert index.refresh()
+    assert index.price(1) == 70.0 and index.price(2) is None
+    with engine.begin() as conn:
+        conn.execute(text("delete from contracts"))
+    assert index.refresh()
+    assert index.stats()['contracts'] == 0
+
+
+def test_threshold_ratio_defaults_to_five_percent():
+    assert threshold_ratio(None) == 1.05
+    assert threshold_ratio(20) == 1.2
+
+
+def test_check_po_endpoint(monkeypatch):
+    from src.api import fastapi_app
+    monkeypatch.setattr(fastapi_app, 'contract_index', ContractPriceIndex(_engine()))
+
+    async def post(body):
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return (await client.post('/api/check-po', json=body)).json()
+
+    single = asyncio.run(post({'po_id': 'PO1', 'contract_id': '1', 'unit_price': 120}))
+    assert single['verdict'] == 'drift' and single['block'] and single['po_id'] == 'PO1'
+
+    batch = asyncio.run(post({'pos': [{'contract_id': 1, 'unit_price': 101}, {'contract_id': 9, 'unit_price': 5},
+                                      {'contract_id': 2, 'unit_price': 200}], 'drift_threshold': 2}))
+    assert [r['verdict'] for r in batch['results']] == ['ok', 'no_contract', 'drift']
+    assert batch['blocked'] == 1
@@ -0,0 +1,55 @@
+import pandas as pd
+import pyarrow.parquet as pq
+from data_generator import BulkGenerator, write_bulk
+
+
+def _frames(gen, chunk_size):
+    chunks = list(gen.iter_pos(chunk_size))
+    pos = pd.concat([p.to_pandas() for p, _ in chunks], ignore_index=True)
+    labels = pd.concat([l.to_pandas() for _, l in chunks], ignore_index=True)
+    return pos, labels
+
+
+def test_bulk_generator_is_seeded_and_chunked():
+    pos, labels = _frames(BulkGenerator(n_pos=2500, n_contracts=50, seed=7), chunk_size=1000)
+    again, _ = _frames(BulkGenerator(n_pos=2500, n_contracts=50, seed=7), chunk_size=1000)
+    other, _ = _frames(BulkGenerator(n_pos=2500, n_contracts=50, seed=8), chunk_size=1000)
+
+    assert len(pos) == len(labels) == 2500
+    assert pos['po_id'].is_unique and pos['po_id'].iloc[-1] == 'PO000002499'
+    assert labels['po_id'].tolist() == pos['po_id'].tolist()
+    pd.testing.assert_frame_equal(pos, again)
+    assert not pos['unit_price'].equals(other['unit_price'])
+
+
+def test_bulk_generator_knobs():
+    gen = BulkGenerator(n_pos=20_000, n_contracts=100, n_vendors=50, contract_coverage=0.5,
+                        leak_rate=0.1, vendor_skew=1.5, seed=1)
+    contracts = gen.contracts().to_pandas()
+    pos, labels = _frames(gen, chunk_size=5000)
+
+    covered = pos['contract_id'] != ''
+    assert 0.47 < covered.mean() < 0.53
+    assert 0.08 < labels['leak'].mean() < 0.12
+    # Skewed popularity: the first vendor gets far more than a uniform 1/50 share
+    assert (pos['vendor_id'] == 'V000').mean() > 0.1
+
+    # Covered POs drift only when labelled as leaks
+    merged = pos[covered].merge(contracts, on='contract_id', suffixes=('', '_contract'))
+    assert (merged['vendor_id'] == merged['vendor_id_contract']).all()
+    drift = merged['unit_price'] / merged['contract_unit_price']
+    leak = labels.set_index('po_id').loc[merged['po_id'], 'leak'].to_numpy()
+    assert (drift[~leak] <= 1.06).all()
+    assert (drift[leak] > 1.04).all()
+
+
+def test_write_bulk_streams_csv_and_parquet(tmp_path):
+    assert write_bulk(tmp_path / 'csv', fmt='csv', chunk_size=300, n_pos=1000, n_contracts=20) == 1000
+    pos = pd.read_csv(tmp_path / 'csv' / 'public' / 'pos.csv')
+    assert len(pos) == 1000
+    assert list(pos.columns) == ['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'total', 'date', 'contract_id']
+    assert len(pd.read_csv(tmp_path / 'csv' / 'public' / 'contracts.csv')) == 20
+    assert len(pd.read_csv(tmp_path / 'csv' / 'private' / 'pos_labels.csv')) == 1000
+
+    write_bulk(tmp_path / 'pq', fmt='parquet', chunk_size=300, n_pos=1000, n_contracts=20)
+    assert pq.read_table(tmp_path / 'pq' / 'public' / 'pos.parquet').num_rows == 1000
@@ -0,0 +1,78 @@
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+from src.agents.drift_table import ensure_po_drift
+from src.agents.price_detector import detect_public_only
+
+
+def test_po_drift_maintained_on_insert(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1, 2], 'contract_id': [1, 2], 'unit_price': [110, 200]}) \
+        .to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1, 2], 'contract_unit_price': [100, 200]}) \
+        .to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    ensure_po_drift(engine)
+
+    # Appended rows get their drift computed by the insert trigger
+    pd.DataFrame({'po_id': [3, 4], 'contract_id': [2, 9], 'unit_price': [260, 50]}) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("select po_id, price_drift from po_drift order by po_id")).fetchall()
+    assert [(r[0], r[1]) for r in rows] == [(1, 1.1), (2, 1.0), (3, 1.3)]
+
+    df = detect_public_only(drift_threshold=5, mode="materialized")
+    assert df['po_id'].tolist() == [3, 1]
+    assert df['price_drift'].tolist() == detect_public_only(drift_threshold=5, mode="full")['price_drift'].tolist()
+
+
+def test_po_drift_rebuilt_after_pos_replaced(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1], 'contract_id': [1], 'unit_price': [110]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    ensure_po_drift(engine)
+
+    # Replacing pos drops the triggers; the next read notices and rebuilds
+    pd.DataFrame({'po_id': [7], 'contract_id': [1], 'unit_price': [150]}) \
+        .to_sql('pos', engine, if_exists='replace', index=False)
+
+    df = detect_public_only(mode="materialized")
+    assert df['po_id'].tolist() == [7]
+
+
+def test_po_drift_follows_contract_changes():
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1, 2, 3], 'contract_id': [1, 1, 2], 'unit_price': [110, 120, 300]}) \
+        .to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    ensure_po_drift(engine)
+
+    def drifts():
+        with engine.connect() as conn:
+            rows = conn.execute(text("select po_id, price_drift from po_drift order by po_id")).fetchall()
+        return [(r[0], r[1]) for r in rows]
+
+    assert drifts() == [(1, 1.1), (2, 1.2)]
+    with engine.begin() as conn:
+        conn.execute(text("update contracts set contract_unit_price = 50 where contract_id = 1"))
+        conn.execute(text("insert into contracts values (2, 200)"))
+    assert drifts() == [(1, 2.2), (2, 2.4), (3, 1.5)]
+    with engine.begin() as conn:
+        conn.execute(text("delete from contracts where contract_id = 1"))
+    assert drifts() == [(3, 1.5)]
+
+
+def test_ensure_po_drift_is_read_only_once_installed(capsys):
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1], 'contract_id': [1], 'unit_price': [110]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    ensure_po_drift(engine)
+    capsys.readouterr()
+
+    statements = []
+    event.listen(engine, 'before_cursor_execute', lambda conn, cursor, sql, *args: statements.append(sql.lower()))
+    ensure_po_drift(engine)
+    assert not [s for s in statements if s.lstrip().startswith(('create', 'drop', 'insert', 'delete', 'update'))]
+    assert 'Rebuilt' not in capsys.readouterr().out
@@ -0,0 +1,63 @@
+import json
+import pandas as pd
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from src.agents.drift_table import ensure_po_drift
+from src.api.events import EventHub, format_sse
+from src.tools.job_queue import JobQueue
+from src.tools.result_cache import bump_data_version
+
+
+def _seed(monkeypatch):
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    pd.DataFrame({'po_id': [1, 2], 'contract_id': [1, 1], 'unit_price': [120, 100]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    ensure_po_drift(engine)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+    return engine
+
+
+def test_hub_emits_only_drifts_inserted_after_subscribing(monkeypatch, tmp_path):
+    engine = _seed(monkeypatch)
+    monkeypatch.setattr('src.tools.job_queue._queue', JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results')))
+    hub = EventHub(engine)
+    assert hub._poll(set()) == []  # baseline: existing drifts are not replayed
+
+    pd.DataFrame({'po_id': [3, 4], 'contract_id': [1, 1], 'unit_price': [150, 90]}) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+    bump_data_version(engine)
+    events = hub._poll(set())
+    assert [e['event'] for e in events] == ['drifts']
+    assert [(r['po_id'], r['price_drift']) for r in events[0]['data']] == [(3, 1.5)]
+    assert hub._poll(set()) == []
+
+
+def test_task_stream_reports_completion(monkeypatch, tmp_path):
+    engine = _seed(monkeypatch)
+    from src.api import fastapi_app
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results'), workers=1)
+    monkeypatch.setattr('src.tools.job_queue._queue', queue)
+    monkeypatch.setattr(fastapi_app, 'engine', engine)
+    monkeypatch.setattr(fastapi_app.event_hub, 'engine', engine)
+    monkeypatch.setattr(fastapi_app.event_hub, 'poll_s', 0.05)
+
+    with TestClient(fastapi_app.app) as client:
+        task_id = client.post('/api/run-detection').json()['task_id']
+        statuses = []
+        with client.stream('GET', '/api/events', params={'task_id': task_id}) as response:
+            assert response.headers['content-type'].startswith('text/event-stream')
+            for line in response.iter_lines():
+                if line.startswith('data: '):
+                    statuses.append(json.loads(line[len('data: '):])['status'])
+        assert statuses[-1] == 'completed'
+        result = client.get(f'/api/run-detection/{task_id}').json()['result']
+        assert [r['po_id'] for r in result] == [1]
+    queue.stop()
+
+
+def test_format_sse_writes_non_finite_values_as_null():
+    event = {'event': 'drifts', 'data': [{'po_id': 1, 'price_drift': float('inf'), 'qty': float('nan')}]}
+    payload = format_sse(event).split('data: ', 1)[1]
+    assert json.loads(payload) == [{'po_id': 1, 'price_drift': None, 'qty': None}]
@@ -0,0 +1,72 @@
+import pandas as pd
+from sqlalchemy import create_engine
+from src.agents.price_detector import detect_public_only
+
+
+def _seed(engine):
+    pos_df = pd.DataFrame({'po_id': [1, 2, 3],
+                           'contract_id': [1, 1, 2],
+                           'unit_price': [110, 100, 205]})
+    pos_df.to_sql('pos', engine, index=False)
+    contracts_df = pd.DataFrame({'contract_id': [1, 2],
+                                 'contract_unit_price': [100, 200]})
+    contracts_df.to_sql('contracts', engine, index=False)
+
+
+def test_incremental_only_evaluates_new_pos(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    _seed(engine)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    df = detect_public_only(drift_threshold=2, mode="incremental")
+    assert df['po_id'].tolist() == [1, 3]
+
+    # Append new POs, as /api/simulate-traffic does
+    pd.DataFrame({'po_id': [4, 5], 'contract_id': [2, 2], 'unit_price': [300, 199]}) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+
+    calls = []
+    original = pd.read_sql
+
+    def tracking_read_sql(sql, con, **kwargs):
+        calls.append(str(sql))
+        return original(sql, con, **kwargs)
+
+    monkeypatch.setattr(pd, 'read_sql', tracking_read_sql)
+    df = detect_public_only(drift_threshold=2, mode="incremental")
+
+    assert df['po_id'].tolist() == [4, 1, 3]
+    assert not any(c == "select * from pos" for c in calls)
+
+    # Same answer as a full rescan, for any threshold above the floor
+    full = detect_public_only(drift_threshold=8, mode="full")
+    incremental = detect_public_only(drift_threshold=8, mode="incremental")
+    assert full['po_id'].tolist() == incremental['po_id'].tolist() == [4, 1]
+
+
+def test_incremental_rebuilds_when_contracts_change(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    _seed(engine)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    assert detect_public_only(drift_threshold=2, mode="incremental")['po_id'].tolist() == [1, 3]
+
+    pd.DataFrame({'contract_id': [1, 2], 'contract_unit_price': [100, 100]}) \
+        .to_sql('contracts', engine, if_exists='replace', index=False)
+
+    df = detect_public_only(drift_threshold=2, mode="incremental")
+    assert df['po_id'].tolist() == [3, 1]
+
+
+def test_incremental_rebuilds_when_pos_replaced_by_larger_table(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    _seed(engine)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    assert detect_public_only(drift_threshold=2, mode="incremental")['po_id'].tolist() == [1, 3]
+
+    # Same contracts, more rows than before: the watermark alone would keep the stale drifts
+    pd.DataFrame({'po_id': [11, 12, 13, 14], 'contract_id': [1, 1, 2, 2], 'unit_price': [100, 150, 200, 200]}) \
+        .to_sql('pos', engine, if_exists='replace', index=False)
+
+    assert detect_public_only(drift_threshold=2, mode="incremental")['po_id'].tolist() == [12]
@@ -0,0 +1,77 @@
+import threading
+import time
+import pandas as pd
+from src.tools.job_queue import JobQueue
+
+
+def _wait_for(queue, job_id, states=('completed', 'failed', 'cancelled'), timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job['status'] in states:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} stuck in {queue.get(job_id)['status']}")
+
+
+def test_job_runs_and_result_survives_new_queue_instance(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results'), workers=1)
+    queue.register('double', lambda job: pd.DataFrame({'x': [job.params['n'] * 2], 'note': ['pending']}))
+    job_id, created = queue.submit('double', {'n': 21})
+    assert created
+    job = _wait_for(queue, job_id)
+    assert job['status'] == 'completed' and job['progress'] == 1.0
+    queue.patch_result(job_id, 0, 'note', 'patched')
+    queue.stop()
+
+    # Another process (a fresh instance on the same files) serves the same result
+    other = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results'), workers=1)
+    frame = other.result(job_id)
+    assert frame['x'].tolist() == [42]
+    assert frame['note'].tolist() == ['patched']
+
+
+def test_identical_active_jobs_are_deduplicated_and_cancellable(tmp_path):
+    release = threading.Event()
+
+    def slow(job):
+        while not release.wait(0.01):
+            job.report(0.5, "waiting")
+        return None
+
+    queue = JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results'), workers=1)
+    queue.register('slow', slow)
+    first, _ = queue.submit('slow', {'v': 1})
+    second, created = queue.submit('slow', {'v': 1})
+    assert second == first and not created
+
+    # With one worker busy, a different job waits in the queue and can be cancelled there
+    _wait_for(queue, first, states=('in_progress',))
+    queued, _ = queue.submit('slow', {'v': 2})
+    assert queue.cancel(queued)
+    assert queue.get(queued)['status'] == 'cancelled'
+
+    # A running job stops at its next progress report
+    assert queue.cancel(first)
+    assert _wait_for(queue, first)['status'] == 'cancelled'
+    release.set()
+    queue.stop()
+
+
+def test_orphaned_jobs_requeued_and_expired_jobs_cleaned_up(tmp_path):
+    path, results = str(tmp_path / 'jobs.db'), str(tmp_path / 'results')
+    queue = JobQueue(path, results, workers=1, lease_s=0.2, ttl_s=0)
+    queue.register('noop', lambda job: pd.DataFrame({'x': [1]}))
+    job_id, _ = queue.submit('noop')
+    queue.stop()
+    # Simulate a worker that died mid-job
+    queue._connect().execute("update jobs set status = 'in_progress', heartbeat_at = 0 where id = ?", (job_id,))
+
+    restarted = JobQueue(path, results, workers=1, lease_s=0.2, ttl_s=0)
+    restarted.register('noop', lambda job: pd.DataFrame({'x': [1]}))
+    restarted.start()
+    assert _wait_for(restarted, job_id)['status'] == 'completed'
+    restarted.stop()
+
+    assert restarted.cleanup() == 1
+    assert restarted.get(job_id) is None and restarted.result(job_id) is None
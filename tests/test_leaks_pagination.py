@@ -0,0 +1,92 @@
+import io
+import json
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from src.agents.price_detector import decode_cursor, detect_page, detect_public_only, encode_cursor
+
+
+def _seed(monkeypatch):
+    # One shared connection so the API's worker threads see the same in-memory DB
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    pd.DataFrame({'po_id': list(range(1, 11)),
+                  'contract_id': [1] * 10,
+                  # Ties on drift (po 1/2 and 3/4) exercise the po_id tie-breaker
+                  'unit_price': [120, 120, 110, 110, 130, 107, 150, 100, 90, 140]}) \
+        .to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+    return engine
+
+
+def test_cursor_roundtrip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor([1.25, 7, 3])) == [1.25, 7, 3]
+    try:
+        decode_cursor("not-a-cursor")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("expected ValueError")
+
+
+def test_pages_cover_full_result_in_order(monkeypatch):
+    _seed(monkeypatch)
+    full = detect_public_only(mode="materialized")
+
+    seen, cursor = [], None
+    while True:
+        page, cursor = detect_page(limit=3, cursor=cursor)
+        assert len(page) <= 3
+        seen += page['po_id'].tolist()
+        if cursor is None:
+            break
+    # Same rows as the unpaginated result; ties broken by po_id
+    assert sorted(seen) == sorted(full['po_id'].tolist())
+    assert seen == [7, 10, 5, 1, 2, 3, 4, 6]
+
+
+def test_leaks_api_pages_and_ndjson(monkeypatch):
+    _seed(monkeypatch)
+    from src.api import fastapi_app
+    client = TestClient(fastapi_app.app)
+
+    response = client.get('/api/leaks', params={'limit': 5})
+    assert response.text.startswith('{"next_cursor": ')
+    first = response.json()
+    assert [r['po_id'] for r in first['items']] == [7, 10, 5, 1, 2]
+    second = client.get('/api/leaks', params={'limit': 5, 'cursor': first['next_cursor']}).json()
+    assert [r['po_id'] for r in second['items']] == [3, 4, 6]
+    assert second['next_cursor'] is None
+
+    assert client.get('/api/leaks', params={'cursor': 'garbage'}).status_code == 400
+    # A cursor only continues the listing it came from
+    other = client.get('/api/leaks', params={'limit': 5, 'cursor': first['next_cursor'], 'drift_threshold': 1})
+    assert other.status_code == 400
+
+    response = client.get('/api/leaks', headers={'Accept': 'application/x-ndjson'})
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r['po_id'] for r in rows] == [7, 10, 5, 1, 2, 3, 4, 6]
+    assert rows[0]['price_drift'] == 1.5
+
+
+def test_leaks_api_arrow_and_parquet(monkeypatch):
+    _seed(monkeypatch)
+    from src.api import fastapi_app
+    fastapi_app.leaks_cache.clear()
+    client = TestClient(fastapi_app.app)
+
+    response = client.get('/api/leaks', headers={'Accept': 'application/vnd.apache.arrow.stream'})
+    assert response.headers['content-type'] == 'application/vnd.apache.arrow.stream'
+    table = pa.ipc.open_stream(response.content).read_all()
+    assert table.column('po_id').to_pylist() == [r['po_id'] for r in client.get('/api/leaks').json()]
+    assert table.column('price_drift').to_pylist()[0] == 1.5
+
+    response = client.get('/api/leaks', params={'format': 'parquet', 'limit': 5})
+    page = pq.read_table(io.BytesIO(response.content))
+    assert page.column('po_id').to_pylist() == [7, 10, 5, 1, 2]
+    assert decode_cursor(response.headers['x-next-cursor'])[1] == 2
@@ -0,0 +1,52 @@
+from src.tools import llm_client
+from src.tools.llm_cache import LLMCache
+
+
+def test_cache_persists_and_normalizes_prompt(tmp_path):
+    path = str(tmp_path / "llm_cache.db")
+    LLMCache(path).set("gemini-1.5-flash", "Summarize  this\n drift ", "cached answer")
+
+    # A new instance (another worker, or after a restart) sees the same entry
+    cache = LLMCache(path)
+    assert cache.get("gemini-1.5-flash", "Summarize this drift") == "cached answer"
+    assert cache.get("gpt-4o-mini", "Summarize this drift") is None
+
+
+def test_cache_ttl_and_eviction(tmp_path):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"), ttl_s=-1)
+    cache.set("m", "p", "r")
+    assert cache.get("m", "p") is None
+
+    cache = LLMCache(str(tmp_path / "bounded.db"), max_entries=2)
+    for i in range(3):
+        cache.set("m", f"p{i}", f"r{i}")
+    cache.get("m", "p0")
+    cache.evict()
+    assert len(cache) == 2
+    assert cache.get("m", "p0") == "r0"
+
+
+def test_repeated_summary_hits_cache(tmp_path, monkeypatch):
+    cache = LLMCache(str(tmp_path / "llm_cache.db"))
+    monkeypatch.setattr(llm_client, 'get_llm_cache', lambda: cache)
+    monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+
+    calls = []
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt):
+            calls.append(prompt)
+            return type("Response", (), {"text": "PO is 10% over contract."})()
+
+    monkeypatch.setattr(llm_client.genai, 'configure', lambda api_key: None)
+    monkeypatch.setattr(llm_client.genai, 'GenerativeModel', FakeModel)
+    monkeypatch.setattr(llm_client, '_gateway', llm_client.LLMGateway())
+
+    first = llm_client.summarize_drift_with_gemini(100.0, 110.0)
+    second = llm_client.summarize_drift_with_gemini(100.0, 110.0)
+
+    assert first == second == "PO is 10% over contract."
+    assert len(calls) == 1
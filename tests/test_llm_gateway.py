@@ -0,0 +1,74 @@
+import pytest
+from src.tools import llm_client
+from src.tools.llm_client import CircuitBreaker, LLMGateway, TokenBucket
+
+
+@pytest.fixture(autouse=True)
+def no_cache(monkeypatch):
+    monkeypatch.setattr(llm_client, 'get_llm_cache', lambda: None)
+
+
+def test_client_is_built_once_and_reused():
+    built = []
+
+    def stub_factory():
+        built.append(1)
+        return lambda prompt: f"stub: {prompt}"
+
+    gateway = LLMGateway()
+    gateway.register_provider("stub", stub_factory, model="stub-model")
+
+    assert gateway.generate("a", provider="stub") == "stub: a"
+    assert gateway.generate("b", provider="stub") == "stub: b"
+    assert len(built) == 1
+
+
+def test_circuit_opens_after_repeated_failures():
+    calls = []
+
+    def failing(prompt):
+        calls.append(prompt)
+        raise RuntimeError("provider down")
+
+    gateway = LLMGateway(failure_threshold=2, reset_timeout_s=60)
+    gateway.register_provider("stub", lambda: failing, model="stub-model")
+
+    for _ in range(5):
+        assert gateway.generate("p", provider="stub", fallback="fallback") == "fallback"
+
+    # Only the calls before the circuit opened reached the provider
+    assert len(calls) == 2
+    assert gateway.breakers["stub"].state == "open"
+
+
+def test_half_open_trial_closes_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout_s=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()  # one trial call at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_rate_limit_uses_fallback():
+    gateway = LLMGateway(rate_per_s=0.001, burst=2, rate_limit_wait_s=0)
+    gateway.register_provider("stub", lambda: (lambda prompt: "ok"), model="stub-model")
+
+    results = [gateway.generate("p", provider="stub", fallback="limited") for _ in range(3)]
+
+    assert results == ["ok", "ok", "limited"]
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate_per_s=100, capacity=1)
+    assert bucket.acquire()
+    assert not bucket.acquire()
+    assert bucket.acquire(timeout=0.1)
+
+
+def test_unknown_provider_uses_local_draft_without_rate_limit():
+    gateway = LLMGateway(rate_per_s=0.001, burst=1, rate_limit_wait_s=0)
+
+    results = [gateway.generate(f"p{i}", provider="nope", fallback="limited") for i in range(3)]
+
+    assert results == ["DRAFT: p0", "DRAFT: p1", "DRAFT: p2"]
@@ -0,0 +1,52 @@
+import asyncio
+import httpx
+import pandas as pd
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine
+from src.agents.price_detector import detect_public_only
+from src.tools.bulk_loader import bulk_load
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_detection_stages_are_timed(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': [1, 2], 'contract_id': [1, 1], 'unit_price': [110, 100]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+
+    stages = ['read', 'merge', 'filter', 'sort', 'summarize', 'serialize']
+    before = {s: _sample('procurement_detection_stage_seconds_count', mode='full', stage=s) for s in stages}
+    runs = _sample('procurement_detection_seconds_count', mode='full')
+
+    assert len(detect_public_only(mode='full')) == 1
+    for stage in stages:
+        assert _sample('procurement_detection_stage_seconds_count', mode='full', stage=stage) == before[stage] + 1
+    assert _sample('procurement_detection_seconds_count', mode='full') == runs + 1
+
+
+def test_bulk_load_records_rows_and_batches():
+    engine = create_engine('sqlite:///:memory:')
+    rows = _sample('procurement_ingest_rows_total', table='metrics_t')
+    bulk_load(pd.DataFrame({'a': range(25)}), 'metrics_t', engine, batch_size=10)
+    assert _sample('procurement_ingest_rows_total', table='metrics_t') == rows + 25
+    assert _sample('procurement_ingest_batch_rows_count', table='metrics_t') == 3
+    assert _sample('procurement_ingest_batch_rows_sum', table='metrics_t') == 25
+
+
+def test_metrics_endpoint(monkeypatch, tmp_path):
+    from src.api import fastapi_app
+    from src.tools.job_queue import JobQueue
+    monkeypatch.setattr('src.tools.job_queue._queue', JobQueue(str(tmp_path / 'jobs.db'), str(tmp_path / 'results')))
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get('/metrics')
+
+    response = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert 'procurement_job_queue_jobs{status="queued"} 0.0' in response.text
@@ -0,0 +1,36 @@
+import pandas as pd
+from sqlalchemy import create_engine
+from src.agents import price_detector
+from src.agents.price_detector import _merge_shards, _shard_contracts, detect_public_only
+
+
+def test_merge_shards_orders_by_drift():
+    shards = [pd.DataFrame({'po_id': [1, 3], 'price_drift': [1.9, 1.2]}),
+              pd.DataFrame({'po_id': [], 'price_drift': []}),
+              pd.DataFrame({'po_id': [2, 4], 'price_drift': [1.5, 1.1]})]
+    assert _merge_shards(shards)['po_id'].tolist() == [1, 2, 3, 4]
+
+
+def test_shards_partition_contracts():
+    contracts = pd.DataFrame({'contract_id': [f'C{i}' for i in range(50)], 'contract_unit_price': 1.0})
+    shards = _shard_contracts(contracts, 4)
+    assert sorted(c for s in shards for c in s['contract_id']) == sorted(contracts['contract_id'])
+    # The same id always lands in the same shard
+    assert [len(s) for s in shards] == [len(s) for s in _shard_contracts(contracts, 4)]
+
+
+def test_parallel_mode_matches_full(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'procure.db'}")
+    pd.DataFrame({'po_id': range(1, 9),
+                  'contract_id': [1, 2, 3, 4, 1, 2, 3, 9],
+                  'unit_price': [130, 210, 330, 400, 100, 270, 300, 999]}).to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1, 2, 3, 4],
+                  'contract_unit_price': [100, 200, 300, 400]}).to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr('src.agents.price_detector.summarize_drifts', lambda rows, **kwargs: {})
+    monkeypatch.setattr(price_detector, 'DETECTION_WORKERS', 2)
+
+    full = detect_public_only(mode="full")
+    parallel = detect_public_only(mode="parallel")
+    assert parallel['po_id'].tolist() == full['po_id'].tolist() == [6, 1, 3]
+    assert parallel['price_drift'].tolist() == full['price_drift'].tolist()
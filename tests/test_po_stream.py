@@ -0,0 +1,220 @@
+import asyncio
+import json
+import httpx
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from src.agents import po_stream
+from src.agents.po_stream import BrokerSource, FileTailSource, PoEnforcer, QueueSource, SQLiteBroker
+from src.tools.contract_index import ContractPriceIndex
+from src.tools.result_cache import get_data_version
+
+
+def _engine():
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    pd.DataFrame({'contract_id': ['C1', 'C2'], 'vendor_id': ['V1', 'V2'], 'contract_unit_price': [100.0, 50.0]}) \
+        .to_sql('contracts', engine, index=False)
+    return engine
+
+
+def _po(i, contract_id='C1', unit_price=100.0):
+    return {'po_id': f'PO{i}', 'vendor_id': 'V1', 'item_id': 'I1', 'unit_price': unit_price, 'qty': 2,
+            'total': unit_price * 2, 'date': '2024-01-01', 'contract_id': contract_id}
+
+
+def _enforcer(engine, flagged, **kwargs):
+    return PoEnforcer(engine, ContractPriceIndex(engine), on_flagged=flagged.extend, **kwargs)
+
+
+def test_enforcer_flags_and_writes_in_batches():
+    engine = _engine()
+    flagged = []
+    enforcer = _enforcer(engine, flagged, batch_size=3, flush_s=60)
+    version = get_data_version(engine)
+
+    async def main():
+        source = QueueSource(maxsize=4)
+        consumer = asyncio.create_task(enforcer.run(source))
+        # More events than the queue holds: put waits for the consumer
+        await source.put_many([_po(i) for i in range(6)] + [_po(6, unit_price=130.0), _po(7, 'NONE', 500.0),
+                                                          {'po_id': 'bad', 'unit_price': 'x'}])
+        await source.close()
+        await consumer
+
+    asyncio.run(main())
+    assert [r['po_id'] for r in flagged] == ['PO6']
+    assert flagged[0]['price_drift'] == 1.3 and flagged[0]['contract_unit_price'] == 100.0
+
+    stats = enforcer.stats()
+    assert stats['consumed'] == 9 and stats['flagged'] == 1 and stats['invalid'] == 1
+    assert stats['written'] == 8 and stats['pending'] == 0 and stats['flushes'] >= 2
+    with engine.connect() as conn:
+        assert conn.execute(text("select count(*) from pos")).scalar() == 8
+        # The po_drift triggers were installed when the first write created `pos`
+        assert conn.execute(text("select po_id from po_drift where price_drift > 1.05")).scalars().all() == ['PO6']
+    assert get_data_version(engine) != version
+
+
+def test_enforcer_flushes_on_interval():
+    engine = _engine()
+    enforcer = _enforcer(engine, [], batch_size=1000, flush_s=0.05)
+
+    async def main():
+        source = QueueSource()
+        consumer = asyncio.create_task(enforcer.run(source))
+        await source.put(_po(1))
+        for _ in range(100):
+            await asyncio.sleep(0.02)
+            if enforcer.written:
+                break
+        written = enforcer.written
+        consumer.cancel()
+        try:
+            await consumer
+        except asyncio.CancelledError:
+            pass
+        return written
+
+    assert asyncio.run(main()) == 1
+
+
+def test_file_tail_source_reads_complete_lines(tmp_path):
+    path = tmp_path / 'pos.ndjson'
+    path.write_text(json.dumps(_po(1)) + '\nnot json\n' + json.dumps(_po(2)) + '\n' + '{"po_id": "PO3"')
+    source = FileTailSource(str(path), from_start=True, follow=False)
+
+    async def collect():
+        return [po async for batch in source.batches(10) for po in batch]
+
+    assert [po['po_id'] for po in asyncio.run(collect())] == ['PO1', 'PO2']
+    assert source.invalid == 1
+    # The unfinished last line is kept until its newline arrives
+    assert source._partial == '{"po_id": "PO3"'
+
+
+def test_broker_source_commits_after_write(tmp_path):
+    engine = _engine()
+    broker = SQLiteBroker(str(tmp_path / 'broker.db'))
+    broker.publish([_po(i) for i in range(5)] + [_po(5, 'C2', 60.0)])
+    flagged = []
+
+    asyncio.run(_enforcer(engine, flagged, batch_size=4).run(BrokerSource(broker, follow=False)))
+    assert [r['po_id'] for r in flagged] == ['PO5']
+    assert broker.committed('enforcer') == 6
+
+    # A restarted consumer resumes after the committed offset
+    broker.publish([_po(6)])
+    enforcer = _enforcer(engine, [])
+    asyncio.run(enforcer.run(BrokerSource(broker, follow=False)))
+    assert enforcer.consumed == 1
+    with engine.connect() as conn:
+        assert conn.execute(text("select count(*) from pos")).scalar() == 7
+
+
+def test_unknown_event_keys_are_not_written():
+    engine = _engine()
+    enforcer = _enforcer(engine, [], batch_size=1)
+
+    async def main():
+        source = QueueSource()
+        consumer = asyncio.create_task(enforcer.run(source))
+        await source.put_many([{**_po(1), 'bogus': 1}, _po(2), {**_po(3), 'other': 'x'}])
+        await source.close()
+        await consumer
+
+    asyncio.run(main())
+    assert enforcer.written == 3 and enforcer.write_errors == 0
+    with engine.connect() as conn:
+        columns = [r[1] for r in conn.execute(text("pragma table_info(pos)"))]
+    assert columns == po_stream.PO_COLUMNS
+
+
+def test_failing_batch_goes_to_dead_letter(tmp_path):
+    engine = _engine()
+    broker = SQLiteBroker(str(tmp_path / 'broker.db'))
+    broker.publish([_po(1), _po(2)])
+    enforcer = _enforcer(engine, [], flush_s=0.01, max_retries=2)
+    attempts = []
+
+    def failing_write(rows):
+        attempts.append(len(rows))
+        raise RuntimeError("disk full")
+
+    enforcer._write_rows = failing_write
+    asyncio.run(enforcer.run(BrokerSource(broker, follow=False)))
+
+    assert attempts == [2, 2]
+    stats = enforcer.stats()
+    assert stats['write_errors'] == 2 and stats['dead_lettered'] == 2 and stats['written'] == 0
+    # The stream moves on past the dead-lettered events
+    assert broker.committed('enforcer') == 2
+    with engine.connect() as conn:
+        rows = conn.execute(text(f"select error, po from {po_stream.DEAD_LETTER_TABLE}")).fetchall()
+    assert [json.loads(po)['po_id'] for _, po in rows] == ['PO1', 'PO2']
+    assert rows[0][0] == 'disk full'
+
+
+def test_po_events_endpoint(monkeypatch):
+    from src.api import fastapi_app
+    engine = _engine()
+    source = QueueSource()
+    monkeypatch.setattr(fastapi_app, 'enforcement_source', source)
+    monkeypatch.setattr(fastapi_app, 'enforcer', _enforcer(engine, []))
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            single = await client.post('/api/po-events', json=_po(1))
+            batch = await client.post('/api/po-events', json={'pos': [_po(2), _po(3, unit_price=120.0)]})
+            stats = (await client.get('/api/enforcement/stats')).json()
+        return single, batch, stats
+
+    single, batch, stats = asyncio.run(main())
+    assert single.status_code == 202 and single.json() == {'queued': 1}
+    assert batch.json() == {'queued': 2}
+    assert source.queue.qsize() == 3
+    assert stats['source'] == po_stream.ENFORCEMENT_SOURCE and stats['consumed'] == 0
+
+    monkeypatch.setattr(fastapi_app, 'enforcement_source', None)
+
+    async def rejected():
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.post('/api/po-events', json=_po(4))
+
+    assert asyncio.run(rejected()).status_code == 409
+
+
+def test_crashed_enforcer_is_restarted(monkeypatch):
+    from src.api import fastapi_app
+
+    class FlakyEnforcer:
+        runs = 0
+
+        async def run(self, source):
+            self.runs += 1
+            if self.runs == 1:
+                raise RuntimeError('db locked')
+            await asyncio.Event().wait()
+
+    enforcer = FlakyEnforcer()
+    monkeypatch.setattr(fastapi_app, 'enforcement_source', QueueSource())
+    monkeypatch.setattr(fastapi_app, 'enforcer', enforcer)
+    monkeypatch.setattr(fastapi_app, 'enforcement_task', None)
+    monkeypatch.setattr(fastapi_app, 'ENFORCEMENT_RESTART_S', 0.05)
+
+    async def main():
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            fastapi_app._start_enforcement()
+            await asyncio.sleep(0.01)
+            down = await client.post('/api/po-events', json=_po(1))
+            await asyncio.sleep(0.1)
+            up = await client.post('/api/po-events', json=_po(2))
+        fastapi_app.enforcement_task.cancel()
+        return down, up
+
+    down, up = asyncio.run(main())
+    assert down.status_code == 503
+    assert up.status_code == 202
+    assert enforcer.runs == 2
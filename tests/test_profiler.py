@@ -0,0 +1,51 @@
+import asyncio
+import time
+import httpx
+import pytest
+from src.tools import profiler
+from src.tools.metrics import detection_stage
+
+
+def _slow_detection():
+    with detection_stage("read"):
+        time.sleep(0.02)
+        data = [bytearray(1024) for _ in range(1000)]
+    with detection_stage("merge"):
+        time.sleep(0.01)
+    return len(data)
+
+
+def test_profile_call_reports_stages_memory_and_functions(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+    result, report = profiler.profile_call(_slow_detection, profile_id='task-1')
+
+    assert result == 1000
+    assert report['stages_s']['read'] >= 0.02 and report['stages_s']['merge'] >= 0.01
+    assert report['wall_s'] >= 0.03
+    assert report['memory']['peak_bytes'] >= 1000 * 1024
+    assert any('_slow_detection' in f['function'] for f in report['functions'])
+    assert profiler.load_report('task-1') == report
+    assert (tmp_path / 'task-1.prof').exists()
+    assert profiler.load_report('missing') is None
+    with pytest.raises(ValueError):
+        profiler.load_report('../etc/passwd')
+
+
+def test_profiling_requires_admin_token(monkeypatch, tmp_path):
+    from src.api import fastapi_app
+    monkeypatch.setattr(profiler, 'PROFILE_DIR', str(tmp_path))
+
+    async def get(path, headers=None):
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get(path, headers=headers)
+
+    monkeypatch.setattr(profiler, 'PROFILING_ADMIN_TOKEN', '')
+    assert asyncio.run(get('/api/leaks?profile=true', {'X-Admin-Token': ''})).status_code == 403
+
+    monkeypatch.setattr(profiler, 'PROFILING_ADMIN_TOKEN', 'secret')
+    assert asyncio.run(get('/api/leaks?profile=true', {'X-Admin-Token': 'wrong'})).status_code == 403
+    profiler.profile_call(_slow_detection, profile_id='abc')
+    response = asyncio.run(get('/api/profiles/abc', {'X-Admin-Token': 'secret'}))
+    assert response.status_code == 200 and response.json()['id'] == 'abc'
+    assert asyncio.run(get('/api/profiles/nope', {'X-Admin-Token': 'secret'})).status_code == 404
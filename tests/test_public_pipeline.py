@@ -2,6 +2,7 @@ import sys
 import os
 import pandas as pd
 from sqlalchemy import create_engine
+from src.agents.ingestor import create_indexes
 from src.agents.price_detector import detect_public_only
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -65,4 +66,27 @@ def test_drift_threshold_parameter(monkeypatch):
     assert len(df) == 2
     assert df['po_id'].tolist() == [1, 3]
     assert df['price_drift'].iloc[0] == 1.1
-    assert df['price_drift'].iloc[1] == 1.025
\ No newline at end of file
+    assert df['price_drift'].iloc[1] == 1.025
+
+
+def test_sql_mode_matches_full(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+
+    pos_data = {'po_id': [1, 2, 3, 4, 5, 6],
+                'contract_id': [1, 1, 2, 2, 3, 4],
+                'unit_price': [110, 100, 205, 200, 300, 50]}
+    pd.DataFrame(pos_data).to_sql('pos', engine, index=False)
+
+    # A zero contract price is never a drift, in either mode
+    contracts_data = {'contract_id': [1, 2, 4],
+                      'contract_unit_price': [100, 200, 0]}
+    pd.DataFrame(contracts_data).to_sql('contracts', engine, index=False)
+
+    create_indexes(engine)
+
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+
+    df = detect_public_only(drift_threshold=2, mode="sql")
+
+    assert df['po_id'].tolist() == [1, 3]
+    assert df['price_drift'].tolist() == detect_public_only(drift_threshold=2, mode="full")['price_drift'].tolist()
@@ -0,0 +1,91 @@
+import asyncio
+import time
+import threading
+import httpx
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.pool import StaticPool
+from src.tools.result_cache import LRUCache, SingleFlight, bump_data_version, get_data_version
+
+
+def test_lru_eviction_and_counters():
+    cache = LRUCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.set('c', 3)  # evicts 'b', the least recently used
+
+    assert cache.get('b') == (False, None)
+    assert cache.get('c') == (True, 3)
+    assert cache.stats() == {'size': 2, 'maxsize': 2, 'hits': 2, 'misses': 1, 'evictions': 1}
+
+
+def test_data_version_bumps():
+    engine = create_engine('sqlite:///:memory:')
+    assert get_data_version(engine) == 0
+    assert bump_data_version(engine) == 1
+    assert bump_data_version(engine) == 2
+    assert get_data_version(engine) == 2
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    flight = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'result'
+
+    async def scenario():
+        same = await asyncio.gather(*(flight.do('k', compute) for _ in range(5)))
+        other = await flight.do('other', compute)
+        again = await flight.do('k', compute)  # nothing in flight any more
+        return same, other, again
+
+    same, other, again = asyncio.run(scenario())
+    assert same == ['result'] * 5 and other == again == 'result'
+    assert len(calls) == 3
+    assert flight.stats() == {'in_flight': 0, 'executed': 3, 'coalesced': 4, 'deduplicated': 0}
+
+
+def test_single_flight_deduplicated_count_is_thread_safe():
+    flight = SingleFlight()
+
+    def record():
+        for _ in range(1000):
+            flight.record_deduplicated()
+
+    threads = [threading.Thread(target=record) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert flight.stats()['deduplicated'] == 8000
+
+
+def test_concurrent_leaks_requests_share_one_detection(monkeypatch):
+    from src.api import fastapi_app
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    bump_data_version(engine)
+    runs = []
+
+    def slow_detect(**kwargs):
+        runs.append(kwargs)
+        time.sleep(0.2)
+        return pd.DataFrame({'po_id': [1], 'price_drift': [1.2]})
+
+    monkeypatch.setattr(fastapi_app, 'engine', engine)
+    monkeypatch.setattr(fastapi_app, 'detect_public_only', slow_detect)
+    monkeypatch.setattr(fastapi_app, 'leaks_flight', SingleFlight())
+    fastapi_app.leaks_cache.clear()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await asyncio.gather(*(client.get('/api/leaks') for _ in range(10)))
+
+    responses = asyncio.run(scenario())
+    assert all(r.json() == [{'po_id': 1, 'price_drift': 1.2}] for r in responses)
+    assert len(runs) == 1
+    assert fastapi_app.leaks_flight.stats()['coalesced'] == 9
@@ -0,0 +1,142 @@
+import asyncio
+import httpx
+import pandas as pd
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import StaticPool
+from src.agents.drift_table import ensure_po_drift
+from src.agents.rollups import ROLLUP_TABLE, ensure_rollups, query_rollups
+
+
+def _engine():
+    engine = create_engine('sqlite:///:memory:', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    # C1 has two rows; the lowest price (90) is the contract price
+    pd.DataFrame({'contract_id': ['C1', 'C1', 'C2'], 'contract_unit_price': [100.0, 90.0, 50.0]}) \
+        .to_sql('contracts', engine, index=False)
+    _pos([('P0', 'V1', 'I1', 99.0, 1, '2024-01-01', 'C1')]).to_sql('pos', engine, index=False)
+    return engine
+
+
+def _pos(rows):
+    return pd.DataFrame(rows, columns=['po_id', 'vendor_id', 'item_id', 'unit_price', 'qty', 'date', 'contract_id'])
+
+
+def _rollups(engine):
+    with engine.connect() as conn:
+        return [tuple(r) for r in conn.execute(text(
+            f"select dimension, entity_id, day, po_count, drift_count, round(leakage, 6), round(max_drift, 6) "
+            f"from {ROLLUP_TABLE} order by 1, 2, 3"))]
+
+
+def test_rollups_maintained_incrementally():
+    engine = _engine()
+    ensure_po_drift(engine)
+    _pos([('P1', 'V1', 'I1', 100.0, 2, '2024-01-05', 'C1'),           # drift 1.11, leakage 20
+          ('P2', 'V1', 'I2', 45.0, 1, '2024-01-05', 'C2'),            # below contract
+          ('P3', 'V2', 'I1', 60.0, 3, '2024-01-05 10:00:00', 'C2'),   # drift 1.2, leakage 30
+          ('P4', 'V2', 'I1', 60.0, 3, '2024-01-05', 'NONE')]) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+
+    assert ('vendor', 'V1', '2024-01-05', 2, 1, 20.0, 1.111111) in _rollups(engine)
+    assert ('item', 'I1', '2024-01-05', 2, 2, 50.0, 1.2) in _rollups(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("delete from pos where po_id = 'P3'"))
+        conn.execute(text("update pos set unit_price = 200 where po_id = 'P2'"))
+    incremental = _rollups(engine)
+    assert ('vendor', 'V1', '2024-01-05', 2, 2, 170.0, 4.0) in incremental
+    assert not [r for r in incremental if r[1] == 'V2']
+
+    # Same rows as aggregating pos from scratch
+    with engine.begin() as conn:
+        ensure_rollups(conn, rebuild=True)
+    assert _rollups(engine) == incremental
+
+
+def test_rollups_skip_pos_without_unit_price():
+    engine = _engine()
+    ensure_po_drift(engine)
+    # Would make drift_count NULL (and the insert fail) without the guard
+    _pos([('P1', 'V1', 'I1', None, 2, '2024-01-01', 'C1')]).to_sql('pos', engine, if_exists='append', index=False)
+    assert ('vendor', 'V1', '2024-01-01', 1, 1, 9.0, 1.1) in _rollups(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("update pos set unit_price = 180 where po_id = 'P1'"))
+        conn.execute(text("delete from pos where po_id = 'P0'"))
+    incremental = _rollups(engine)
+    assert ('vendor', 'V1', '2024-01-01', 1, 1, 180.0, 2.0) in incremental
+    with engine.begin() as conn:
+        ensure_rollups(conn, rebuild=True)
+    assert _rollups(engine) == incremental
+
+
+def test_rollups_follow_contract_changes():
+    engine = _engine()
+    ensure_po_drift(engine)
+    _pos([('P1', 'V1', 'I1', 100.0, 2, '2024-01-05', 'C1'),
+          ('P2', 'V1', 'I2', 45.0, 1, '2024-01-05', 'C2'),
+          ('P3', 'V2', 'I1', 60.0, 3, '2024-01-05', 'C3')]) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+
+    with engine.begin() as conn:
+        conn.execute(text("update contracts set contract_unit_price = 40 where contract_id = 'C2'"))
+    assert ('vendor', 'V1', '2024-01-05', 2, 2, 25.0, 1.125) in _rollups(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("insert into contracts values ('C3', 50.0)"))
+        conn.execute(text("delete from contracts where contract_id = 'C1' and contract_unit_price = 90"))
+    incremental = _rollups(engine)
+    assert ('vendor', 'V2', '2024-01-05', 1, 1, 30.0, 1.2) in incremental
+    assert ('vendor', 'V1', '2024-01-01', 1, 0, 0.0, 0.99) in incremental
+
+    # Same rows as aggregating pos from scratch
+    with engine.begin() as conn:
+        ensure_rollups(conn, rebuild=True)
+    assert _rollups(engine) == incremental
+
+
+def test_rollups_rebuilt_when_threshold_changes():
+    engine = _engine()
+    ensure_po_drift(engine)
+    assert _rollups(engine)[0][4] == 1  # 99 / 90 = 1.1 > 1.05
+    with engine.begin() as conn:
+        ensure_rollups(conn, threshold=20)
+    assert _rollups(engine)[0][4] == 0
+
+
+def test_query_rollups_windows():
+    engine = _engine()
+    ensure_po_drift(engine)
+    _pos([('P1', 'V1', 'I1', 100.0, 2, '2024-03-25', 'C1'),
+          ('P2', 'V2', 'I1', 60.0, 1, '2024-03-30', 'C2'),
+          ('P3', 'V2', 'I1', 75.0, 1, '2024-02-20', 'C2')]) \
+        .to_sql('pos', engine, if_exists='append', index=False)
+
+    result = query_rollups(engine, dimension='vendor', window=7, as_of='2024-03-31')
+    rows = {r['entity_id']: r for r in result['rows']}
+    assert list(rows) == ['V1', 'V2']  # 20 > 10 over 7 days
+    assert rows['V2']['leakage_7d'] == 10.0 and rows['V2']['leakage_90d'] == 35.0
+    assert rows['V2']['max_drift_30d'] == 1.2 and rows['V2']['max_drift_90d'] == 1.5
+    # P0 (2024-01-01) is more than 90 days back
+    assert rows['V1']['po_count_90d'] == 1 and rows['V1']['drift_count_90d'] == 1
+
+    assert query_rollups(engine, sort='leakage', window=90, as_of='2024-03-31')['rows'][0]['entity_id'] == 'V2'
+
+
+def test_rollups_endpoint(monkeypatch):
+    from src.api import fastapi_app
+    engine = _engine()
+    monkeypatch.setattr(fastapi_app, 'engine', engine)
+
+    async def get(params):
+        transport = httpx.ASGITransport(app=fastapi_app.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            return await client.get('/api/rollups', params=params)
+
+    # The rollups are created on first use for a database loaded before they existed
+    ok = asyncio.run(get({'dimension': 'item', 'window': 90, 'as_of': '2024-01-31'}))
+    assert ok.status_code == 200
+    assert ok.json()['rows'][0]['entity_id'] == 'I1' and ok.json()['rows'][0]['leakage_90d'] == 9.0
+
+    assert asyncio.run(get({'window': 14})).status_code == 400
+    assert asyncio.run(get({'dimension': 'contract'})).status_code == 400
+    assert asyncio.run(get({'as_of': 'yesterday'})).status_code == 400
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+import ingest_sf_data
+
+
+def _write_sf_csv(path):
+    pd.DataFrame({
+        'Fiscal Year': [2020] * 8,
+        'Purchase Order Date': ['2020/01/0%d' % (i + 1) for i in range(8)],
+        'Purchase Order': [f'PO{i}' for i in range(8)],
+        'Contract Number': ['C1', 'C1', 'C1', 'C2', 'C2', None, 'C1', 'C2'],
+        'Contract Title': ['Paper', 'Paper', 'Paper', 'Toner', 'Toner', 'Misc', 'Paper', 'Toner'],
+        'Supplier & Other Non-Supplier Payees': ['V1', 'V1', 'V1', 'V2', 'V2', 'V3', 'V1', None],
+        'Encumbered Quantity': [1, 2, 1, 4, 1, 1, 0, 1],
+        'Encumbered Amount': [10, 30, 12, 40, 9, 5, 10, 10],
+    }).to_csv(path, index=False)
+
+
+def test_streaming_ingest_matches_full_statistics(tmp_path, monkeypatch):
+    path = tmp_path / 'sf.csv'
+    _write_sf_csv(path)
+    engine = create_engine('sqlite:///:memory:')
+    monkeypatch.setattr(ingest_sf_data, 'engine', engine)
+
+    ingest_sf_data.ingest_sf_data_streaming(data_path=str(path), chunksize=3, sample_size=None)
+
+    contracts = pd.read_sql('select * from contracts order by contract_id', engine)
+    assert contracts['contract_id'].tolist() == ['C1', 'C2', 'OPEN_MARKET']
+    # Medians of the per-chunk statistics equal the full-frame groupby
+    assert contracts['contract_unit_price'].tolist() == [12.0, 9.5, 5.0]
+
+    # Invalid rows (zero quantity, missing supplier) are dropped, everything else written
+    pos = pd.read_sql('select * from pos', engine)
+    assert sorted(pos['po_id']) == ['PO0', 'PO1', 'PO2', 'PO3', 'PO4', 'PO5']
+
+
+def test_streaming_ingest_samples_pos(tmp_path, monkeypatch):
+    path = tmp_path / 'sf.csv'
+    _write_sf_csv(path)
+    engine = create_engine('sqlite:///:memory:')
+    monkeypatch.setattr(ingest_sf_data, 'engine', engine)
+
+    ingest_sf_data.ingest_sf_data_streaming(data_path=str(path), chunksize=2, sample_size=4)
+
+    pos = pd.read_sql('select * from pos', engine)
+    assert len(pos) == 4
+    assert '_priority' not in pos.columns
+
+
+def test_sampled_medians_within_stated_tolerance():
+    stats = ingest_sf_data.ContractPriceStats(sample_size=101, seed=7)
+    n = 20000
+    rng = np.random.default_rng(0)
+    # Three keys with n prices each (a shuffled 0..n-1, so price / n is its quantile), in chunks
+    prices = pd.DataFrame({
+        'contract_id': np.repeat(['C1', 'C2', 'C3'], n),
+        'item_id': 'I1',
+        'vendor_id': 'V1',
+        'unit_price': np.concatenate([rng.permutation(n) for _ in range(3)]).astype(float),
+    }).sample(frac=1, random_state=1)
+    for start in range(0, len(prices), 1000):
+        stats.update(prices.iloc[start:start + 1000])
+
+    # Memory stays at sample_size rows per key
+    assert len(stats.state) == 3 * 101
+    quantiles = stats.medians()['contract_unit_price'] / n
+    assert ((quantiles - 0.5).abs() <= 0.15).all()
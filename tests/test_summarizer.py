@@ -0,0 +1,74 @@
+import threading
+import time
+import pandas as pd
+from sqlalchemy import create_engine
+from src.agents import summarizer
+from src.agents.price_detector import detect_public_only
+
+
+def test_summaries_past_budget_are_delivered_late(monkeypatch):
+    def fake_summary(contract_price, po_price):
+        if po_price > 150:
+            time.sleep(0.3)
+        return f"summary {po_price}"
+
+    monkeypatch.setattr(summarizer, 'summarize_drift_with_gemini', fake_summary)
+
+    late = {}
+    done = threading.Event()
+
+    def on_late(key, summary):
+        late[key] = summary
+        done.set()
+
+    rows = [(0, 100, 110), (1, 100, 120), (2, 100, 200)]
+    started = time.monotonic()
+    summaries = summarizer.summarize_drifts(rows, budget_s=0.1, on_late=on_late)
+
+    assert time.monotonic() - started < 0.3
+    assert summaries == {0: "summary 110", 1: "summary 120"}
+    assert done.wait(2)
+    assert late == {2: "summary 200"}
+
+
+def test_timed_out_call_gets_fallback(monkeypatch):
+    monkeypatch.setattr(summarizer, 'summarize_drift_with_gemini', lambda c, p: time.sleep(0.5) or "too slow")
+    monkeypatch.setattr(summarizer, 'SUMMARY_TIMEOUT_S', 0.05)
+
+    summaries = summarizer.summarize_drifts([(0, 100, 150)], budget_s=1)
+
+    assert "50.0% higher than contract" in summaries[0]
+
+
+def test_unstarted_rows_cancelled_without_late_consumer(monkeypatch):
+    calls = []
+
+    def slow_summary(contract_price, po_price):
+        calls.append(po_price)
+        time.sleep(0.2)
+        return "summary"
+
+    monkeypatch.setattr(summarizer, 'summarize_drift_with_gemini', slow_summary)
+    monkeypatch.setattr(summarizer, 'SUMMARY_CONCURRENCY', 1)
+
+    summaries = summarizer.summarize_drifts([(0, 100, 110), (1, 100, 120), (2, 100, 130)], budget_s=0.05)
+
+    assert summaries == {}
+    time.sleep(0.5)
+    # Only the call already running when the budget ran out was made
+    assert calls == [110]
+
+
+def test_every_flagged_row_summarized_within_budget(monkeypatch):
+    engine = create_engine('sqlite:///:memory:')
+    pd.DataFrame({'po_id': range(12), 'contract_id': [1] * 12, 'unit_price': [110 + i for i in range(12)]}) \
+        .to_sql('pos', engine, index=False)
+    pd.DataFrame({'contract_id': [1], 'contract_unit_price': [100]}).to_sql('contracts', engine, index=False)
+    monkeypatch.setattr('src.agents.price_detector.engine', engine)
+    monkeypatch.setattr(summarizer, 'summarize_drift_with_gemini', lambda c, p: f"summary {p}")
+
+    df = detect_public_only(drift_threshold=5, mode='full')
+
+    # No row cap by default: the budget is the only bound
+    assert len(df) == 12
+    assert df['gemini_summary'].tolist() == [f"summary {p}" for p in df['unit_price']]